@@ -1,8 +1,13 @@
 import json
+import os
 import re
+import copy
 import hashlib
+import time
 import mysql.connector
+import mysql.connector.pooling
 from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 
 class JsonMySQLBridge:
     """
@@ -13,16 +18,34 @@ class JsonMySQLBridge:
     """
 
     # ===================== CONSTRUCCIÓN =====================
-    def __init__(self, host, user, password, database, json_path_default="./datos.json"):
+    def __init__(self, host, user, password, database, json_path_default="./datos.json",
+                 catalog_cache_path="./.jvorm_catalog.json"):
         self.DB = dict(host=host, user=user, password=password, database=database)
         self.JSON_PATH = json_path_default
 
+        # caché del catálogo (information_schema) para las lecturas; None la desactiva
+        self.CATALOG_CACHE = catalog_cache_path
+        self._catalog = None
+        self._catalog_fp = None
+
         # estado temporal para el ciclo "escritura" (json->mysql)
         self.tables = {}      # name -> TableDef
         self.edges = set()    # (parent, child)
         self._conn = None
         self._cur = None
 
+        # estado de la carga masiva (bulk)
+        self.chunk_size = 1000
+        self.load_stats = {}  # tabla -> {"filas", "segundos", "filas_s"}
+        self._next_id = defaultdict(int)
+        self._buffers = defaultdict(list)
+        self._bulk_order = []
+        self._buffer_cols = {}
+        self.sync_stats = {}  # tabla raíz -> {"sin_cambios", "insertadas", "borradas"}
+
+        # cambios de esquema detectados en la inferencia (para la carga en streaming)
+        self._schema_changes = []
+
     # ===================== IDENT & TYPES =====================
     @staticmethod
     def _ident(name: str) -> str:
@@ -84,21 +107,32 @@ class JsonMySQLBridge:
             self.kind = kind
             self.columns = {}          # solo para dict: col -> tipo SQL
             self.children = set()      # nombres de tablas hijas
+            self.keyed = False         # lleva columna `_clave` (hash de contenido, modo sync)
 
     def _ensure_table(self, name, parent=None, relname=None, kind='dict'):
         tname = self._ident(name)
         if tname not in self.tables:
             self.tables[tname] = self.TableDef(tname, parent, relname, kind, self._ident)
+            self._schema_changes.append(("table", tname, None))
         else:
             # subir de list_scalar a dict si hace falta
             if self.tables[tname].kind == 'list_scalar' and kind == 'dict':
                 self.tables[tname].kind = 'dict'
+                self._schema_changes.append(("kind", tname, None))
         if parent:
             p = self._ident(parent)
             self.edges.add((p, tname))
             self.tables[p].children.add(tname)
         return self.tables[tname]
 
+    def _set_column(self, t, col, ttype):
+        """Añade la columna o amplía su tipo, anotando el cambio."""
+        old = t.columns.get(col)
+        new = self._merge_type(old or ttype, ttype)
+        if old != new:
+            t.columns[col] = new
+            self._schema_changes.append(("column" if old is None else "type", t.name, col))
+
     # ===================== INFERENCIA (RECURSIVA) =====================
     def _infer_value(self, path_table: str, value, parent_table: str | None, relname: str | None):
         if isinstance(value, dict):
@@ -107,9 +141,7 @@ class JsonMySQLBridge:
                 if isinstance(v, (dict, list)):
                     self._infer_value(self._join_path(path_table, k), v, t.name, k)
                 else:
-                    col = self._ident(k)
-                    ttype = self._sql_scalar_type(v)
-                    t.columns[col] = self._merge_type(t.columns.get(col, ttype), ttype)
+                    self._set_column(t, self._ident(k), self._sql_scalar_type(v))
 
         elif isinstance(value, list):
             elem_kind = "scalar"
@@ -125,17 +157,14 @@ class JsonMySQLBridge:
                         if isinstance(v, (dict, list)):
                             self._infer_value(self._join_path(path_table, k), v, t.name, k)
                         else:
-                            col = self._ident(k)
-                            ttype = self._sql_scalar_type(v)
-                            t.columns[col] = self._merge_type(t.columns.get(col, ttype), ttype)
+                            self._set_column(t, self._ident(k), self._sql_scalar_type(v))
             else:
                 self._ensure_table(path_table, parent_table, relname, kind='list_scalar')
 
         else:
             if parent_table is None:
                 t = self._ensure_table(path_table, None, relname, kind='dict')
-                t.columns['valor'] = self._merge_type(t.columns.get('valor', self._sql_scalar_type(value)),
-                                                      self._sql_scalar_type(value))
+                self._set_column(t, 'valor', self._sql_scalar_type(value))
 
     # ===================== TOPOLOGÍA & DDL =====================
     def _topo_tables(self):
@@ -171,6 +200,38 @@ class JsonMySQLBridge:
                 cursor.execute(f"DROP TABLE IF EXISTS `{tname}`;")
         finally:
             cursor.execute("SET FOREIGN_KEY_CHECKS=1;")
+            self._invalidate_catalog()
+
+    def _create_table_sql(self, t) -> str:
+        cols = ["`Identificador` INT NOT NULL AUTO_INCREMENT"]
+        if t.keyed:
+            cols.append("`_clave` VARCHAR(64) DEFAULT NULL")
+        if t.parent:
+            cols.append(f"`{t.parent}_id` INT NOT NULL")
+        if t.kind == 'dict':
+            for c, typ in t.columns.items():
+                cols.append(f"`{self._ident(c)}` {typ} DEFAULT NULL")
+        else:
+            cols += ["`idx` INT NOT NULL", "`valor` TEXT DEFAULT NULL"]
+        cols.append("PRIMARY KEY (`Identificador`)")
+        if t.keyed:
+            cols.append("KEY `ix__clave` (`_clave`)")
+
+        fk_idx_sql = ""
+        fk_sql = ""
+        if t.parent:
+            keyn = self._idx_name(t.name, t.parent)
+            fkn = self._fk_name(t.name, t.parent)
+            fk_idx_sql = f", KEY `{keyn}` (`{t.parent}_id`)"
+            fk_sql = (f", CONSTRAINT `{fkn}` FOREIGN KEY (`{t.parent}_id`)"
+                      f" REFERENCES `{t.parent}` (`Identificador`)"
+                      f" ON DELETE CASCADE ON UPDATE CASCADE")
+
+        return f"""CREATE TABLE `{t.name}` (
+          {", ".join(cols)}
+          {fk_idx_sql}
+          {fk_sql}
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;"""
 
     def _create_all(self, cursor):
         order = self._topo_tables()
@@ -180,35 +241,33 @@ class JsonMySQLBridge:
                 cursor.execute(f"DROP TABLE IF EXISTS `{t}`;")
 
             for tname in order:
-                t = self.tables[tname]
-                cols = ["`Identificador` INT NOT NULL AUTO_INCREMENT"]
-                if t.parent:
-                    cols.append(f"`{t.parent}_id` INT NOT NULL")
-                if t.kind == 'dict':
-                    for c, typ in t.columns.items():
-                        cols.append(f"`{self._ident(c)}` {typ} DEFAULT NULL")
-                else:
-                    cols += ["`idx` INT NOT NULL", "`valor` TEXT DEFAULT NULL"]
-                cols.append("PRIMARY KEY (`Identificador`)")
-
-                fk_idx_sql = ""
-                fk_sql = ""
-                if t.parent:
-                    keyn = self._idx_name(t.name, t.parent)
-                    fkn = self._fk_name(t.name, t.parent)
-                    fk_idx_sql = f", KEY `{keyn}` (`{t.parent}_id`)"
-                    fk_sql = (f", CONSTRAINT `{fkn}` FOREIGN KEY (`{t.parent}_id`)"
-                              f" REFERENCES `{t.parent}` (`Identificador`)"
-                              f" ON DELETE CASCADE ON UPDATE CASCADE")
-
-                ddl = f"""CREATE TABLE `{t.name}` (
-                  {", ".join(cols)}
-                  {fk_idx_sql}
-                  {fk_sql}
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;"""
-                cursor.execute(ddl)
+                cursor.execute(self._create_table_sql(self.tables[tname]))
         finally:
             cursor.execute("SET FOREIGN_KEY_CHECKS=1;")
+            self._invalidate_catalog()
+        self._schema_changes.clear()
+
+    def _apply_schema_changes(self, cursor):
+        """Lleva a MySQL los cambios de esquema pendientes (tablas nuevas, columnas, tipos)."""
+        created = set()
+        done = set()
+        if self._schema_changes:
+            self._invalidate_catalog()
+        for kind, tname, col in self._schema_changes:
+            if kind == "kind":
+                raise ValueError(f"La tabla `{tname}` pasa de lista de escalares a objetos; "
+                                 "no se puede migrar en streaming.")
+            if kind == "table":
+                cursor.execute(self._create_table_sql(self.tables[tname]))
+                created.add(tname)
+            elif tname not in created and (tname, col) not in done:
+                done.add((tname, col))
+                typ = self.tables[tname].columns[col]
+                verb = "ADD COLUMN" if kind == "column" else "MODIFY COLUMN"
+                cursor.execute(f"ALTER TABLE `{tname}` {verb} `{self._ident(col)}` {typ} DEFAULT NULL;")
+        self._schema_changes.clear()
+        if created:
+            self._bulk_order = self._topo_tables()
 
     # ===================== INSERT (RECURSIVA) =====================
     def _insert_list_scalar(self, cursor, tdef, value, parent_id: int | None):
@@ -224,7 +283,8 @@ class JsonMySQLBridge:
                 val = el
             cursor.execute(sql, (parent_id, i, val))
 
-    def _insert_dict_row(self, cursor, tdef, data: dict, parent_id: int | None):
+    def _dict_row_values(self, tdef, data: dict, parent_id: int | None):
+        """Columnas y valores escalares de una fila dict (con FK al padre si la hay)."""
         cols = []
         vals = []
         for c in tdef.columns:
@@ -235,6 +295,10 @@ class JsonMySQLBridge:
         if tdef.parent:
             cols.insert(0, f"`{tdef.parent}_id`")
             vals.insert(0, parent_id)
+        return cols, vals
+
+    def _insert_dict_row(self, cursor, tdef, data: dict, parent_id: int | None):
+        cols, vals = self._dict_row_values(tdef, data, parent_id)
 
         if cols:
             sql = f"INSERT INTO `{tdef.name}` ({', '.join(cols)}) VALUES ({', '.join(['%s']*len(cols))})"
@@ -269,20 +333,447 @@ class JsonMySQLBridge:
                 self._insert_list_scalar(cursor, child, v, new_id)
         return new_id
 
+    # ===================== INSERT (BULK) =====================
+    # Los Identificador se asignan en cliente, en el mismo orden en que los daría
+    # AUTO_INCREMENT en la carga fila a fila, y las filas se acumulan por tabla
+    # para enviarlas con executemany (INSERT multi-VALUES) en bloques de chunk_size.
+    def _bulk_reset(self, chunk_size: int):
+        self.chunk_size = max(1, int(chunk_size))
+        self._next_id = defaultdict(int)
+        self._buffers = defaultdict(list)
+        self._buffer_cols = {}
+        self._bulk_order = self._topo_tables()
+        self.load_stats = {}
+
+    def _bulk_columns(self, tdef) -> list[str]:
+        cols = ["`Identificador`"]
+        if tdef.keyed:
+            cols.append("`_clave`")
+        if tdef.parent:
+            cols.append(f"`{tdef.parent}_id`")
+        if tdef.kind == 'dict':
+            cols += [f"`{self._ident(c)}`" for c in tdef.columns]
+        else:
+            cols += ["`idx`", "`valor`"]
+        return cols
+
+    def _bulk_push(self, cursor, tdef, row: tuple):
+        buf = self._buffers[tdef.name]
+        if not buf:
+            # columnas fijadas al abrir el bloque: si el esquema crece, el bloque se vacía antes
+            self._buffer_cols[tdef.name] = self._bulk_columns(tdef)
+        buf.append(row)
+        if len(buf) >= self.chunk_size:
+            # se vacía todo en orden topológico: el padre siempre llega antes que el hijo
+            self._bulk_flush(cursor)
+
+    def _bulk_flush(self, cursor):
+        for tname in self._bulk_order:
+            rows = self._buffers.get(tname)
+            if not rows:
+                continue
+            cols = self._buffer_cols[tname]
+            sql = f"INSERT INTO `{tname}` ({', '.join(cols)}) VALUES ({', '.join(['%s']*len(cols))})"
+
+            t0 = time.perf_counter()
+            cursor.executemany(sql, rows)
+            st = self.load_stats.setdefault(tname, {"filas": 0, "segundos": 0.0, "filas_s": 0.0})
+            st["filas"] += len(rows)
+            st["segundos"] += time.perf_counter() - t0
+            st["filas_s"] = st["filas"] / st["segundos"] if st["segundos"] > 0 else float(st["filas"])
+            rows.clear()
+
+    def _bulk_list_scalar(self, cursor, tdef, value, parent_id: int | None):
+        if not isinstance(value, list): value = [value]
+        for i, el in enumerate(value):
+            if isinstance(el, (dict, list)):
+                try:
+                    val = json.dumps(el, ensure_ascii=False)
+                except Exception:
+                    val = None
+            else:
+                val = el
+            self._next_id[tdef.name] += 1
+            self._bulk_push(cursor, tdef, (self._next_id[tdef.name], parent_id, i, val))
+
+    def _bulk_dict_row(self, cursor, tdef, data: dict, parent_id: int | None, clave: str | None = None):
+        _, vals = self._dict_row_values(tdef, data, parent_id)
+        self._next_id[tdef.name] += 1
+        new_id = self._next_id[tdef.name]
+        if tdef.keyed:
+            self._bulk_push(cursor, tdef, (new_id, clave, *vals))
+        else:
+            self._bulk_push(cursor, tdef, (new_id, *vals))
+
+        # hijos
+        for k, v in data.items():
+            if not isinstance(v, (dict, list)):
+                continue
+            child = self.tables.get(self._join_path(tdef.name, k))
+            if child is None:
+                continue
+            if child.kind == 'dict':
+                if isinstance(v, dict):
+                    self._bulk_dict_row(cursor, child, v, new_id)
+                else:
+                    for el in v:
+                        if isinstance(el, dict):
+                            self._bulk_dict_row(cursor, child, el, new_id)
+            else:
+                self._bulk_list_scalar(cursor, child, v, new_id)
+        return new_id
+
+    # ===================== LECTURA EN STREAMING =====================
+    @staticmethod
+    def _iter_json_stream(f, read_size: int = 1 << 16):
+        """
+        Recorre el objeto raíz de un JSON sin cargarlo entero.
+        Emite (clave, valor, es_elemento): los arrays top-level elemento a elemento
+        y el resto de valores top-level de una pieza.
+        """
+        dec = json.JSONDecoder()
+        buf = ""
+        pos = 0
+        eof = False
+
+        def fill(n=read_size):
+            nonlocal buf, pos, eof
+            chunk = f.read(n)
+            if not chunk:
+                eof = True
+            buf = buf[pos:] + chunk
+            pos = 0
+
+        def peek():
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos].isspace():
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return buf[pos] if pos < len(buf) else ""
+                fill()
+
+        def expect(ch):
+            nonlocal pos
+            if peek() != ch:
+                raise ValueError(f"JSON inválido: se esperaba '{ch}' en la posición {pos}.")
+            pos += 1
+
+        def value():
+            nonlocal pos
+            peek()
+            n = read_size
+            while True:
+                try:
+                    obj, end = dec.raw_decode(buf, pos)
+                    # un número al final del bloque puede estar cortado
+                    if end < len(buf) or eof:
+                        pos = end
+                        return obj
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                fill(n)
+                n *= 2
+
+        expect("{")
+        if peek() == "}":
+            return
+        while True:
+            key = value()
+            expect(":")
+            if peek() == "[":
+                expect("[")
+                if peek() == "]":
+                    pos += 1
+                else:
+                    while True:
+                        yield key, value(), True
+                        if peek() == ",":
+                            pos += 1
+                            continue
+                        expect("]")
+                        break
+            else:
+                yield key, value(), False
+            if peek() == ",":
+                pos += 1
+                continue
+            expect("}")
+            break
+
+    def _load_stream(self, json_path: str, sample_size: int, chunk_size: int):
+        """
+        Carga incremental: infiere con una muestra de sample_size elementos por clave,
+        crea las tablas y va insertando; si un elemento posterior trae tablas, columnas
+        o tipos nuevos se aplican con CREATE/ALTER antes de insertarlo.
+        """
+        self.tables.clear(); self.edges.clear(); self._schema_changes.clear()
+        self._conn = mysql.connector.connect(**self.DB)
+        self._cur = self._conn.cursor()
+        try:
+            self._drop_entire_schema(self._cur, self.DB["database"])
+            self._conn.commit()
+            self._bulk_reset(chunk_size)
+
+            def insert(top_table, el):
+                row = el if isinstance(el, dict) else {"valor": el}
+                self._bulk_dict_row(self._cur, self.tables[top_table], row, parent_id=None)
+
+            def flush_sample(top_table, sample):
+                for el in sample:
+                    self._infer_value(top_table, el, parent_table=None, relname=None)
+                self._bulk_flush(self._cur)
+                self._apply_schema_changes(self._cur)
+                for el in sample:
+                    insert(top_table, el)
+                sample.clear()
+
+            with open(json_path, "r", encoding="utf-8") as f:
+                current = None
+                sample = []
+                sampling = False
+                for key, el, _ in self._iter_json_stream(f):
+                    top_table = self._ident(key)
+                    if top_table != current:
+                        if sample:
+                            flush_sample(current, sample)
+                        current = top_table
+                        sampling = True
+                    if sampling:
+                        sample.append(el)
+                        if len(sample) >= sample_size:
+                            flush_sample(current, sample)
+                            sampling = False
+                        continue
+                    self._infer_value(top_table, el, parent_table=None, relname=None)
+                    if self._schema_changes:
+                        self._bulk_flush(self._cur)
+                        self._apply_schema_changes(self._cur)
+                    insert(top_table, el)
+                if sample:
+                    flush_sample(current, sample)
+
+            self._bulk_flush(self._cur)
+            self._conn.commit()
+        finally:
+            self._cur.close()
+            self._conn.close()
+            self._cur = None; self._conn = None
+        return True
+
+    # ===================== SYNC (DIFERENCIAL) =====================
+    # Cada fila raíz guarda en `_clave` el hash de todo su subárbol. Al resincronizar,
+    # las filas cuyo hash sigue presente se dejan como están (con todos sus hijos),
+    # las nuevas se insertan por bloques y las que han desaparecido se borran
+    # (ON DELETE CASCADE se lleva sus hijos).
+    @staticmethod
+    def _content_key(row) -> str:
+        canon = json.dumps(row, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+        return hashlib.sha1(canon.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _db_type(column_type: str) -> str:
+        """Traduce COLUMN_TYPE de information_schema a los tipos del bridge."""
+        ct = (column_type or "").lower()
+        if ct.startswith("tinyint(1)"): return "TINYINT(1)"
+        if ct.startswith("int"):        return "INT"
+        if ct.startswith("double"):     return "DOUBLE"
+        return "TEXT"
+
+    def _sync_schema(self, cursor, dbname: str):
+        """Crea las tablas que faltan y añade/amplía columnas; devuelve las tablas sobrantes."""
+        cursor.execute("""
+            SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE
+            FROM information_schema.columns
+            WHERE table_schema = %s
+        """, (dbname,))
+        existing = defaultdict(dict)
+        for tname, col, ctype in cursor.fetchall():
+            existing[tname][col] = ctype
+
+        ddl = []
+        for tname in self._topo_tables():
+            t = self.tables[tname]
+            if tname not in existing:
+                ddl.append(self._create_table_sql(t))
+                continue
+            db_cols = existing[tname]
+            if t.keyed and "_clave" not in db_cols:
+                ddl.append(f"ALTER TABLE `{tname}` ADD COLUMN `_clave` VARCHAR(64) DEFAULT NULL"
+                           f" AFTER `Identificador`, ADD KEY `ix__clave` (`_clave`);")
+            if t.kind != 'dict':
+                continue
+            for c, typ in t.columns.items():
+                col = self._ident(c)
+                if col not in db_cols:
+                    ddl.append(f"ALTER TABLE `{tname}` ADD COLUMN `{col}` {typ} DEFAULT NULL;")
+                    continue
+                db_typ = self._db_type(db_cols[col])
+                merged = self._merge_type(db_typ, typ)
+                if merged != db_typ:
+                    ddl.append(f"ALTER TABLE `{tname}` MODIFY COLUMN `{col}` {merged} DEFAULT NULL;")
+                t.columns[c] = merged
+        if ddl:
+            self._invalidate_catalog()
+        for sql in ddl:
+            cursor.execute(sql)
+        self._schema_changes.clear()
+        return {tname: cols for tname, cols in existing.items() if tname not in self.tables}
+
+    def _sync(self, root: dict, chunk_size: int):
+        for tname, t in self.tables.items():
+            t.keyed = t.parent is None
+
+        self._conn = mysql.connector.connect(**self.DB)
+        self._cur = self._conn.cursor()
+        try:
+            orphans = self._sync_schema(self._cur, self.DB["database"])
+            self._conn.commit()
+
+            self._bulk_reset(chunk_size)
+            for tname in self.tables:
+                self._cur.execute(f"SELECT COALESCE(MAX(`Identificador`), 0) FROM `{tname}`")
+                self._next_id[tname] = self._cur.fetchone()[0]
+
+            self.sync_stats = {}
+            stale = {}
+            for top_key, top_val in root.items():
+                tdef = self.tables.get(self._ident(top_key))
+                if tdef is None:
+                    continue  # lista vacía: la tabla queda como sobrante
+                self._cur.execute(f"SELECT `_clave`, `Identificador` FROM `{tdef.name}`")
+                old = defaultdict(list)
+                for clave, ident in self._cur.fetchall():
+                    old[clave].append(ident)
+
+                st = self.sync_stats[tdef.name] = {"sin_cambios": 0, "insertadas": 0, "borradas": 0}
+                seen = defaultdict(int)
+                rows = top_val if isinstance(top_val, list) else [top_val]
+                for el in rows:
+                    row = el if isinstance(el, dict) else {"valor": el}
+                    h = self._content_key(row)
+                    seen[h] += 1
+                    # elementos repetidos: el n-ésimo igual tiene su propia clave
+                    clave = h if seen[h] == 1 else f"{h}#{seen[h]}"
+                    if old.get(clave):
+                        old[clave].pop()
+                        st["sin_cambios"] += 1
+                    else:
+                        self._bulk_dict_row(self._cur, tdef, row, parent_id=None, clave=clave)
+                        st["insertadas"] += 1
+                stale[tdef.name] = [i for ids in old.values() for i in ids]
+            self._bulk_flush(self._cur)
+
+            for tname, ids in stale.items():
+                for i in range(0, len(ids), self.chunk_size):
+                    part = ids[i:i + self.chunk_size]
+                    self._cur.execute(f"DELETE FROM `{tname}` WHERE `Identificador` IN ({', '.join(['%s'] * len(part))})",
+                                      part)
+                self.sync_stats[tname]["borradas"] = len(ids)
+            # tablas raíz que ya no vienen en el JSON: se vacían
+            for tname, cols in orphans.items():
+                if "_clave" in cols:
+                    self._cur.execute(f"DELETE FROM `{tname}`")
+            self._conn.commit()
+        except Exception:
+            self._conn.rollback()
+            raise
+        finally:
+            self._cur.close()
+            self._conn.close()
+            self._cur = None; self._conn = None
+        return True
+
+    # ===================== CARGA EN PARALELO =====================
+    # Cada clave top-level es un árbol de tablas independiente (sin FKs entre árboles),
+    # así que cada uno se carga en su propio hilo, con su conexión del pool y en su
+    # propia transacción. Dentro del árbol se mantiene el orden de _topo_tables.
+    def _subtree_tables(self, root_table: str) -> set[str]:
+        out = set()
+        pending = [root_table]
+        while pending:
+            t = pending.pop()
+            out.add(t)
+            pending.extend(self.tables[t].children)
+        return out
+
+    def _load_subtree(self, pool, top_table: str, top_val, chunk_size: int) -> dict:
+        """Carga un árbol top-level con una copia del bridge (buffers propios)."""
+        worker = copy.copy(self)
+        worker._bulk_reset(chunk_size)
+        subtree = self._subtree_tables(top_table)
+        worker._bulk_order = [t for t in worker._bulk_order if t in subtree]
+
+        conn = pool.get_connection()
+        cur = conn.cursor()
+        try:
+            tdef = self.tables[top_table]
+            rows = top_val if isinstance(top_val, list) else [top_val]
+            for el in rows:
+                row = el if isinstance(el, dict) else {"valor": el}
+                worker._bulk_dict_row(cur, tdef, row, parent_id=None)
+            worker._bulk_flush(cur)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()  # vuelve al pool
+        return worker.load_stats
+
+    def _load_parallel(self, root: dict, workers: int, chunk_size: int):
+        trees = [(self._ident(k), v) for k, v in root.items() if self._ident(k) in self.tables]
+        workers = max(1, min(int(workers), len(trees), 32))  # 32: máximo de MySQLConnectionPool
+        pool = mysql.connector.pooling.MySQLConnectionPool(
+            pool_name=self._cap_name(f"jvorm_{self.DB['database']}_{id(self)}", 64),
+            pool_size=workers,
+            **self.DB,
+        )
+        self.load_stats = {}
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futures = [ex.submit(self._load_subtree, pool, t, v, chunk_size) for t, v in trees]
+            for fut in futures:
+                self.load_stats.update(fut.result())
+        return True
+
     # ===================== API (WRITE) =====================
-    def load_from_json(self, json_path: str | None = None):
-        """Borra todas las tablas y carga el JSON a MySQL."""
+    def load_from_json(self, json_path: str | None = None, bulk: bool = False, chunk_size: int = 1000,
+                       stream: bool = False, sample_size: int = 1000, sync: bool = False, parallel: int = 0):
+        """
+        Borra todas las tablas y carga el JSON a MySQL.
+        Con stream=True el fichero se lee por elementos en vez de con json.load.
+        Con sync=True no se borra nada: ver load_from_dict.
+        """
         jp = json_path or self.JSON_PATH
+        if stream and sync:
+            raise ValueError("Los modos stream y sync no se pueden combinar.")
+        if stream:
+            return self._load_stream(jp, sample_size=max(1, int(sample_size)), chunk_size=chunk_size)
         with open(jp, "r", encoding="utf-8") as f:
             root = json.load(f)
-        return self.load_from_dict(root)
+        return self.load_from_dict(root, bulk=bulk, chunk_size=chunk_size, sync=sync, parallel=parallel)
 
-    def load_from_dict(self, root: dict):
+    def load_from_dict(self, root: dict, bulk: bool = False, chunk_size: int = 1000, sync: bool = False,
+                       parallel: int = 0):
+        """
+        Infiere el esquema, recrea las tablas e inserta los datos.
+        Con bulk=True las filas se envían por bloques de chunk_size y en
+        self.load_stats queda el rendimiento (filas, segundos, filas/s) por tabla.
+        Con sync=True no se recrea nada: se comparan tablas y columnas con
+        information_schema, se aplican solo los ALTER necesarios y se insertan o
+        borran las filas raíz cuyo contenido ha cambiado (resumen en self.sync_stats).
+        Con parallel=N (N > 1) cada clave top-level se inserta en bloque desde uno
+        de N hilos con conexiones de un pool, una transacción por árbol.
+        """
         if not isinstance(root, dict):
             raise ValueError("El JSON raíz debe ser un objeto: cada clave es una tabla padre top-level.")
+        if sync and parallel > 1:
+            raise ValueError("Los modos sync y parallel no se pueden combinar.")
 
         # Inferencia de esquema
-        self.tables.clear(); self.edges.clear()
+        self.tables.clear(); self.edges.clear(); self._schema_changes.clear()
         for top_key, top_val in root.items():
             top_table = self._ident(top_key)
             if isinstance(top_val, list):
@@ -291,6 +782,9 @@ class JsonMySQLBridge:
             else:
                 self._infer_value(top_table, top_val, parent_table=None, relname=None)
 
+        if sync:
+            return self._sync(root, chunk_size)
+
         # Conectar, reset y crear
         self._conn = mysql.connector.connect(**self.DB)
         self._cur = self._conn.cursor()
@@ -299,17 +793,30 @@ class JsonMySQLBridge:
         self._create_all(self._cur)
         self._conn.commit()
 
+        if parallel > 1:
+            self._cur.close()
+            self._conn.close()
+            self._cur = None; self._conn = None
+            return self._load_parallel(root, parallel, chunk_size)
+
         # Insertar datos
+        if bulk:
+            self._bulk_reset(chunk_size)
+            insert_row = self._bulk_dict_row
+        else:
+            insert_row = self._insert_dict_row
         for top_key, top_val in root.items():
             top_table = self.tables[self._ident(top_key)]
             if isinstance(top_val, list):
                 for el in top_val:
                     row = el if isinstance(el, dict) else {"valor": el}
-                    self._insert_dict_row(self._cur, top_table, row, parent_id=None)
+                    insert_row(self._cur, top_table, row, parent_id=None)
             elif isinstance(top_val, dict):
-                self._insert_dict_row(self._cur, top_table, top_val, parent_id=None)
+                insert_row(self._cur, top_table, top_val, parent_id=None)
             else:
-                self._insert_dict_row(self._cur, top_table, {"valor": top_val}, parent_id=None)
+                insert_row(self._cur, top_table, {"valor": top_val}, parent_id=None)
+        if bulk:
+            self._bulk_flush(self._cur)
 
         self._conn.commit()
         self._cur.close()
@@ -334,10 +841,8 @@ class JsonMySQLBridge:
             return child[len(prefix):]
         return child
 
-    def dump_to_json(self, output_path: str = "./dump_recuperado.json") -> dict:
-        """Lee toda la BD y reconstruye el dict raíz; además, guarda el JSON."""
-        conn = mysql.connector.connect(**self.DB)
-        cur = conn.cursor()
+    def _read_catalog(self, cur) -> dict:
+        """Tablas, columnas y relaciones padre/hijo del esquema (information_schema)."""
         db = self.DB["database"]
 
         # Tablas
@@ -349,16 +854,16 @@ class JsonMySQLBridge:
         if not tables:
             raise RuntimeError("No hay tablas en la base de datos.")
 
-        # Columnas
-        table_columns = {}
-        for t in tables:
-            rows = self._fetchall_dict(cur, """
-                SELECT COLUMN_NAME
-                FROM information_schema.columns
-                WHERE table_schema=%s AND table_name=%s
-                ORDER BY ORDINAL_POSITION
-            """, (db, t))
-            table_columns[t] = [r["COLUMN_NAME"] for r in rows]
+        # Columnas (una sola consulta para todo el esquema)
+        table_columns = {t: [] for t in tables}
+        for r in self._fetchall_dict(cur, """
+            SELECT TABLE_NAME, COLUMN_NAME
+            FROM information_schema.columns
+            WHERE table_schema=%s
+            ORDER BY TABLE_NAME, ORDINAL_POSITION
+        """, (db,)):
+            if r["TABLE_NAME"] in table_columns:
+                table_columns[r["TABLE_NAME"]].append(r["COLUMN_NAME"])
 
         # FKs
         rels = self._fetchall_dict(cur, """
@@ -382,55 +887,137 @@ class JsonMySQLBridge:
             fk_col_of_child[child] = r["child_column"]
             children_of[parent].append(child)
 
-        root_tables = [t for t in tables if t not in parent_of]
+        return dict(
+            tables=tables,
+            table_columns=table_columns,
+            parent_of=parent_of,
+            fk_col_of_child=fk_col_of_child,
+            children_of=children_of,
+            root_tables=[t for t in tables if t not in parent_of],
+        )
+
+    # ===================== CACHÉ DE CATÁLOGO =====================
+    # El catálogo se guarda (en memoria y en CATALOG_CACHE) junto a una huella del
+    # esquema: nº de tablas y máximos de CREATE_TIME/UPDATE_TIME. Si la huella no
+    # cambia se reutiliza sin volver a consultar columnas ni FKs. Cualquier DDL
+    # lanzado por el propio bridge lo invalida explícitamente.
+    def _catalog_key(self) -> str:
+        return f"{self.DB['host']}/{self.DB['database']}"
+
+    def _schema_fingerprint(self, cur) -> str:
+        cur.execute("""
+            SELECT COUNT(*), MAX(CREATE_TIME), MAX(UPDATE_TIME)
+            FROM information_schema.tables
+            WHERE table_schema=%s AND TABLE_TYPE='BASE TABLE'
+        """, (self.DB["database"],))
+        return "|".join(str(v) for v in cur.fetchone())
+
+    def _load_catalog_file(self) -> dict:
+        if not self.CATALOG_CACHE or not os.path.exists(self.CATALOG_CACHE):
+            return {}
+        try:
+            with open(self.CATALOG_CACHE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_catalog_file(self, data: dict):
+        if not self.CATALOG_CACHE:
+            return
+        tmp = self.CATALOG_CACHE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.CATALOG_CACHE)
+
+    def _invalidate_catalog(self):
+        self._catalog = None
+        self._catalog_fp = None
+        data = self._load_catalog_file()
+        if data.pop(self._catalog_key(), None) is not None:
+            self._save_catalog_file(data)
+
+    def _get_catalog(self, cur) -> dict:
+        """Catálogo del esquema, desde la caché si la huella coincide."""
+        fp = self._schema_fingerprint(cur)
+        if self._catalog is not None and self._catalog_fp == fp:
+            return self._catalog
+
+        entry = self._load_catalog_file().get(self._catalog_key())
+        if entry and entry.get("fingerprint") == fp:
+            cat = entry["catalog"]
+            cat["children_of"] = defaultdict(list, cat["children_of"])
+        else:
+            cat = self._read_catalog(cur)
+            data = self._load_catalog_file()
+            data[self._catalog_key()] = {"fingerprint": fp, "catalog": cat}
+            self._save_catalog_file(data)
+
+        self._catalog, self._catalog_fp = cat, fp
+        return cat
+
+    def _build_node(self, cat: dict, table: str, row: dict, child_rows) -> dict:
+        """Reconstruye un objeto; child_rows(hija, id_padre) da las filas hijas de esa fila."""
+        cols = cat["table_columns"][table]
+        fk_col = cat["fk_col_of_child"].get(table)
+        scalar_cols = [c for c in cols if c not in {"Identificador", "_clave", "idx", "valor"} and c != fk_col]
+
+        node = {}
+        for c in scalar_cols:
+            node[c] = row.get(c)
+
+        for child in cat["children_of"].get(table, []):
+            rel_field = self._child_field_name(table, child)
+            child_cols = set(cat["table_columns"][child])
+            rows_child = child_rows(child, row["Identificador"])
+            if not rows_child:
+                continue
+
+            if self._is_list_scalar_table(child_cols):
+                seq = sorted(
+                    [(rc.get("idx"), rc.get("valor")) for rc in rows_child],
+                    key=lambda x: (x[0] if x[0] is not None else 0)
+                )
+                node[rel_field] = [val for _, val in seq]
+            else:
+                if len(rows_child) == 1:
+                    node[rel_field] = self._build_node(cat, child, rows_child[0], child_rows)
+                else:
+                    node[rel_field] = [self._build_node(cat, child, r, child_rows) for r in rows_child]
+        return node
+
+    def dump_to_json(self, output_path: str = "./dump_recuperado.json", stream: bool = False) -> dict:
+        """
+        Lee toda la BD y reconstruye el dict raíz; además, guarda el JSON.
+        Con stream=True no se carga la BD en memoria (ver _dump_stream) y se
+        devuelve solo el número de objetos por tabla raíz.
+        """
+        if stream:
+            return self._dump_stream(output_path)
+
+        conn = mysql.connector.connect(**self.DB)
+        cur = conn.cursor()
+        cat = self._get_catalog(cur)
 
         # Cache de filas
         all_rows = {}
-        for t in tables:
+        for t in cat["tables"]:
             all_rows[t] = self._fetchall_dict(cur, f"SELECT * FROM `{t}`")
 
         # Indexados por padre
         child_rows_by_parent = defaultdict(list)
-        for child in parent_of:
-            fk = fk_col_of_child[child]
+        for child, fk in cat["fk_col_of_child"].items():
             for row in all_rows[child]:
                 pid = row.get(fk)
                 if pid is not None:
                     child_rows_by_parent[(child, pid)].append(row)
 
-        def build_node(table: str, row: dict) -> dict:
-            cols = table_columns[table]
-            fk_col = fk_col_of_child.get(table)
-            scalar_cols = [c for c in cols if c not in {"Identificador", "idx", "valor"} and c != fk_col]
-
-            node = {}
-            for c in scalar_cols:
-                node[c] = row.get(c)
-
-            for child in children_of.get(table, []):
-                rel_field = self._child_field_name(table, child)
-                child_cols = set(table_columns[child])
-                rows_child = child_rows_by_parent.get((child, row["Identificador"]), [])
-                if not rows_child:
-                    continue
-
-                if self._is_list_scalar_table(child_cols):
-                    seq = sorted(
-                        [(rc.get("idx"), rc.get("valor")) for rc in rows_child],
-                        key=lambda x: (x[0] if x[0] is not None else 0)
-                    )
-                    node[rel_field] = [val for _, val in seq]
-                else:
-                    if len(rows_child) == 1:
-                        node[rel_field] = build_node(child, rows_child[0])
-                    else:
-                        node[rel_field] = [build_node(child, r) for r in rows_child]
-            return node
+        def child_rows(child, pid):
+            return child_rows_by_parent.get((child, pid), [])
 
         result = {}
-        for rt in root_tables:
+        for rt in cat["root_tables"]:
             rows = sorted(all_rows[rt], key=lambda r: r["Identificador"])
-            result[rt] = [build_node(rt, r) for r in rows]
+            result[rt] = [self._build_node(cat, rt, r, child_rows) for r in rows]
 
         with open(output_path, "w", encoding="utf-8") as f:
             json.dump(result, f, ensure_ascii=False, indent=2)
@@ -438,6 +1025,104 @@ class JsonMySQLBridge:
         cur.close(); conn.close()
         return result
 
+    # ===================== DUMP EN STREAMING =====================
+    def _ordered_select(self, cat: dict, table: str) -> str:
+        """
+        SELECT de una tabla ordenado igual que se emiten las filas de su padre:
+        por la cadena de FKs desde la raíz y, al final, por su Identificador.
+        Así cada tabla hija avanza a la par que su padre (merge ordenado).
+        """
+        chain = []  # (alias, tabla) desde la propia tabla hacia arriba, sin la raíz
+        t = table
+        while t in cat["parent_of"]:
+            chain.append(t)
+            t = cat["parent_of"][t]
+        joins = []
+        order = []
+        for i, t in enumerate(chain):
+            if i > 0:
+                joins.append(f"JOIN `{t}` t{i} ON t{i - 1}.`{cat['fk_col_of_child'][chain[i - 1]]}` = t{i}.`Identificador`")
+            order.append(f"t{i}.`{cat['fk_col_of_child'][t]}`")
+        order.reverse()
+        order.append("t0.`Identificador`")
+        return f"SELECT t0.* FROM `{table}` t0 {' '.join(joins)} ORDER BY {', '.join(order)}"
+
+    @staticmethod
+    def _iter_rows(conn, sql: str, batch: int = 500):
+        cur = conn.cursor()  # sin buffer: las filas llegan del servidor según se piden
+        try:
+            cur.execute(sql)
+            cols = [d[0] for d in cur.description]
+            while True:
+                rows = cur.fetchmany(batch)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(zip(cols, row))
+        finally:
+            try:
+                cur.close()
+            except mysql.connector.Error:
+                pass  # resultado sin leer del todo: lo descarta el cierre de la conexión
+
+    def _dump_stream(self, output_path: str) -> dict:
+        """
+        Vuelca la BD recorriendo cada tabla raíz con un cursor sin buffer por tabla
+        (una conexión por cursor, MySQL no admite dos resultados abiertos en la misma)
+        y escribe cada objeto raíz en cuanto está completo. El fichero resultante
+        es idéntico al de dump_to_json normal.
+        """
+        conn = mysql.connector.connect(**self.DB)
+        cur = conn.cursor()
+        try:
+            cat = self._get_catalog(cur)
+        finally:
+            cur.close(); conn.close()
+
+        counts = {}
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write("{")
+            for n, rt in enumerate(cat["root_tables"]):
+                subtree = []
+                pending = [rt]
+                while pending:
+                    t = pending.pop()
+                    subtree.append(t)
+                    pending.extend(cat["children_of"].get(t, []))
 
+                conns = {}
+                streams = {}
+                heads = {}
+                try:
+                    for t in subtree:
+                        conns[t] = mysql.connector.connect(**self.DB)
+                        sql = f"SELECT * FROM `{t}` ORDER BY `Identificador`" if t == rt else self._ordered_select(cat, t)
+                        streams[t] = self._iter_rows(conns[t], sql)
+                        heads[t] = next(streams[t], None)
 
+                    def child_rows(child, pid):
+                        fk = cat["fk_col_of_child"][child]
+                        rows = []
+                        while heads[child] is not None and heads[child][fk] == pid:
+                            rows.append(heads[child])
+                            heads[child] = next(streams[child], None)
+                        return rows
 
+                    f.write(("," if n else "") + "\n  " + json.dumps(rt, ensure_ascii=False) + ": [")
+                    count = 0
+                    while heads[rt] is not None:
+                        row = heads[rt]
+                        heads[rt] = next(streams[rt], None)
+                        node = self._build_node(cat, rt, row, child_rows)
+                        body = json.dumps(node, ensure_ascii=False, indent=2).replace("\n", "\n    ")
+                        f.write(("," if count else "") + "\n    " + body)
+                        count += 1
+                    f.write("\n  ]" if count else "]")
+                    counts[rt] = count
+                finally:
+                    for s in streams.values():
+                        s.close()
+                    for c in conns.values():
+                        c.close()
+            f.write("\n}" if counts else "}")
+        return counts
@@ -6,15 +6,16 @@ Este programa permite realizar consultas sobre una base de datos de blog
 utilizando un modelo de lenguaje (Ollama) para generar SQL dinámicamente.
 """
 
-import subprocess
-import json
 import os
 
+from ollama_cliente import OllamaError, OllamaTimeoutError, obtener_cliente
+
 # Configuración
 SCHEMA_PATH = "blog.sql"
 MAX_SCHEMA_CHARS = 200_000
 MODELO_OLLAMA = "qwen2.5:7b-instruct-q4_0"
-OLLAMA_URL = "http://localhost:11434/api/generate"
+OLLAMA_BASE = "http://localhost:11434"
+TIMEOUT_RESPUESTA = 120  # Segundos máximos sin recibir texto del modelo
 
 
 def cargar_schema_sql(path):
@@ -86,54 +87,35 @@ def construir_prompt_completo(schema_sql, pregunta_usuario):
     return prompt_final
 
 
-def ejecutar_modelo_ollama(prompt):
+def ejecutar_modelo_ollama(prompt, al_recibir=None):
     """
     Ejecuta una llamada al modelo de lenguaje Ollama.
     
+    La respuesta llega en streaming (JSONL, línea por línea) por una conexión
+    HTTP reutilizable; cada trozo de texto se entrega a `al_recibir` en cuanto
+    llega, sin esperar a que el modelo termine.
+    
     Args:
         prompt (str): Prompt completo a enviar al modelo
+        al_recibir (callable): Función opcional que recibe cada trozo de texto
         
     Returns:
         str: Respuesta generada por el modelo
     """
-    # Construir el payload JSON para la API de Ollama
-    payload = {
-        "model": MODELO_OLLAMA,
-        "prompt": prompt,
-        "stream": True  # Ollama devuelve respuesta en formato JSONL (línea por línea)
-    }
+    cliente = obtener_cliente(OLLAMA_BASE)
+    trozos = []
     
     try:
-        # Ejecutar curl con subprocess
-        result = subprocess.run(
-            [
-                "curl", "-s", OLLAMA_URL,
-                "-d", json.dumps(payload)
-            ],
-            capture_output=True,
-            text=True,
-            timeout=120  # Timeout de 2 minutos
-        )
-        
-        # Procesar la respuesta JSONL
-        response = ""
-        lines = result.stdout.splitlines()
-        
-        for line in lines:
-            if not line.strip():
-                continue
-            try:
-                obj = json.loads(line)
-                if "response" in obj and obj["response"] is not None:
-                    response += obj["response"]
-            except json.JSONDecodeError:
-                continue
+        for trozo in cliente.generar_stream(MODELO_OLLAMA, prompt, timeout=TIMEOUT_RESPUESTA):
+            trozos.append(trozo)
+            if al_recibir is not None:
+                al_recibir(trozo)
         
-        return response.strip()
+        return "".join(trozos).strip()
     
-    except subprocess.TimeoutExpired:
+    except OllamaTimeoutError:
         return "[ERROR] Timeout: El modelo tardó demasiado en responder."
-    except Exception as e:
+    except OllamaError as e:
         return f"[ERROR] No se pudo ejecutar la consulta: {e}"
 
 
@@ -146,18 +128,17 @@ def mostrar_banner():
     print()
 
 
-def mostrar_respuesta(respuesta):
-    """
-    Muestra la respuesta del modelo de forma estructurada.
-    
-    Args:
-        respuesta (str): Respuesta generada por el modelo
-    """
+def mostrar_cabecera_respuesta():
+    """Muestra la cabecera del bloque de respuesta."""
     print("\n" + "=" * 70)
     print("RESPUESTA DEL SISTEMA:")
     print("=" * 70)
     print()
-    print(respuesta)
+
+
+def mostrar_pie_respuesta():
+    """Cierra el bloque de respuesta."""
+    print()
     print()
     print("=" * 70)
 
@@ -198,22 +179,21 @@ def main():
     # Paso 4: Ejecución del modelo
     print("[4/5] Enviando consulta al modelo Ollama...")
     print(f"      Modelo: {MODELO_OLLAMA}")
-    print(f"      URL: {OLLAMA_URL}")
-    print("      Esperando respuesta... (esto puede tardar unos segundos)")
+    print(f"      URL: {OLLAMA_BASE}/api/generate")
     print()
     
-    respuesta = ejecutar_modelo_ollama(prompt_completo)
+    # Paso 5: Presentación de la respuesta según se genera
+    print("[5/5] Presentando la respuesta (se muestra según la genera el modelo)...")
+    mostrar_cabecera_respuesta()
+    respuesta = ejecutar_modelo_ollama(
+        prompt_completo,
+        al_recibir=lambda trozo: print(trozo, end="", flush=True)
+    )
+    mostrar_pie_respuesta()
     
     if respuesta.startswith("[ERROR]"):
         print(f"      ✗ {respuesta}")
         return
-    else:
-        print("      ✓ Respuesta recibida del modelo")
-    print()
-    
-    # Paso 5: Presentación de la respuesta
-    print("[5/5] Procesando y presentando la respuesta...")
-    mostrar_respuesta(respuesta)
     
     print("\n[✓] Proceso completado exitosamente.")
 
@@ -0,0 +1,264 @@
+"""
+Cliente HTTP para Ollama
+========================
+
+Cliente compartido por las herramientas que llaman a la API REST de Ollama.
+Solo usa la biblioteca estándar y, frente a abrir una conexión (o lanzar
+curl) en cada llamada, ofrece:
+
+- Conexiones keep-alive reutilizadas (pool por servidor).
+- Streaming real: los fragmentos se entregan según llegan, línea a línea.
+- Timeouts de conexión y de lectura (OllamaTimeoutError).
+- Reintentos con espera exponencial ante errores de red y 429/502/503/504.
+- Límite de peticiones simultáneas (por defecto OLLAMA_NUM_PARALLEL).
+
+Uso:
+    cliente = obtener_cliente("http://localhost:11434")
+    texto = cliente.generar("llama3.1", "Hola")
+    for trozo in cliente.generar_stream("llama3.1", "Hola"):
+        print(trozo, end="", flush=True)
+"""
+
+import http.client
+import json
+import os
+import random
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+DEFAULT_BASE = os.environ.get("OLLAMA_BASE") or os.environ.get("OLLAMA_HOST") or "http://localhost:11434"
+DEFAULT_MAX_CONCURRENCIA = max(1, int(os.environ.get("OLLAMA_NUM_PARALLEL", "2") or 2))
+
+# Respuestas que merece la pena reintentar (servidor ocupado o reiniciándose)
+ESTADOS_REINTENTABLES = {429, 502, 503, 504}
+
+
+class OllamaError(RuntimeError):
+    """Error devuelto por Ollama o de comunicación con el servidor"""
+
+    def __init__(self, mensaje: str, estado: Optional[int] = None, detalle=None):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.detalle = detalle
+
+
+class OllamaTimeoutError(OllamaError, TimeoutError):
+    """Ollama no respondió (o dejó de enviar datos) dentro del timeout"""
+
+
+class ClienteOllama:
+    def __init__(self,
+                 base: str = DEFAULT_BASE,
+                 max_concurrencia: int = DEFAULT_MAX_CONCURRENCIA,
+                 timeout_conexion: float = 5.0,
+                 timeout_lectura: float = 300.0,
+                 reintentos: int = 2,
+                 espera_inicial: float = 0.5):
+        """
+        Args:
+            base: URL del servidor (p. ej. http://localhost:11434)
+            max_concurrencia: Peticiones simultáneas como máximo; el resto espera turno
+            timeout_conexion: Segundos para establecer la conexión TCP
+            timeout_lectura: Segundos máximos sin recibir datos del servidor
+            reintentos: Reintentos tras el primer intento fallido
+            espera_inicial: Espera antes del primer reintento (se duplica en cada uno)
+        """
+        partes = urlsplit(base if "://" in base else "http://" + base)
+        self.base = f"{partes.scheme}://{partes.netloc}"
+        self._https = partes.scheme == "https"
+        self._host = partes.hostname or "localhost"
+        self._puerto = partes.port or (443 if self._https else 80)
+        self._prefijo = partes.path.rstrip("/")
+        self.timeout_conexion = timeout_conexion
+        self.timeout_lectura = timeout_lectura
+        self.reintentos = reintentos
+        self.espera_inicial = espera_inicial
+        self._turnos = threading.BoundedSemaphore(max_concurrencia)
+        self._libres: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    # ---------- pool de conexiones ----------
+    def _nueva_conexion(self) -> http.client.HTTPConnection:
+        clase = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+        conn = clase(self._host, self._puerto, timeout=self.timeout_conexion)
+        conn.connect()
+        conn.sock.settimeout(self.timeout_lectura)
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return conn
+
+    def _tomar_conexion(self):
+        with self._lock:
+            if self._libres:
+                return self._libres.pop(), True
+        return self._nueva_conexion(), False
+
+    def _devolver_conexion(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            self._libres.append(conn)
+
+    def cerrar(self) -> None:
+        """Cierra las conexiones abiertas del pool"""
+        with self._lock:
+            libres, self._libres = self._libres, []
+        for conn in libres:
+            conn.close()
+
+    # ---------- petición con reintentos ----------
+    @contextmanager
+    def _peticion(self, metodo: str, ruta: str, payload: Optional[Dict] = None,
+                  timeout: Optional[float] = None):
+        """
+        Envía la petición y entrega la respuesta abierta (status 2xx).
+        La conexión vuelve al pool solo si la respuesta se leyó entera.
+        """
+        cuerpo = json.dumps(payload).encode("utf-8") if payload is not None else None
+        cabeceras = {"Connection": "keep-alive", "Accept": "application/json"}
+        if cuerpo is not None:
+            cabeceras["Content-Type"] = "application/json"
+
+        with self._turnos:
+            intento = 0
+            while True:
+                conn = None
+                try:
+                    conn, reutilizada = self._tomar_conexion()
+                    conn.sock.settimeout(timeout or self.timeout_lectura)
+                    try:
+                        conn.request(metodo, self._prefijo + ruta, body=cuerpo, headers=cabeceras)
+                        resp = conn.getresponse()
+                    except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                        if not reutilizada:
+                            raise
+                        # El servidor cerró una conexión ociosa del pool: abrir otra sin gastar reintento
+                        conn.close()
+                        conn = self._nueva_conexion()
+                        conn.request(metodo, self._prefijo + ruta, body=cuerpo, headers=cabeceras)
+                        resp = conn.getresponse()
+                except (OSError, http.client.HTTPException) as e:
+                    if conn is not None:
+                        conn.close()
+                    if isinstance(e, socket.timeout):
+                        # Reintentar una generación lenta solo duplicaría la espera
+                        raise OllamaTimeoutError(f"Ollama no respondió en {self.base}: {e}") from e
+                    if intento < self.reintentos:
+                        self._esperar(intento)
+                        intento += 1
+                        continue
+                    raise OllamaError(f"No se pudo conectar con Ollama en {self.base}: {e}") from e
+
+                if resp.status >= 300:
+                    detalle = resp.read().decode("utf-8", errors="replace")
+                    if resp.will_close:
+                        conn.close()
+                    else:
+                        self._devolver_conexion(conn)
+                    if resp.status in ESTADOS_REINTENTABLES and intento < self.reintentos:
+                        self._esperar(intento, resp.getheader("Retry-After"))
+                        intento += 1
+                        continue
+                    try:
+                        detalle = json.loads(detalle).get("error") or detalle
+                    except (ValueError, AttributeError):
+                        pass
+                    raise OllamaError(f"Ollama respondió {resp.status}: {detalle}",
+                                      estado=resp.status, detalle=detalle)
+                break
+
+            completa = False
+            try:
+                yield resp
+                completa = resp.isclosed() or not resp.read()
+            except socket.timeout as e:
+                raise OllamaTimeoutError(f"Ollama dejó de responder en {self.base}: {e}") from e
+            finally:
+                if completa and not resp.will_close:
+                    self._devolver_conexion(conn)
+                else:
+                    conn.close()
+
+    def _esperar(self, intento: int, retry_after: Optional[str] = None) -> None:
+        espera = self.espera_inicial * (2 ** intento)
+        if retry_after and retry_after.isdigit():
+            espera = max(espera, float(retry_after))
+        time.sleep(espera * random.uniform(0.8, 1.2))
+
+    # ---------- JSON ----------
+    def get_json(self, ruta: str, timeout: Optional[float] = None) -> Dict:
+        """GET de un endpoint JSON (p. ej. /api/version, /api/tags)"""
+        with self._peticion("GET", ruta, timeout=timeout) as resp:
+            return json.loads(resp.read() or b"{}")
+
+    def post_json(self, ruta: str, payload: Dict, timeout: Optional[float] = None) -> Dict:
+        """POST sin streaming: devuelve la respuesta JSON completa"""
+        payload = dict(payload, stream=False)
+        with self._peticion("POST", ruta, payload, timeout=timeout) as resp:
+            return json.loads(resp.read() or b"{}")
+
+    def post_stream(self, ruta: str, payload: Dict, timeout: Optional[float] = None) -> Iterator[Dict]:
+        """
+        POST con streaming: entrega cada objeto JSON según llega (una línea
+        por fragmento). Si el consumidor deja de iterar, la conexión se cierra.
+        """
+        payload = dict(payload, stream=True)
+        with self._peticion("POST", ruta, payload, timeout=timeout) as resp:
+            for linea in resp:
+                if not linea.strip():
+                    continue
+                try:
+                    obj = json.loads(linea)
+                except ValueError:
+                    continue
+                if obj.get("error"):
+                    raise OllamaError(f"Ollama: {obj['error']}", detalle=obj)
+                yield obj
+                if obj.get("done"):
+                    break
+
+    # ---------- atajos de la API ----------
+    def generar(self, modelo: str, prompt: str, opciones: Optional[Dict] = None,
+                timeout: Optional[float] = None, **extra) -> str:
+        """Llama a /api/generate y devuelve el texto completo"""
+        payload = {"model": modelo, "prompt": prompt, "options": opciones or {}, **extra}
+        return (self.post_json("/api/generate", payload, timeout).get("response") or "").strip()
+
+    def generar_stream(self, modelo: str, prompt: str, opciones: Optional[Dict] = None,
+                       timeout: Optional[float] = None, **extra) -> Iterator[str]:
+        """Llama a /api/generate y entrega los trozos de texto según se generan"""
+        payload = {"model": modelo, "prompt": prompt, "options": opciones or {}, **extra}
+        for obj in self.post_stream("/api/generate", payload, timeout):
+            if obj.get("response"):
+                yield obj["response"]
+
+    def chat(self, modelo: str, mensajes: List[Dict], opciones: Optional[Dict] = None,
+             timeout: Optional[float] = None, **extra) -> str:
+        """Llama a /api/chat y devuelve el contenido de la respuesta"""
+        payload = {"model": modelo, "messages": mensajes, "options": opciones or {}, **extra}
+        data = self.post_json("/api/chat", payload, timeout)
+        return (data.get("message", {}).get("content") or data.get("response") or "").strip()
+
+    def chat_stream(self, modelo: str, mensajes: List[Dict], opciones: Optional[Dict] = None,
+                    timeout: Optional[float] = None, **extra) -> Iterator[str]:
+        """Llama a /api/chat y entrega los trozos de texto según se generan"""
+        payload = {"model": modelo, "messages": mensajes, "options": opciones or {}, **extra}
+        for obj in self.post_stream("/api/chat", payload, timeout):
+            trozo = obj.get("message", {}).get("content")
+            if trozo:
+                yield trozo
+
+
+_clientes: Dict[str, ClienteOllama] = {}
+_clientes_lock = threading.Lock()
+
+
+def obtener_cliente(base: str = DEFAULT_BASE) -> ClienteOllama:
+    """Cliente compartido por servidor, para que todas las llamadas usen el mismo pool"""
+    clave = base.rstrip("/")
+    with _clientes_lock:
+        cliente = _clientes.get(clave)
+        if cliente is None:
+            cliente = _clientes[clave] = ClienteOllama(clave)
+        return cliente
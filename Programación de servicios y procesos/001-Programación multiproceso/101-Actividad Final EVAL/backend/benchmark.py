@@ -0,0 +1,400 @@
+"""
+Benchmark reproducible del procesador de imágenes
+Genera un corpus fijo de imágenes de varios tamaños y mide cada filtro en cada
+modo de ejecución (secuencial, threads, procesos) con calentamiento y varias
+repeticiones. Los resultados se guardan en JSON/CSV y se pueden comparar con
+una línea base para detectar regresiones al cambiar los filtros
+"""
+
+import os
+import sys
+import io
+import csv
+import json
+import math
+import time
+import random
+import argparse
+import platform
+import multiprocessing
+from contextlib import redirect_stdout
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from PIL import Image
+from filtros import aplicar_filtro, FiltrosImagen
+from procesador import ProcesadorImagenes
+
+# generar_imagenes_prueba.py está en la carpeta del proyecto
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from generar_imagenes_prueba import crear_imagen_gradiente, crear_imagen_geometrica, crear_imagen_patron
+
+
+# Tamaños del corpus: nombre -> (ancho, alto)
+TAMANIOS = {
+    'pequena': (640, 480),
+    'mediana': (1280, 960),
+    'grande': (2560, 1920),
+}
+
+MODOS = ('secuencial', 'threads', 'procesos')
+
+# Semilla fija: el corpus es idéntico en cada máquina y ejecución
+SEMILLA = 2024
+
+
+def _filtro_cronometrado(ruta_entrada, ruta_salida, nombre_filtro):
+    """
+    Aplica un filtro y mide cuánto tarda (decodificar + filtrar + codificar)
+    Función independiente para ser usada en procesamiento paralelo
+    
+    Returns:
+        Tupla (resultado, segundos)
+    """
+    inicio = time.perf_counter()
+    resultado = aplicar_filtro(ruta_entrada, ruta_salida, nombre_filtro)
+    return resultado, time.perf_counter() - inicio
+
+
+class ProcesadorMedido(ProcesadorImagenes):
+    """
+    ProcesadorImagenes que además guarda el tiempo de cada imagen
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self.tiempos = []
+    
+    def _aplicar_filtro(self, ruta_entrada, ruta_salida, filtro):
+        return _filtro_cronometrado, (ruta_entrada, ruta_salida, filtro)
+    
+    def _resultado_tarea(self, resultado):
+        resultado, segundos = resultado
+        with self.lock:
+            self.tiempos.append(segundos)
+        return resultado
+    
+    def procesar_secuencial(self, imagenes, filtro, directorio_salida):
+        """
+        Procesa las imágenes una tras otra en este proceso (referencia de un núcleo)
+        """
+        Path(directorio_salida).mkdir(parents=True, exist_ok=True)
+        for ruta_imagen in imagenes:
+            nombre_sin_ext, ext = os.path.splitext(os.path.basename(ruta_imagen))
+            ruta_salida = os.path.join(directorio_salida, f"{nombre_sin_ext}_{filtro}{ext}")
+            self._resultado_tarea(_filtro_cronometrado(ruta_imagen, ruta_salida, filtro))
+
+
+def generar_corpus(directorio, imagenes_por_tamanio=4, tamanios=None):
+    """
+    Genera (si no existe ya) el corpus fijo de imágenes del benchmark
+    
+    Args:
+        directorio: Directorio del corpus
+        imagenes_por_tamanio: Imágenes de cada tamaño (default: 4)
+        tamanios: Nombres de TAMANIOS a generar (default: todos)
+    
+    Returns:
+        Diccionario tamaño -> lista de rutas
+    """
+    tamanios = tamanios or list(TAMANIOS)
+    creadores = [
+        lambda ancho, alto, nombre: crear_imagen_gradiente(ancho, alto, (255, 0, 0), (0, 0, 255), nombre),
+        crear_imagen_geometrica,
+        crear_imagen_patron,
+    ]
+    
+    corpus = {}
+    for tamanio in tamanios:
+        ancho, alto = TAMANIOS[tamanio]
+        directorio_tamanio = os.path.join(directorio, tamanio)
+        Path(directorio_tamanio).mkdir(parents=True, exist_ok=True)
+        
+        rutas = []
+        for i in range(imagenes_por_tamanio):
+            nombre = f"{tamanio}_{i:02d}"
+            ruta = os.path.join(directorio_tamanio, f"{nombre}.jpg")
+            if not os.path.exists(ruta):
+                random.seed(f"{SEMILLA}-{nombre}")
+                imagen = creadores[i % len(creadores)](ancho, alto, nombre)
+                imagen.save(ruta, quality=95)
+            rutas.append(ruta)
+        corpus[tamanio] = rutas
+    
+    return corpus
+
+
+def _percentil(valores, p):
+    """
+    Percentil por rango más cercano (p entre 0 y 100)
+    """
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def _rss_pico_mb():
+    """
+    Memoria residente máxima de este proceso y de sus hijos, en MB
+    ru_maxrss es el máximo desde que arrancó el proceso, por eso cada
+    combinación se mide en un proceso nuevo (ver medir_aislado)
+    (None si no está disponible)
+    """
+    if resource is None:
+        return None
+    propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    divisor = 1024 * 1024 if platform.system() == 'Darwin' else 1024  # bytes en macOS, KB en Linux
+    return round(max(propio, hijos) / divisor, 1)
+
+
+def medir(imagenes, filtro, modo, directorio_salida, repeticiones=3, calentamiento=1):
+    """
+    Mide un filtro en un modo de ejecución sobre un conjunto de imágenes
+    
+    Args:
+        imagenes: Lista de rutas de imágenes
+        filtro: Nombre del filtro
+        modo: 'secuencial', 'threads' o 'procesos'
+        directorio_salida: Directorio temporal de salida
+        repeticiones: Repeticiones medidas (default: 3)
+        calentamiento: Repeticiones previas que no se miden (default: 1)
+    
+    Returns:
+        Diccionario con las métricas
+    """
+    megabytes = 0
+    for ruta in imagenes:
+        with Image.open(ruta) as imagen:
+            megabytes += imagen.width * imagen.height * len(imagen.getbands()) / (1024 * 1024)
+    
+    duraciones = []
+    tiempos_imagen = []
+    fallidas = 0
+    
+    for repeticion in range(calentamiento + repeticiones):
+        procesador = ProcesadorMedido()
+        inicio = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            if modo == 'secuencial':
+                procesador.procesar_secuencial(imagenes, filtro, directorio_salida)
+            elif modo == 'threads':
+                procesador.procesar_con_threads(imagenes, filtro, directorio_salida)
+            else:
+                procesador.procesar_con_procesos(imagenes, filtro, directorio_salida)
+        duracion = time.perf_counter() - inicio
+        
+        if repeticion >= calentamiento:
+            duraciones.append(duracion)
+            tiempos_imagen.extend(procesador.tiempos)
+            fallidas += procesador.estadisticas['fallidas']
+    
+    mediana = _percentil(duraciones, 50)
+    return {
+        'filtro': filtro,
+        'modo': modo,
+        'imagenes': len(imagenes),
+        'repeticiones': repeticiones,
+        'segundos': round(mediana, 4),
+        'imagenes_por_segundo': round(len(imagenes) / mediana, 2) if mediana else 0.0,
+        'mb_por_segundo': round(megabytes / mediana, 2) if mediana else 0.0,
+        'p50_ms': round(_percentil(tiempos_imagen, 50) * 1000, 2),
+        'p95_ms': round(_percentil(tiempos_imagen, 95) * 1000, 2),
+        'rss_pico_mb': _rss_pico_mb(),
+        'fallidas': fallidas,
+    }
+
+
+def _medir_en_hijo(conexion, args, kwargs):
+    """
+    Punto de entrada del proceso de medir_aislado: mide y envía el resultado
+    """
+    try:
+        conexion.send(('ok', medir(*args, **kwargs)))
+    except Exception as e:
+        conexion.send(('error', f"{type(e).__name__}: {e}"))
+    finally:
+        conexion.close()
+
+
+def medir_aislado(*args, **kwargs):
+    """
+    Ejecuta medir() en un proceso nuevo (spawn) para que el pico de memoria
+    corresponda solo a esa combinación y no arrastre el de las anteriores.
+    Recibe los mismos argumentos que medir()
+    
+    Returns:
+        Diccionario con las métricas
+    """
+    contexto = multiprocessing.get_context('spawn')
+    recibir, enviar = contexto.Pipe(duplex=False)
+    proceso = contexto.Process(target=_medir_en_hijo, args=(enviar, args, kwargs))
+    proceso.start()
+    enviar.close()
+    try:
+        estado, valor = recibir.recv()
+    except EOFError:
+        estado, valor = 'error', None
+    finally:
+        recibir.close()
+        proceso.join()
+    
+    if valor is None:
+        valor = f"el proceso de medida terminó con código {proceso.exitcode}"
+    
+    if estado != 'ok':
+        raise RuntimeError(f"Fallo al medir {args[1:3]}: {valor}")
+    return valor
+
+
+def ejecutar_benchmark(filtros=None, modos=MODOS, tamanios=None, repeticiones=3,
+                       calentamiento=1, imagenes_por_tamanio=4, directorio='../.benchmark'):
+    """
+    Ejecuta el benchmark completo: cada filtro en cada modo y tamaño
+    Cada combinación se mide en su propio proceso (medir_aislado)
+    
+    Args:
+        filtros: Filtros a medir (default: todos)
+        modos: Modos de ejecución (default: MODOS)
+        tamanios: Tamaños del corpus (default: todos)
+        repeticiones: Repeticiones medidas por combinación
+        calentamiento: Repeticiones de calentamiento por combinación
+        imagenes_por_tamanio: Imágenes de cada tamaño en el corpus
+        directorio: Directorio de trabajo (corpus y salidas temporales)
+    
+    Returns:
+        Diccionario con el entorno y la lista de resultados
+    """
+    filtros = filtros or list(FiltrosImagen.obtener_filtros_disponibles())
+    corpus = generar_corpus(os.path.join(directorio, 'corpus'), imagenes_por_tamanio, tamanios)
+    directorio_salida = os.path.join(directorio, 'salida')
+    
+    resultados = []
+    for tamanio, imagenes in corpus.items():
+        for filtro in filtros:
+            for modo in modos:
+                metricas = medir_aislado(imagenes, filtro, modo, directorio_salida,
+                                         repeticiones, calentamiento)
+                metricas['tamanio'] = tamanio
+                resultados.append(metricas)
+                print(f"📏 {tamanio:8} {filtro:14} {modo:10} "
+                      f"{metricas['imagenes_por_segundo']:8.2f} img/s "
+                      f"{metricas['mb_por_segundo']:8.2f} MB/s "
+                      f"p50 {metricas['p50_ms']:8.2f} ms  p95 {metricas['p95_ms']:8.2f} ms")
+    
+    return {
+        'entorno': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'nucleos': os.cpu_count(),
+            'pillow': Image.__version__,
+            'fecha': time.strftime('%Y-%m-%d %H:%M:%S'),
+        },
+        'resultados': resultados,
+    }
+
+
+def guardar_json(informe, ruta):
+    Path(ruta).parent.mkdir(parents=True, exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, ensure_ascii=False, indent=2)
+
+
+def guardar_csv(informe, ruta):
+    Path(ruta).parent.mkdir(parents=True, exist_ok=True)
+    campos = ['tamanio', 'filtro', 'modo', 'imagenes', 'repeticiones', 'segundos',
+              'imagenes_por_segundo', 'mb_por_segundo', 'p50_ms', 'p95_ms', 'rss_pico_mb', 'fallidas']
+    with open(ruta, 'w', encoding='utf-8', newline='') as f:
+        escritor = csv.DictWriter(f, fieldnames=campos)
+        escritor.writeheader()
+        for fila in informe['resultados']:
+            escritor.writerow({campo: fila.get(campo) for campo in campos})
+
+
+def comparar_con_base(informe, ruta_base, tolerancia=0.10):
+    """
+    Compara un informe con una línea base guardada
+    Hay regresión si las imágenes/s bajan o el p95 sube más que la tolerancia
+    
+    Args:
+        informe: Informe devuelto por ejecutar_benchmark
+        ruta_base: Ruta del JSON de la línea base
+        tolerancia: Variación relativa permitida (default: 10%)
+    
+    Returns:
+        Lista de regresiones (diccionarios con la combinación y los valores)
+    """
+    with open(ruta_base, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    
+    def clave(fila):
+        return (fila['tamanio'], fila['filtro'], fila['modo'])
+    
+    anteriores = {clave(fila): fila for fila in base['resultados']}
+    regresiones = []
+    
+    for fila in informe['resultados']:
+        anterior = anteriores.get(clave(fila))
+        if anterior is None:
+            continue
+        
+        if anterior['imagenes_por_segundo'] and \
+                fila['imagenes_por_segundo'] < anterior['imagenes_por_segundo'] * (1 - tolerancia):
+            regresiones.append({'combinacion': clave(fila), 'metrica': 'imagenes_por_segundo',
+                                'base': anterior['imagenes_por_segundo'],
+                                'actual': fila['imagenes_por_segundo']})
+        
+        if anterior['p95_ms'] and fila['p95_ms'] > anterior['p95_ms'] * (1 + tolerancia):
+            regresiones.append({'combinacion': clave(fila), 'metrica': 'p95_ms',
+                                'base': anterior['p95_ms'], 'actual': fila['p95_ms']})
+    
+    return regresiones
+
+
+def main():
+    """
+    Ejecuta el benchmark desde la línea de comandos
+    """
+    parser = argparse.ArgumentParser(description='Benchmark del procesador de imágenes')
+    parser.add_argument('--filtros', nargs='+', help='Filtros a medir (default: todos)')
+    parser.add_argument('--modos', nargs='+', choices=MODOS, default=list(MODOS))
+    parser.add_argument('--tamanios', nargs='+', choices=list(TAMANIOS))
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--calentamiento', type=int, default=1)
+    parser.add_argument('--imagenes', type=int, default=4, help='Imágenes por tamaño')
+    parser.add_argument('--directorio', default='../.benchmark')
+    parser.add_argument('--salida', default='../.benchmark/resultados',
+                        help='Ruta base de los resultados (sin extensión)')
+    parser.add_argument('--base', help='JSON de línea base con el que comparar')
+    parser.add_argument('--tolerancia', type=float, default=0.10)
+    args = parser.parse_args()
+    
+    print("="*60)
+    print("📏 BENCHMARK DEL PROCESADOR DE IMÁGENES")
+    print("="*60)
+    
+    informe = ejecutar_benchmark(args.filtros, args.modos, args.tamanios, args.repeticiones,
+                                 args.calentamiento, args.imagenes, args.directorio)
+    guardar_json(informe, args.salida + '.json')
+    guardar_csv(informe, args.salida + '.csv')
+    print(f"\n💾 Resultados: {args.salida}.json / {args.salida}.csv")
+    
+    if args.base:
+        regresiones = comparar_con_base(informe, args.base, args.tolerancia)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} regresiones respecto a {args.base}:")
+            for r in regresiones:
+                print(f"   {' / '.join(r['combinacion'])}: {r['metrica']} "
+                      f"{r['base']} → {r['actual']}")
+            sys.exit(1)
+        print(f"\n✅ Sin regresiones respecto a {args.base}")
+
+
+if __name__ == "__main__":
+    main()
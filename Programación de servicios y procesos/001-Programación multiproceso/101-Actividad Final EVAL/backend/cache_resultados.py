@@ -0,0 +1,224 @@
+"""
+Caché de resultados direccionada por contenido
+Evita recalcular una imagen ya procesada con el mismo filtro: la clave combina
+el hash del contenido de origen, el filtro, sus parámetros y la versión del
+código de los filtros
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+import numpy as np
+import PIL
+from filtros import aplicar_filtro
+
+
+# Módulos cuyo código determina el resultado de los filtros: filtros.py
+# delega el desenfoque, el enfoque y los bordes en convolucion.py
+MODULOS_FILTROS = ('filtros.py', 'convolucion.py')
+
+
+def _version_filtros():
+    """
+    Calcula la versión del código de filtros: hash de los módulos de
+    MODULOS_FILTROS (filtros.py y convolucion.py, del que dependen los
+    filtros de convolución) y de las versiones de Pillow y NumPy. Cualquier
+    cambio invalida la caché entera
+    """
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha1()
+    for nombre in MODULOS_FILTROS:
+        h.update(nombre.encode())
+        with open(os.path.join(directorio, nombre), 'rb') as f:
+            h.update(f.read())
+    h.update(f"PIL={PIL.__version__};numpy={np.__version__}".encode())
+    return h.hexdigest()[:16]
+
+
+VERSION_FILTROS = _version_filtros()
+
+
+def hash_archivo(ruta, tamanio_bloque=1024 * 1024):
+    """
+    Calcula el SHA-256 del contenido de un archivo leyéndolo por bloques
+    
+    Args:
+        ruta: Ruta del archivo
+        tamanio_bloque: Bytes leídos en cada bloque (default: 1 MB)
+    
+    Returns:
+        Hash en hexadecimal
+    """
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(tamanio_bloque), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class CacheResultados:
+    """
+    Caché en disco de imágenes procesadas con límite de tamaño (LRU)
+    Cada entrada es el archivo de salida tal cual se codificó; en un acierto
+    se copia (o enlaza) a la ruta de salida sin decodificar, filtrar ni
+    codificar. El objeto solo guarda configuración, así que se puede enviar
+    a los procesos del pool
+    """
+    
+    def __init__(self, directorio='../.cache_resultados', max_bytes=1024 * 1024 * 1024,
+                 enlazar=False):
+        """
+        Inicializa la caché
+        
+        Args:
+            directorio: Directorio donde se guardan las entradas
+            max_bytes: Tamaño máximo de la caché en disco (default: 1 GB)
+            enlazar: Usar enlaces duros en lugar de copias. Es más rápido y no
+                ocupa espacio extra, pero la salida y la entrada de la caché son
+                el mismo archivo: no modifiques las salidas en el sitio
+        """
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.enlazar = enlazar
+    
+    def clave(self, ruta_entrada, nombre_filtro, parametros=None, extension=''):
+        """
+        Calcula la clave de una imagen procesada
+        
+        Args:
+            ruta_entrada: Ruta de la imagen de origen
+            nombre_filtro: Nombre del filtro
+            parametros: Parámetros del filtro (opcional)
+            extension: Extensión de salida (determina el formato codificado)
+        
+        Returns:
+            Clave en hexadecimal
+        """
+        h = hashlib.sha256()
+        h.update(hash_archivo(ruta_entrada).encode())
+        h.update(json.dumps([nombre_filtro, parametros or {}, extension.lower(), VERSION_FILTROS],
+                            sort_keys=True).encode())
+        return h.hexdigest()
+    
+    def _ruta_entrada_cache(self, clave, extension):
+        return os.path.join(self.directorio, clave[:2], clave + extension.lower())
+    
+    def _volcar(self, origen, destino):
+        """
+        Copia o enlaza origen en destino de forma atómica
+        """
+        Path(destino).parent.mkdir(parents=True, exist_ok=True)
+        if self.enlazar:
+            # rename() no hace nada si ambos nombres ya son el mismo archivo
+            if os.path.exists(destino) and os.path.samefile(origen, destino):
+                return
+            temporal = f"{destino}.{os.getpid()}.tmp"
+            try:
+                os.link(origen, temporal)
+                os.replace(temporal, destino)
+                return
+            except OSError:
+                if os.path.exists(temporal):
+                    os.remove(temporal)
+        
+        fd, temporal = tempfile.mkstemp(dir=os.path.dirname(destino) or '.', suffix='.tmp')
+        os.close(fd)
+        try:
+            shutil.copyfile(origen, temporal)
+            os.replace(temporal, destino)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+    
+    def aplicar_filtro(self, ruta_entrada, ruta_salida, nombre_filtro, parametros=None):
+        """
+        Igual que filtros.aplicar_filtro pero pasando por la caché
+        Función independiente para ser usada en procesamiento paralelo
+        
+        Args:
+            ruta_entrada: Ruta de la imagen de entrada
+            ruta_salida: Ruta donde guardar la imagen procesada
+            nombre_filtro: Nombre del filtro a aplicar
+            parametros: Parámetros adicionales para el filtro (opcional)
+        
+        Returns:
+            Tupla (resultado, acierto): resultado como en aplicar_filtro y
+            acierto True si la salida salió de la caché
+        """
+        extension = os.path.splitext(ruta_salida)[1]
+        try:
+            clave = self.clave(ruta_entrada, nombre_filtro, parametros, extension)
+        except OSError:
+            return aplicar_filtro(ruta_entrada, ruta_salida, nombre_filtro, parametros), False
+        
+        ruta_cache = self._ruta_entrada_cache(clave, extension)
+        if os.path.exists(ruta_cache):
+            try:
+                self._volcar(ruta_cache, ruta_salida)
+                os.utime(ruta_cache)  # Marca de uso reciente para el LRU
+                return True, True
+            except OSError:
+                pass
+        
+        # Una salida anterior enlazada a la caché no debe sobrescribirse en el sitio
+        if self.enlazar and os.path.exists(ruta_salida):
+            os.remove(ruta_salida)
+        
+        resultado = aplicar_filtro(ruta_entrada, ruta_salida, nombre_filtro, parametros)
+        if resultado:
+            try:
+                self._volcar(ruta_salida, ruta_cache)
+            except OSError as e:
+                print(f"⚠️  No se pudo guardar en caché {ruta_salida}: {e}")
+        return resultado, False
+    
+    def tamanio(self):
+        """
+        Devuelve el tamaño total en bytes de las entradas de la caché
+        """
+        return sum(tamanio for _, _, tamanio in self._entradas())
+    
+    def _entradas(self):
+        if not os.path.isdir(self.directorio):
+            return []
+        entradas = []
+        for subdirectorio in os.scandir(self.directorio):
+            if not subdirectorio.is_dir():
+                continue
+            for entrada in os.scandir(subdirectorio.path):
+                if entrada.is_file() and not entrada.name.endswith('.tmp'):
+                    info = entrada.stat()
+                    entradas.append((info.st_mtime, entrada.path, info.st_size))
+        return entradas
+    
+    def recortar(self):
+        """
+        Elimina las entradas usadas hace más tiempo hasta quedar por debajo
+        de max_bytes
+        
+        Returns:
+            Número de entradas eliminadas
+        """
+        entradas = sorted(self._entradas())
+        total = sum(tamanio for _, _, tamanio in entradas)
+        eliminadas = 0
+        for _, ruta, tamanio in entradas:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(ruta)
+            except OSError:
+                continue
+            total -= tamanio
+            eliminadas += 1
+        return eliminadas
+    
+    def limpiar(self):
+        """
+        Vacía la caché por completo
+        """
+        shutil.rmtree(self.directorio, ignore_errors=True)
@@ -0,0 +1,358 @@
+"""
+Motor de convolución separable con NumPy
+Generaliza el blur gaussiano por franjas del ejercicio 003-Hilos/010-multi.py:
+cualquier núcleo separable (gaussiano, Sobel, unsharp...) se aplica como dos
+pasadas 1D con relleno reflect, repartiendo la imagen en franjas horizontales
+con solape (halo) entre hilos o procesos según el tamaño de la imagen
+"""
+
+import math
+import atexit
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+
+
+# Por debajo de este número de píxeles no compensa repartir la imagen
+UMBRAL_HILOS = 512 * 512
+
+# A partir de este número de píxeles se usan procesos en lugar de hilos
+UMBRAL_PROCESOS = 4096 * 4096
+
+# Filas mínimas de cada franja (sin contar el halo)
+FILAS_MINIMAS = 128
+
+# Núcleos 1D de Sobel: derivada y suavizado
+SOBEL_DERIVADA = np.array([-1.0, 0.0, 1.0], dtype=np.float32)
+SOBEL_SUAVIZADO = np.array([1.0, 2.0, 1.0], dtype=np.float32)
+
+
+def kernel_gaussiano(sigma, radio=None):
+    """
+    Genera un núcleo gaussiano 1D normalizado
+    
+    Args:
+        sigma: Desviación típica
+        radio: Radio del núcleo (default: ceil(3 * sigma))
+    
+    Returns:
+        Array float32 de tamaño 2 * radio + 1
+    """
+    if sigma <= 0:
+        return np.array([1.0], dtype=np.float32)
+    if radio is None:
+        radio = int(math.ceil(3.0 * sigma))
+    x = np.arange(-radio, radio + 1, dtype=np.float32)
+    k = np.exp(-(x ** 2) / (2 * sigma * sigma))
+    k /= k.sum()
+    return k.astype(np.float32)
+
+
+def _en_proceso_principal():
+    """
+    Indica si se está en el hilo principal del proceso principal
+    Dentro de un worker (hilo o proceso) no se vuelve a paralelizar para no
+    multiplicar hilos/procesos por encima de los núcleos
+    """
+    return (multiprocessing.parent_process() is None
+            and threading.current_thread() is threading.main_thread())
+
+
+class MotorConvolucion:
+    """
+    Aplica convoluciones separables a arrays (alto, ancho, canales)
+    Reutiliza los buffers float32 entre llamadas (uno por hilo) y elige
+    automáticamente el número de franjas y el backend (secuencial, hilos o
+    procesos) según el tamaño de la imagen
+    """
+    
+    def __init__(self, max_workers=None, umbral_hilos=UMBRAL_HILOS,
+                 umbral_procesos=UMBRAL_PROCESOS, filas_minimas=FILAS_MINIMAS):
+        """
+        Inicializa el motor
+        
+        Args:
+            max_workers: Número máximo de hilos/procesos (default: núcleos)
+            umbral_hilos: Píxeles a partir de los cuales se usan hilos
+            umbral_procesos: Píxeles a partir de los cuales se usan procesos
+            filas_minimas: Filas mínimas por franja
+        """
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self.umbral_hilos = umbral_hilos
+        self.umbral_procesos = umbral_procesos
+        self.filas_minimas = filas_minimas
+        self._locales = threading.local()
+        self._lock = threading.Lock()
+        self._pool_hilos = None
+        self._pool_procesos = None
+    
+    def _buffer(self, nombre, forma):
+        """
+        Devuelve un buffer float32 de este hilo con la forma pedida
+        Se reutiliza mientras la forma no cambie
+        """
+        buffers = getattr(self._locales, 'buffers', None)
+        if buffers is None:
+            buffers = self._locales.buffers = {}
+        buffer = buffers.get(nombre)
+        if buffer is None or buffer.shape != forma:
+            buffer = buffers[nombre] = np.empty(forma, dtype=np.float32)
+        return buffer
+    
+    def _pasada(self, entrada, kernel, eje, nombre):
+        """
+        Convolución 1D con relleno reflect a lo largo de un eje (0 o 1)
+        
+        Returns:
+            Buffer reutilizable con el resultado (válido hasta la siguiente
+            pasada con el mismo nombre en este hilo)
+        """
+        radio = (kernel.size - 1) // 2
+        salida = self._buffer(nombre, entrada.shape)
+        if radio == 0:
+            np.multiply(entrada, kernel[0], out=salida)
+            return salida
+        
+        longitud = entrada.shape[eje]
+        if radio >= longitud - 1:
+            # Reflejos múltiples: caso raro, se delega en np.pad
+            ancho_relleno = [(0, 0)] * entrada.ndim
+            ancho_relleno[eje] = (radio, radio)
+            relleno = np.pad(entrada, ancho_relleno, mode='reflect')
+        else:
+            forma_relleno = list(entrada.shape)
+            forma_relleno[eje] += 2 * radio
+            relleno = self._buffer(nombre + '_relleno', tuple(forma_relleno))
+            vista = np.moveaxis(relleno, eje, 0)
+            origen = np.moveaxis(entrada, eje, 0)
+            vista[radio:radio + longitud] = origen
+            vista[:radio] = origen[radio:0:-1]
+            vista[radio + longitud:] = origen[longitud - 2:longitud - 2 - radio:-1]
+        
+        temporal = self._buffer(nombre + '_tmp', entrada.shape)
+        vista_relleno = np.moveaxis(relleno, eje, 0)
+        vista_salida = np.moveaxis(salida, eje, 0)
+        vista_temporal = np.moveaxis(temporal, eje, 0)
+        
+        np.multiply(vista_relleno[0:longitud], kernel[0], out=vista_salida)
+        for desplazamiento in range(1, kernel.size):
+            np.multiply(vista_relleno[desplazamiento:desplazamiento + longitud],
+                        kernel[desplazamiento], out=vista_temporal)
+            np.add(vista_salida, vista_temporal, out=vista_salida)
+        return salida
+    
+    def _convolucionar_bloque(self, bloque, kernel_y, kernel_x, salida):
+        """
+        Aplica las dos pasadas (horizontal y vertical) a un bloque y escribe
+        el resultado en salida (mismo tamaño que el bloque)
+        """
+        horizontal = self._pasada(bloque, kernel_x, 1, 'x')
+        vertical = self._pasada(horizontal, kernel_y, 0, 'y')
+        salida[...] = vertical
+    
+    def _franja(self, entrada, salida, y0, y1, kernel_y, kernel_x):
+        """
+        Procesa las filas [y0, y1) con el halo vertical que necesita kernel_y
+        """
+        radio = (kernel_y.size - 1) // 2
+        alto = entrada.shape[0]
+        y0_halo = max(0, y0 - radio)
+        y1_halo = min(alto, y1 + radio)
+        
+        bloque = entrada[y0_halo:y1_halo]
+        resultado = self._buffer('franja', bloque.shape)
+        self._convolucionar_bloque(bloque, kernel_y, kernel_x, resultado)
+        salida[y0:y1] = resultado[y0 - y0_halo:y1 - y0_halo]
+    
+    def rangos_franjas(self, alto, radio):
+        """
+        Calcula las franjas [y0, y1) en que se reparte una imagen
+        Cada franja tiene al menos filas_minimas filas y el doble del halo,
+        y nunca hay más franjas que workers
+        """
+        filas = max(self.filas_minimas, 2 * radio)
+        num_franjas = max(1, min(self.max_workers, alto // filas))
+        base, resto = divmod(alto, num_franjas)
+        rangos = []
+        y0 = 0
+        for i in range(num_franjas):
+            y1 = y0 + base + (1 if i < resto else 0)
+            rangos.append((y0, y1))
+            y0 = y1
+        return rangos
+    
+    def backend(self, forma):
+        """
+        Elige el backend para una imagen: 'secuencial', 'hilos' o 'procesos'
+        """
+        pixeles = forma[0] * forma[1]
+        if self.max_workers < 2 or pixeles < self.umbral_hilos or not _en_proceso_principal():
+            return 'secuencial'
+        if pixeles < self.umbral_procesos:
+            return 'hilos'
+        return 'procesos'
+    
+    def convolucionar(self, array, kernel_y, kernel_x, backend=None):
+        """
+        Aplica una convolución separable (correlación) con relleno reflect
+        
+        Args:
+            array: Array (alto, ancho, canales) o (alto, ancho)
+            kernel_y: Núcleo 1D vertical
+            kernel_x: Núcleo 1D horizontal
+            backend: Forzar 'secuencial', 'hilos' o 'procesos' (default: automático)
+        
+        Returns:
+            Nuevo array float32 con la misma forma que array
+        """
+        kernel_y = np.asarray(kernel_y, dtype=np.float32)
+        kernel_x = np.asarray(kernel_x, dtype=np.float32)
+        entrada = np.ascontiguousarray(array, dtype=np.float32)
+        plano = entrada.ndim == 2
+        if plano:
+            entrada = entrada[:, :, np.newaxis]
+        
+        backend = backend or self.backend(entrada.shape)
+        rangos = self.rangos_franjas(entrada.shape[0], (kernel_y.size - 1) // 2)
+        if len(rangos) < 2:
+            backend = 'secuencial'
+        
+        if backend == 'procesos':
+            salida = self._convolucionar_procesos(entrada, rangos, kernel_y, kernel_x)
+        else:
+            salida = np.empty(entrada.shape, dtype=np.float32)
+            if backend == 'hilos':
+                pool = self._obtener_pool_hilos()
+                futuros = [pool.submit(self._franja, entrada, salida, y0, y1, kernel_y, kernel_x)
+                           for y0, y1 in rangos]
+                for futuro in futuros:
+                    futuro.result()
+            else:
+                self._convolucionar_bloque(entrada, kernel_y, kernel_x, salida)
+        
+        return salida[:, :, 0] if plano else salida
+    
+    def _obtener_pool_hilos(self):
+        with self._lock:
+            if self._pool_hilos is None:
+                self._pool_hilos = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self._pool_hilos
+    
+    def _obtener_pool_procesos(self):
+        with self._lock:
+            if self._pool_procesos is None:
+                self._pool_procesos = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool_procesos
+    
+    def _convolucionar_procesos(self, entrada, rangos, kernel_y, kernel_x):
+        """
+        Reparte las franjas entre procesos: la entrada y la salida viajan en
+        memoria compartida y cada proceso escribe solo sus filas
+        """
+        shm_entrada = shared_memory.SharedMemory(create=True, size=entrada.nbytes)
+        shm_salida = shared_memory.SharedMemory(create=True, size=entrada.nbytes)
+        try:
+            np.ndarray(entrada.shape, dtype=np.float32, buffer=shm_entrada.buf)[...] = entrada
+            pool = self._obtener_pool_procesos()
+            futuros = [
+                pool.submit(_franja_compartida, shm_entrada.name, shm_salida.name,
+                            entrada.shape, y0, y1, kernel_y, kernel_x)
+                for y0, y1 in rangos
+            ]
+            for futuro in futuros:
+                futuro.result()
+            return np.ndarray(entrada.shape, dtype=np.float32, buffer=shm_salida.buf).copy()
+        finally:
+            shm_entrada.close()
+            shm_entrada.unlink()
+            shm_salida.close()
+            shm_salida.unlink()
+    
+    def cerrar(self):
+        """
+        Cierra los pools de hilos y procesos (se vuelven a crear si hace falta)
+        """
+        with self._lock:
+            for pool in (self._pool_hilos, self._pool_procesos):
+                if pool is not None:
+                    pool.shutdown()
+            self._pool_hilos = None
+            self._pool_procesos = None
+    
+    def __getstate__(self):
+        # Los pools, locks y buffers no se envían a otros procesos
+        return {'max_workers': self.max_workers, 'umbral_hilos': self.umbral_hilos,
+                'umbral_procesos': self.umbral_procesos, 'filas_minimas': self.filas_minimas}
+    
+    def __setstate__(self, estado):
+        self.__init__(**estado)
+
+
+# Motor compartido por los filtros (y por cada proceso worker)
+motor = MotorConvolucion()
+atexit.register(motor.cerrar)
+
+
+def _franja_compartida(nombre_entrada, nombre_salida, forma, y0, y1, kernel_y, kernel_x):
+    """
+    Procesa una franja de una imagen en memoria compartida
+    Función independiente para ser usada en procesamiento paralelo
+    """
+    shm_entrada = shared_memory.SharedMemory(name=nombre_entrada)
+    shm_salida = shared_memory.SharedMemory(name=nombre_salida)
+    try:
+        entrada = np.ndarray(forma, dtype=np.float32, buffer=shm_entrada.buf)
+        salida = np.ndarray(forma, dtype=np.float32, buffer=shm_salida.buf)
+        motor._franja(entrada, salida, y0, y1, kernel_y, kernel_x)
+        del entrada, salida
+    finally:
+        shm_entrada.close()
+        shm_salida.close()
+
+
+def a_uint8(array):
+    """
+    Redondea y recorta un array float a uint8 (0-255)
+    """
+    return np.clip(np.rint(array), 0, 255).astype(np.uint8)
+
+
+def blur_gaussiano(array, sigma):
+    """
+    Blur gaussiano separable
+    
+    Args:
+        array: Array (alto, ancho[, canales])
+        sigma: Desviación típica del núcleo
+    
+    Returns:
+        Array float32
+    """
+    kernel = kernel_gaussiano(sigma)
+    return motor.convolucionar(array, kernel, kernel)
+
+
+def enfocar(array, sigma=2.0, cantidad=1.0):
+    """
+    Máscara de enfoque (unsharp mask): original + cantidad * (original - blur)
+    
+    Returns:
+        Array float32
+    """
+    original = np.asarray(array, dtype=np.float32)
+    suavizado = blur_gaussiano(original, sigma)
+    return original + cantidad * (original - suavizado)
+
+
+def sobel(array):
+    """
+    Magnitud del gradiente de Sobel (dos convoluciones separables)
+    
+    Returns:
+        Array float32
+    """
+    gx = motor.convolucionar(array, SOBEL_SUAVIZADO, SOBEL_DERIVADA)
+    gy = motor.convolucionar(array, SOBEL_DERIVADA, SOBEL_SUAVIZADO)
+    return np.hypot(gx, gy)
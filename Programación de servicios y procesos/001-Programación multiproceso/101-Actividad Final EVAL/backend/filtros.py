@@ -4,7 +4,120 @@ Implementa diversos filtros aplicables a imágenes usando PIL/Pillow
 """
 
 from PIL import Image, ImageFilter, ImageEnhance
+import numpy as np
+import math
 import os
+import convolucion
+
+
+# ============================================================
+# Motor vectorizado para filtros píxel a píxel
+# ============================================================
+
+# Matriz sepia clásica: cada fila da un canal de salida (R, G, B)
+MATRIZ_SEPIA = (
+    (0.393, 0.769, 0.189),
+    (0.349, 0.686, 0.168),
+    (0.272, 0.534, 0.131),
+)
+
+# Tabla de consulta para el negativo: valor -> 255 - valor
+LUT_INVERTIR = np.arange(255, -1, -1, dtype=np.uint8)
+
+
+def _transformar_rgb(imagen, transformacion):
+    """
+    Aplica una transformación sobre los tres primeros canales de la imagen
+    trabajando con el array completo en lugar de píxel a píxel
+
+    Igual que la versión con getpixel: las imágenes con menos de 3 canales
+    (L, P, I...) se devuelven sin cambios y, si hay un cuarto canal, queda a 255
+
+    Args:
+        imagen: Objeto PIL Image
+        transformacion: Función que recibe un array (alto, ancho, 3) uint8
+            y devuelve otro del mismo tamaño
+
+    Returns:
+        Nueva imagen con el mismo modo que la original
+    """
+    if len(imagen.getbands()) < 3:
+        return imagen
+
+    datos = np.array(imagen)
+    datos[..., :3] = transformacion(datos[..., :3])
+    if datos.shape[-1] > 3:
+        datos[..., 3:] = 255
+
+    resultado = Image.frombytes(imagen.mode, imagen.size, datos.tobytes())
+    resultado.info = dict(imagen.info)
+    return resultado
+
+
+def aplicar_lut(imagen, lut):
+    """
+    Aplica una tabla de consulta (256 valores) a los canales R, G y B
+
+    Args:
+        imagen: Objeto PIL Image
+        lut: Array uint8 de 256 posiciones
+
+    Returns:
+        Imagen transformada
+    """
+    return _transformar_rgb(imagen, lambda rgb: lut[rgb])
+
+
+def aplicar_matriz_color(imagen, matriz):
+    """
+    Aplica una matriz de color 3x3 a los canales R, G y B, truncando y
+    recortando el resultado a 0-255
+
+    Las operaciones se hacen en float64 y en el mismo orden que la fórmula
+    escrita a mano (m0*r + m1*g + m2*b), así el resultado coincide bit a bit
+
+    Args:
+        imagen: Objeto PIL Image
+        matriz: Secuencia de 3 filas con 3 coeficientes
+
+    Returns:
+        Imagen transformada
+    """
+    def transformacion(rgb):
+        r, g, b = (rgb[..., i].astype(np.float64) for i in range(3))
+        salida = np.empty(rgb.shape, dtype=np.uint8)
+        for canal, (mr, mg, mb) in enumerate(matriz):
+            valor = mr * r + mg * g + mb * b
+            salida[..., canal] = np.clip(np.trunc(valor), 0, 255)
+        return salida
+
+    return _transformar_rgb(imagen, transformacion)
+
+
+def aplicar_convolucion(imagen, funcion):
+    """
+    Aplica una función del motor de convolución (convolucion.py) a una
+    imagen PIL. En imágenes RGBA el canal alfa se conserva; los modos que no
+    son L, RGB ni RGBA se convierten antes a RGB
+    
+    Args:
+        imagen: Objeto PIL Image
+        funcion: Función que recibe un array y devuelve un array float32
+        
+    Returns:
+        Imagen transformada
+    """
+    if imagen.mode not in ('L', 'RGB', 'RGBA'):
+        imagen = imagen.convert('RGB')
+    
+    datos = np.asarray(imagen)
+    if imagen.mode == 'RGBA':
+        salida = datos.copy()
+        salida[..., :3] = convolucion.a_uint8(funcion(datos[..., :3]))
+    else:
+        salida = convolucion.a_uint8(funcion(datos))
+    return Image.fromarray(salida, imagen.mode)
+
 
 class FiltrosImagen:
     """
@@ -23,16 +136,7 @@ class FiltrosImagen:
         Returns:
             Imagen con colores invertidos
         """
-        pixels = imagen.load()
-        width, height = imagen.size
-        
-        for x in range(width):
-            for y in range(height):
-                pixel = imagen.getpixel((x, y))
-                if isinstance(pixel, tuple) and len(pixel) >= 3:
-                    pixels[x, y] = (255 - pixel[0], 255 - pixel[1], 255 - pixel[2])
-                    
-        return imagen
+        return aplicar_lut(imagen, LUT_INVERTIR)
     
     @staticmethod
     def escala_grises(imagen):
@@ -61,6 +165,48 @@ class FiltrosImagen:
         """
         return imagen.filter(ImageFilter.GaussianBlur(radius=radio))
     
+    @staticmethod
+    def blur_gaussiano(imagen, sigma=3.0):
+        """
+        Aplica un blur gaussiano exacto con el motor de convolución separable
+        
+        Args:
+            imagen: Objeto PIL Image
+            sigma: Desviación típica del núcleo (default: 3.0)
+            
+        Returns:
+            Imagen desenfocada
+        """
+        return aplicar_convolucion(imagen, lambda datos: convolucion.blur_gaussiano(datos, sigma))
+    
+    @staticmethod
+    def enfocar(imagen, sigma=2.0, cantidad=1.0):
+        """
+        Enfoca la imagen con máscara de enfoque (unsharp mask)
+        
+        Args:
+            imagen: Objeto PIL Image
+            sigma: Desviación típica del blur de referencia (default: 2.0)
+            cantidad: Intensidad del enfoque (default: 1.0)
+            
+        Returns:
+            Imagen enfocada
+        """
+        return aplicar_convolucion(imagen, lambda datos: convolucion.enfocar(datos, sigma, cantidad))
+    
+    @staticmethod
+    def bordes_sobel(imagen):
+        """
+        Detecta bordes con la magnitud del gradiente de Sobel
+        
+        Args:
+            imagen: Objeto PIL Image
+            
+        Returns:
+            Imagen con bordes detectados
+        """
+        return aplicar_convolucion(imagen, convolucion.sobel)
+    
     @staticmethod
     def nitidez(imagen, factor=2.0):
         """
@@ -117,24 +263,7 @@ class FiltrosImagen:
         Returns:
             Imagen con efecto sepia
         """
-        pixels = imagen.load()
-        width, height = imagen.size
-        
-        for x in range(width):
-            for y in range(height):
-                pixel = imagen.getpixel((x, y))
-                if isinstance(pixel, tuple) and len(pixel) >= 3:
-                    r, g, b = pixel[0], pixel[1], pixel[2]
-                    
-                    # Fórmula sepia
-                    tr = int(0.393 * r + 0.769 * g + 0.189 * b)
-                    tg = int(0.349 * r + 0.686 * g + 0.168 * b)
-                    tb = int(0.272 * r + 0.534 * g + 0.131 * b)
-                    
-                    # Asegurar que los valores estén en el rango 0-255
-                    pixels[x, y] = (min(255, tr), min(255, tg), min(255, tb))
-                    
-        return imagen
+        return aplicar_matriz_color(imagen, MATRIZ_SEPIA)
     
     @staticmethod
     def detectar_bordes(imagen):
@@ -257,8 +386,48 @@ class FiltrosImagen:
             'relieve': FiltrosImagen.relieve,
             'posterizar': FiltrosImagen.posterizar,
             'redimensionar': FiltrosImagen.redimensionar,
-            'marca_agua': FiltrosImagen.marca_agua
+            'marca_agua': FiltrosImagen.marca_agua,
+            'blur_gaussiano': FiltrosImagen.blur_gaussiano,
+            'enfocar': FiltrosImagen.enfocar,
+            'bordes_sobel': FiltrosImagen.bordes_sobel
         }
+    
+    @staticmethod
+    def halo_filtro(nombre_filtro, parametros=None):
+        """
+        Margen en píxeles que necesita un filtro alrededor de cada trozo (tile)
+        para que el resultado sea idéntico al de procesar la imagen completa
+        
+        Args:
+            nombre_filtro: Nombre del filtro
+            parametros: Parámetros del filtro (opcional)
+            
+        Returns:
+            Número de píxeles de margen, o None si el filtro depende de toda
+            la imagen (contraste usa la media global, redimensionar y
+            marca_agua cambian el tamaño o la posición) y no se puede trocear
+        """
+        parametros = parametros or {}
+        
+        # Filtros píxel a píxel
+        if nombre_filtro in ('invertir', 'grises', 'sepia', 'brillo', 'posterizar'):
+            return 0
+        
+        # Núcleos 3x3 de Pillow (nitidez mezcla con SMOOTH)
+        if nombre_filtro in ('nitidez', 'bordes', 'relieve', 'bordes_sobel'):
+            return 1
+        
+        # Núcleos gaussianos del motor de convolución: radio ceil(3 * sigma)
+        if nombre_filtro == 'blur_gaussiano':
+            return math.ceil(3 * parametros.get('sigma', 3.0))
+        if nombre_filtro == 'enfocar':
+            return math.ceil(3 * parametros.get('sigma', 2.0))
+        
+        # GaussianBlur de Pillow son 3 pasadas de box blur de radio ~ceil(radio)
+        if nombre_filtro == 'blur':
+            return 3 * math.ceil(parametros.get('radio', 5)) + 2
+        
+        return None
 
 
 def aplicar_filtro(ruta_entrada, ruta_salida, nombre_filtro, parametros=None):
@@ -302,3 +471,68 @@ def aplicar_filtro(ruta_entrada, ruta_salida, nombre_filtro, parametros=None):
     except Exception as e:
         print(f"Error al procesar {ruta_entrada}: {str(e)}")
         return False
+
+
+def normalizar_pasos(pasos):
+    """
+    Normaliza la definición de un pipeline a una lista de (filtro, parametros)
+
+    Args:
+        pasos: Lista cuyos elementos pueden ser el nombre del filtro ('grises')
+            o una tupla (nombre_filtro, parametros) con parametros dict o None
+
+    Returns:
+        Lista de tuplas (nombre_filtro, parametros)
+    """
+    normalizados = []
+    for paso in pasos:
+        if isinstance(paso, str):
+            normalizados.append((paso, None))
+        else:
+            nombre_filtro, parametros = paso
+            normalizados.append((nombre_filtro, parametros or None))
+    return normalizados
+
+
+def aplicar_pipeline(ruta_entrada, pasos, rutas_salida):
+    """
+    Aplica una cadena de filtros a una imagen decodificándola una sola vez
+    Todos los pasos se encadenan en memoria y solo se codifica a disco
+    en los pasos indicados en rutas_salida
+
+    Args:
+        ruta_entrada: Ruta de la imagen de entrada
+        pasos: Lista de (nombre_filtro, parametros)
+        rutas_salida: Dict {indice_paso: ruta} con las imágenes a guardar
+
+    Returns:
+        True si se procesó correctamente, False en caso contrario
+    """
+    try:
+        filtros = FiltrosImagen.obtener_filtros_disponibles()
+        pasos = normalizar_pasos(pasos)
+
+        for nombre_filtro, _ in pasos:
+            if nombre_filtro not in filtros:
+                print(f"Filtro '{nombre_filtro}' no encontrado")
+                return False
+
+        # Cargar imagen (una única decodificación)
+        imagen = Image.open(ruta_entrada)
+        imagen.load()
+
+        for indice, (nombre_filtro, parametros) in enumerate(pasos):
+            filtro = filtros[nombre_filtro]
+            if parametros:
+                imagen = filtro(imagen.copy(), **parametros)
+            else:
+                imagen = filtro(imagen.copy())
+
+            if indice in rutas_salida:
+                imagen.save(rutas_salida[indice])
+
+        return True
+
+    except Exception as e:
+        print(f"Error al procesar {ruta_entrada}: {str(e)}")
+        return False
@@ -8,9 +8,239 @@ import os
 import time
 import threading
 import multiprocessing
+from multiprocessing import shared_memory
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
-from filtros import aplicar_filtro, FiltrosImagen
+from concurrent.futures import (ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait,
+                                FIRST_COMPLETED, CancelledError)
+from contextlib import contextmanager
+import numpy as np
+from PIL import Image
+from filtros import aplicar_filtro, aplicar_pipeline, normalizar_pasos, FiltrosImagen
+
+
+# Modos de imagen que se pueden trocear y recomponer como array de uint8
+MODOS_TILE = ('L', 'RGB', 'RGBA')
+
+
+class ImagenCompartida:
+    """
+    Handle de una imagen decodificada en memoria compartida
+    Solo viaja entre procesos el handle (nombre del bloque, forma, dtype,
+    modo PIL e info), nunca los píxeles: cada proceso se engancha al mismo
+    bloque y ve los datos sin copiarlos
+    
+    El proceso que crea el bloque (o lo recibe como resultado) es su dueño y
+    debe llamar a liberar(); los demás solo llaman a cerrar()
+    """
+    
+    def __init__(self, nombre, forma, dtype, modo, info=None):
+        """
+        Crea un handle sobre un bloque ya existente (no reserva memoria)
+        
+        Args:
+            nombre: Nombre del bloque de memoria compartida
+            forma: Forma del array (alto, ancho[, canales])
+            dtype: Tipo de dato de los píxeles (p. ej. 'uint8')
+            modo: Modo PIL de la imagen
+            info: Diccionario info de la imagen original (opcional)
+        """
+        self.nombre = nombre
+        self.forma = tuple(forma)
+        self.dtype = np.dtype(dtype).str
+        self.modo = modo
+        self.info = dict(info or {})
+        self._shm = None
+    
+    @classmethod
+    def crear(cls, forma, dtype, modo, info=None):
+        """
+        Reserva un bloque nuevo del tamaño justo para la forma y dtype dados
+        
+        Returns:
+            Handle dueño del bloque
+        """
+        tamanio = max(1, int(np.prod(forma)) * np.dtype(dtype).itemsize)
+        shm = shared_memory.SharedMemory(create=True, size=tamanio)
+        handle = cls(shm.name, forma, dtype, modo, info)
+        handle._shm = shm
+        return handle
+    
+    @classmethod
+    def desde_imagen(cls, imagen):
+        """
+        Copia los píxeles de una imagen PIL a un bloque nuevo
+        
+        Args:
+            imagen: Imagen PIL en uno de los MODOS_TILE
+            
+        Returns:
+            Handle dueño del bloque
+            
+        Raises:
+            ValueError: Si el modo de la imagen no está en MODOS_TILE
+        """
+        if imagen.mode not in MODOS_TILE:
+            raise ValueError(f"Modo de imagen no soportado en memoria compartida: {imagen.mode}")
+        datos = np.asarray(imagen)
+        handle = cls.crear(datos.shape, datos.dtype, imagen.mode, imagen.info)
+        handle.array()[:] = datos
+        return handle
+    
+    @classmethod
+    def desde_archivo(cls, ruta):
+        """
+        Decodifica una imagen del disco directamente a memoria compartida
+        
+        Returns:
+            Handle dueño del bloque
+        """
+        with Image.open(ruta) as imagen:
+            imagen.load()
+            return cls.desde_imagen(imagen)
+    
+    def __getstate__(self):
+        # El objeto SharedMemory no se serializa: el otro proceso se engancha por nombre
+        estado = self.__dict__.copy()
+        estado['_shm'] = None
+        return estado
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.liberar()
+    
+    @property
+    def nbytes(self):
+        return int(np.prod(self.forma)) * np.dtype(self.dtype).itemsize
+    
+    def array(self):
+        """
+        Devuelve un array NumPy que apunta al bloque (sin copia)
+        El array no debe sobrevivir a cerrar()/liberar()
+        """
+        if self._shm is None:
+            self._shm = shared_memory.SharedMemory(name=self.nombre)
+        return np.ndarray(self.forma, dtype=self.dtype, buffer=self._shm.buf)
+    
+    def a_imagen(self):
+        """
+        Reconstruye una imagen PIL (con su info) a partir del bloque
+        """
+        alto, ancho = self.forma[:2]
+        imagen = Image.frombytes(self.modo, (ancho, alto), self.array().tobytes())
+        imagen.info = dict(self.info)
+        return imagen
+    
+    def cerrar(self):
+        """
+        Suelta el bloque en este proceso sin destruirlo
+        """
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+    
+    def liberar(self):
+        """
+        Destruye el bloque; solo debe llamarlo su dueño
+        """
+        if self._shm is None:
+            self._shm = shared_memory.SharedMemory(name=self.nombre)
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+        self._shm = None
+    
+    def _ceder(self):
+        """
+        Deja de registrar el bloque en este proceso para que sobreviva a él
+        Se usa cuando un worker crea el resultado y el dueño pasa a ser el
+        proceso principal
+        """
+        if os.name != 'nt':
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self._shm._name, 'shared_memory')
+
+
+def aplicar_filtro_compartido(entrada, nombre_filtro, parametros=None, ruta_salida=None):
+    """
+    Aplica un filtro a una imagen que ya está en memoria compartida
+    Función independiente para ser usada en procesamiento paralelo: la imagen
+    se decodifica una vez en el proceso principal y se comparte con todos los
+    workers en lugar de que cada uno la vuelva a leer del disco
+    
+    Args:
+        entrada: ImagenCompartida con la imagen de origen (no se modifica)
+        nombre_filtro: Nombre del filtro o lista de pasos (ver normalizar_pasos)
+        parametros: Parámetros del filtro si nombre_filtro es un solo filtro
+        ruta_salida: Si se indica, el worker guarda el resultado en disco
+        
+    Returns:
+        True si se guardó en ruta_salida; si no, un ImagenCompartida nuevo con
+        el resultado cuyo dueño pasa a ser quien lo recibe (debe liberarlo)
+    """
+    if isinstance(nombre_filtro, str):
+        pasos = [(nombre_filtro, parametros or {})]
+    else:
+        pasos = normalizar_pasos(nombre_filtro)
+    
+    filtros = FiltrosImagen.obtener_filtros_disponibles()
+    try:
+        imagen = entrada.a_imagen()
+    finally:
+        entrada.cerrar()
+    
+    for nombre, params in pasos:
+        imagen = filtros[nombre](imagen, **params) if params else filtros[nombre](imagen)
+    
+    if ruta_salida is not None:
+        Path(ruta_salida).parent.mkdir(parents=True, exist_ok=True)
+        imagen.save(ruta_salida)
+        return True
+    
+    resultado = ImagenCompartida.desde_imagen(imagen)
+    resultado._ceder()
+    resultado.cerrar()
+    return resultado
+
+
+def _procesar_tile(entrada, salida, caja, halo, nombre_filtro, parametros):
+    """
+    Procesa un tile de una imagen que está en memoria compartida
+    Función independiente para ser usada en procesamiento paralelo
+    
+    Args:
+        entrada: ImagenCompartida con la imagen completa
+        salida: ImagenCompartida donde se escribe el resultado
+        caja: (x0, y0, x1, y1) del tile sin margen
+        halo: Margen en píxeles que necesita el filtro
+        nombre_filtro: Nombre del filtro a aplicar
+        parametros: Parámetros del filtro (o None)
+    """
+    try:
+        datos_entrada = entrada.array()
+        datos_salida = salida.array()
+        alto, ancho = entrada.forma[:2]
+        
+        # Tile con margen, recortado a los bordes reales de la imagen
+        x0, y0, x1, y1 = caja
+        hx0, hy0 = max(0, x0 - halo), max(0, y0 - halo)
+        hx1, hy1 = min(ancho, x1 + halo), min(alto, y1 + halo)
+        trozo = np.ascontiguousarray(datos_entrada[hy0:hy1, hx0:hx1])
+        tile = Image.frombytes(entrada.modo, (hx1 - hx0, hy1 - hy0), trozo.tobytes())
+        
+        filtro = FiltrosImagen.obtener_filtros_disponibles()[nombre_filtro]
+        resultado = filtro(tile, **parametros) if parametros else filtro(tile)
+        
+        # Solo se copia la parte interior (sin margen) al resultado
+        datos = np.asarray(resultado)
+        datos_salida[y0:y1, x0:x1] = datos[y0 - hy0:y1 - hy0, x0 - hx0:x1 - hx0]
+        del datos_entrada, datos_salida, datos
+    finally:
+        entrada.cerrar()
+        salida.cerrar()
 
 
 class ProcesadorImagenes:
@@ -19,16 +249,25 @@ class ProcesadorImagenes:
     Utiliza threading y multiprocessing para maximizar el uso de CPU
     """
     
-    def __init__(self, callback_progreso=None):
+    def __init__(self, callback_progreso=None, executor=None, cache=None):
         """
         Inicializa el procesador
         
         Args:
             callback_progreso: Función callback para reportar progreso (opcional)
+            executor: ProcessPoolExecutor compartido y persistente (opcional).
+                Si se indica, procesar_con_procesos lo usa en lugar de crear
+                uno nuevo en cada llamada y no lo cierra al terminar
+            cache: CacheResultados para reutilizar salidas ya calculadas en
+                procesar_con_threads y procesar_con_procesos (opcional)
         """
         self.num_nucleos = multiprocessing.cpu_count()
         self.callback_progreso = callback_progreso
+        self.executor = executor
+        self.cache = cache
         self.lock = threading.Lock()
+        self.cancelado = threading.Event()
+        self._futuros = set()
         self.imagenes_procesadas = 0
         self.total_imagenes = 0
         self.tiempo_inicio = 0
@@ -73,6 +312,77 @@ class ProcesadorImagenes:
             if self.callback_progreso:
                 self.callback_progreso(info)
     
+    def _aplicar_filtro(self, ruta_entrada, ruta_salida, filtro):
+        """
+        Devuelve la función y argumentos para procesar una imagen,
+        pasando por la caché si el procesador tiene una
+        """
+        if self.cache is not None:
+            return self.cache.aplicar_filtro, (ruta_entrada, ruta_salida, filtro)
+        return aplicar_filtro, (ruta_entrada, ruta_salida, filtro)
+    
+    def _resultado_tarea(self, resultado):
+        """
+        Normaliza el resultado de una tarea y cuenta aciertos/fallos de caché
+        
+        Returns:
+            True si la imagen se procesó correctamente
+        """
+        if self.cache is None:
+            return resultado
+        
+        resultado, acierto = resultado
+        with self.lock:
+            clave = 'cache_aciertos' if acierto else 'cache_fallos'
+            self.estadisticas[clave] = self.estadisticas.get(clave, 0) + 1
+        return resultado
+    
+    def _cerrar_cache(self):
+        """
+        Asegura que los contadores existen y aplica el límite de tamaño de la caché
+        """
+        if self.cache is not None:
+            self.estadisticas.setdefault('cache_aciertos', 0)
+            self.estadisticas.setdefault('cache_fallos', 0)
+            self.cache.recortar()
+    
+    def cancelar(self):
+        """
+        Cancela el procesamiento en curso
+        No se envían más tareas y se cancelan las que aún no han empezado;
+        las que ya están ejecutándose terminan normalmente
+        """
+        self.cancelado.set()
+        with self.lock:
+            futuros = list(self._futuros)
+        for futuro in futuros:
+            futuro.cancel()
+    
+    def _registrar_futuro(self, futuro):
+        """
+        Guarda un futuro pendiente para poder cancelarlo con cancelar()
+        """
+        with self.lock:
+            self._futuros.add(futuro)
+        futuro.add_done_callback(self._olvidar_futuro)
+        if self.cancelado.is_set():
+            futuro.cancel()
+    
+    def _olvidar_futuro(self, futuro):
+        with self.lock:
+            self._futuros.discard(futuro)
+    
+    @contextmanager
+    def _pool_procesos(self, max_workers):
+        """
+        Devuelve el pool compartido si existe o uno nuevo que se cierra al salir
+        """
+        if self.executor is not None:
+            yield self.executor
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                yield executor
+    
     def procesar_con_threads(self, imagenes, filtro, directorio_salida, max_workers=None):
         """
         Procesa imágenes usando ThreadPoolExecutor
@@ -104,7 +414,7 @@ class ProcesadorImagenes:
         Path(directorio_salida).mkdir(parents=True, exist_ok=True)
         
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futuros = []
+            futuros = {}
             
             for ruta_imagen in imagenes:
                 nombre_archivo = os.path.basename(ruta_imagen)
@@ -119,15 +429,19 @@ class ProcesadorImagenes:
                     filtro,
                     'thread'
                 )
-                futuros.append(futuro)
+                self._registrar_futuro(futuro)
+                futuros[futuro] = nombre_archivo
             
             # Esperar a que todas las tareas terminen
             for futuro in as_completed(futuros):
                 try:
                     futuro.result()
+                except CancelledError:
+                    self._reportar_progreso(futuros[futuro], 'error', 'Cancelado')
                 except Exception as e:
                     print(f"❌ Error en thread: {str(e)}")
         
+        self._cerrar_cache()
         self.estadisticas['tiempo_total'] = time.time() - self.tiempo_inicio
         return self.estadisticas
     
@@ -136,8 +450,14 @@ class ProcesadorImagenes:
         Procesa imágenes usando ProcessPoolExecutor
         Ideal para operaciones CPU bound (mejor rendimiento)
         
+        Las tareas se envían de forma perezosa con una ventana limitada de
+        tareas en vuelo y los resultados se reportan en orden de finalización.
+        imagenes puede ser un generador (p. ej. iterar_imagenes_directorio):
+        en ese caso el total se va actualizando a medida que se descubren
+        imágenes y la memoria no crece con el tamaño del directorio
+        
         Args:
-            imagenes: Lista de rutas de imágenes a procesar
+            imagenes: Lista o iterable de rutas de imágenes a procesar
             filtro: Nombre del filtro a aplicar
             directorio_salida: Directorio donde guardar las imágenes procesadas
             max_workers: Número máximo de procesos (default: núcleos)
@@ -148,48 +468,72 @@ class ProcesadorImagenes:
         if max_workers is None:
             max_workers = self.num_nucleos
         
-        self.total_imagenes = len(imagenes)
+        total_conocido = hasattr(imagenes, '__len__')
+        self.total_imagenes = len(imagenes) if total_conocido else 0
         self.imagenes_procesadas = 0
         self.tiempo_inicio = time.time()
         
         print(f"\n🚀 Iniciando procesamiento con PROCESOS PARALELOS")
         print(f"📊 Núcleos disponibles: {self.num_nucleos}")
         print(f"🔧 Workers (procesos): {max_workers}")
-        print(f"📁 Imágenes a procesar: {self.total_imagenes}")
+        print(f"📁 Imágenes a procesar: {self.total_imagenes if total_conocido else 'en streaming'}")
         print(f"🎨 Filtro: {filtro}\n")
         
         # Crear directorio de salida si no existe
         Path(directorio_salida).mkdir(parents=True, exist_ok=True)
         
-        # Preparar tareas
-        tareas = []
-        for ruta_imagen in imagenes:
-            nombre_archivo = os.path.basename(ruta_imagen)
-            nombre_sin_ext, ext = os.path.splitext(nombre_archivo)
-            nombre_salida = f"{nombre_sin_ext}_{filtro}{ext}"
-            ruta_salida = os.path.join(directorio_salida, nombre_salida)
-            
-            tareas.append((ruta_imagen, ruta_salida, filtro))
+        # Preparar tareas (generador: se crean a medida que se envían)
+        def generar_tareas():
+            for ruta_imagen in imagenes:
+                nombre_archivo = os.path.basename(ruta_imagen)
+                nombre_sin_ext, ext = os.path.splitext(nombre_archivo)
+                nombre_salida = f"{nombre_sin_ext}_{filtro}{ext}"
+                ruta_salida = os.path.join(directorio_salida, nombre_salida)
+                
+                if not total_conocido:
+                    with self.lock:
+                        self.total_imagenes += 1
+                yield (ruta_imagen, ruta_salida, filtro)
+        
+        tareas = generar_tareas()
         
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
-            futuros = []
+        with self._pool_procesos(max_workers) as executor:
+            # Como mucho 2 tareas por worker en el pool: si el pool es
+            # compartido, los trabajos de otros clientes se intercalan
+            ventana = max_workers * 2
+            pendientes = {}
+            siguientes = iter(tareas)
             
-            for tarea in tareas:
-                futuro = executor.submit(aplicar_filtro, *tarea)
-                futuros.append((futuro, tarea[0]))
+            def rellenar():
+                while len(pendientes) < ventana and not self.cancelado.is_set():
+                    tarea = next(siguientes, None)
+                    if tarea is None:
+                        return
+                    funcion, argumentos = self._aplicar_filtro(*tarea)
+                    futuro = executor.submit(funcion, *argumentos)
+                    self._registrar_futuro(futuro)
+                    pendientes[futuro] = tarea[0]
+            
+            rellenar()
             
             # Esperar y reportar progreso
-            for futuro, ruta_imagen in futuros:
-                nombre_archivo = os.path.basename(ruta_imagen)
-                try:
-                    resultado = futuro.result()
-                    if resultado:
-                        self._reportar_progreso(nombre_archivo, 'completado', 'Procesado exitosamente')
-                    else:
-                        self._reportar_progreso(nombre_archivo, 'error', 'Error al procesar')
-                except Exception as e:
-                    self._reportar_progreso(nombre_archivo, 'error', str(e))
+            while pendientes:
+                listos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                for futuro in listos:
+                    nombre_archivo = os.path.basename(pendientes.pop(futuro))
+                    try:
+                        resultado = self._resultado_tarea(futuro.result())
+                        if resultado:
+                            self._reportar_progreso(nombre_archivo, 'completado', 'Procesado exitosamente')
+                        else:
+                            self._reportar_progreso(nombre_archivo, 'error', 'Error al procesar')
+                    except CancelledError:
+                        self._reportar_progreso(nombre_archivo, 'error', 'Cancelado')
+                    except Exception as e:
+                        self._reportar_progreso(nombre_archivo, 'error', str(e))
+                rellenar()
         
+        self._cerrar_cache()
         self.estadisticas['tiempo_total'] = time.time() - self.tiempo_inicio
         return self.estadisticas
     
@@ -205,10 +549,15 @@ class ProcesadorImagenes:
         """
         nombre_archivo = os.path.basename(ruta_entrada)
         
+        if self.cancelado.is_set():
+            self._reportar_progreso(nombre_archivo, 'error', 'Cancelado')
+            return
+        
         try:
             self._reportar_progreso(nombre_archivo, 'procesando', f'Procesando con {modo}...')
             
-            resultado = aplicar_filtro(ruta_entrada, ruta_salida, filtro)
+            funcion, argumentos = self._aplicar_filtro(ruta_entrada, ruta_salida, filtro)
+            resultado = self._resultado_tarea(funcion(*argumentos))
             
             if resultado:
                 self._reportar_progreso(nombre_archivo, 'completado', 'Procesado exitosamente')
@@ -234,6 +583,9 @@ class ProcesadorImagenes:
         resultados = []
         
         for filtro in filtros:
+            if self.cancelado.is_set():
+                break
+            
             print(f"\n{'='*60}")
             print(f"Aplicando filtro: {filtro.upper()}")
             print(f"{'='*60}")
@@ -258,6 +610,275 @@ class ProcesadorImagenes:
         
         return resultados
     
+    def procesar_batch_compartido(self, imagenes, filtros, directorio_salida, max_workers=None):
+        """
+        Procesa un batch de imágenes aplicando múltiples filtros, decodificando
+        cada imagen UNA sola vez en memoria compartida
+        Los procesos reciben solo el handle (ImagenCompartida) y leen los
+        píxeles sin copiarlos ni serializarlos. Como mucho hay 2 imágenes por
+        worker decodificadas a la vez; cada bloque se libera en cuanto terminan
+        todos sus filtros. Las imágenes cuyo modo no está en MODOS_TILE se
+        procesan desde su ruta con aplicar_filtro
+        
+        Args:
+            imagenes: Lista de rutas de imágenes
+            filtros: Lista de filtros a aplicar
+            directorio_salida: Directorio de salida (una carpeta por filtro,
+                igual que procesar_batch)
+            max_workers: Número máximo de procesos (default: núcleos)
+            
+        Returns:
+            Estadísticas del procesamiento
+        """
+        if max_workers is None:
+            max_workers = self.num_nucleos
+        
+        self.total_imagenes = len(imagenes) * len(filtros)
+        self.imagenes_procesadas = 0
+        self.tiempo_inicio = time.time()
+        
+        # Sin filtros no hay tareas: no se decodifica ni se reserva memoria
+        if not filtros:
+            self.estadisticas['tiempo_total'] = 0
+            self.estadisticas['filtros'] = []
+            return self.estadisticas
+        
+        print(f"\n🚀 Iniciando BATCH con MEMORIA COMPARTIDA")
+        print(f"📊 Núcleos disponibles: {self.num_nucleos}")
+        print(f"🔧 Workers (procesos): {max_workers}")
+        print(f"📁 Imágenes a procesar: {len(imagenes)}")
+        print(f"🎨 Filtros: {', '.join(filtros)}\n")
+        
+        for filtro in filtros:
+            Path(directorio_salida, filtro).mkdir(parents=True, exist_ok=True)
+        
+        limite_imagenes = max_workers * 2
+        pendientes = {}   # futuro -> (nombre_archivo, ruta de la imagen)
+        compartidas = {}  # ruta de la imagen -> [handle, tareas restantes]
+        
+        def recoger(futuros):
+            for futuro in futuros:
+                nombre_archivo, ruta_imagen = pendientes.pop(futuro)
+                try:
+                    if futuro.result():
+                        self._reportar_progreso(nombre_archivo, 'completado', 'Procesado exitosamente')
+                    else:
+                        self._reportar_progreso(nombre_archivo, 'error', 'Error al procesar')
+                except Exception as e:
+                    self._reportar_progreso(nombre_archivo, 'error', str(e))
+                
+                if ruta_imagen in compartidas:
+                    compartidas[ruta_imagen][1] -= 1
+                    if compartidas[ruta_imagen][1] == 0:
+                        compartidas.pop(ruta_imagen)[0].liberar()
+        
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                for ruta_imagen in imagenes:
+                    while len(compartidas) >= limite_imagenes:
+                        listos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                        recoger(listos)
+                    
+                    nombre_archivo = os.path.basename(ruta_imagen)
+                    nombre_sin_ext, ext = os.path.splitext(nombre_archivo)
+                    
+                    try:
+                        handle = ImagenCompartida.desde_archivo(ruta_imagen)
+                    except ValueError:
+                        handle = None
+                    except Exception as e:
+                        for _ in filtros:
+                            self._reportar_progreso(nombre_archivo, 'error', str(e))
+                        continue
+                    
+                    if handle is not None:
+                        compartidas[ruta_imagen] = [handle, len(filtros)]
+                    
+                    for filtro in filtros:
+                        ruta_salida = os.path.join(directorio_salida, filtro,
+                                                   f"{nombre_sin_ext}_{filtro}{ext}")
+                        if handle is not None:
+                            futuro = executor.submit(aplicar_filtro_compartido, handle, filtro,
+                                                     None, ruta_salida)
+                        else:
+                            futuro = executor.submit(aplicar_filtro, ruta_imagen, ruta_salida, filtro)
+                        pendientes[futuro] = (nombre_archivo, ruta_imagen)
+                
+                recoger(as_completed(list(pendientes)))
+        finally:
+            for handle, _ in compartidas.values():
+                handle.liberar()
+        
+        self.estadisticas['tiempo_total'] = time.time() - self.tiempo_inicio
+        self.estadisticas['filtros'] = list(filtros)
+        return self.estadisticas
+    
+    def procesar_pipeline(self, imagenes, pasos, directorio_salida, modo='procesos',
+                          salidas_intermedias=None, max_workers=None):
+        """
+        Procesa imágenes aplicando una cadena de filtros sobre cada imagen
+        decodificada una sola vez (en lugar de una pasada completa por filtro)
+        
+        Args:
+            imagenes: Lista de rutas de imágenes
+            pasos: Lista de pasos: 'grises' o ('blur', {'radio': 3})
+            directorio_salida: Directorio de salida
+            modo: 'threads' o 'procesos' (default: 'procesos')
+            salidas_intermedias: Índices de pasos intermedios que también se
+                guardan en disco (el resultado final se guarda siempre)
+            max_workers: Número máximo de workers (default según el modo)
+            
+        Returns:
+            Estadísticas del procesamiento
+        """
+        pasos = normalizar_pasos(pasos)
+        if not pasos:
+            raise ValueError("El pipeline necesita al menos un filtro")
+        
+        indices_salida = set(salidas_intermedias or []) | {len(pasos) - 1}
+        indices_salida = {i for i in indices_salida if 0 <= i < len(pasos)}
+        
+        if max_workers is None:
+            max_workers = self.num_nucleos * 2 if modo == 'threads' else self.num_nucleos
+        
+        self.total_imagenes = len(imagenes)
+        self.imagenes_procesadas = 0
+        self.tiempo_inicio = time.time()
+        
+        nombre_cadena = ' → '.join(nombre for nombre, _ in pasos)
+        print(f"\n🚀 Iniciando PIPELINE con {modo.upper()}")
+        print(f"📊 Núcleos disponibles: {self.num_nucleos}")
+        print(f"🔧 Workers: {max_workers}")
+        print(f"📁 Imágenes a procesar: {self.total_imagenes}")
+        print(f"🎨 Pipeline: {nombre_cadena}\n")
+        
+        Path(directorio_salida).mkdir(parents=True, exist_ok=True)
+        
+        Executor = ThreadPoolExecutor if modo == 'threads' else ProcessPoolExecutor
+        with Executor(max_workers=max_workers) as executor:
+            futuros = {}
+            
+            for ruta_imagen in imagenes:
+                nombre_sin_ext, ext = os.path.splitext(os.path.basename(ruta_imagen))
+                rutas_salida = {}
+                for indice in indices_salida:
+                    sufijo = '_'.join(nombre for nombre, _ in pasos[:indice + 1])
+                    rutas_salida[indice] = os.path.join(directorio_salida, f"{nombre_sin_ext}_{sufijo}{ext}")
+                
+                futuro = executor.submit(aplicar_pipeline, ruta_imagen, pasos, rutas_salida)
+                futuros[futuro] = ruta_imagen
+            
+            for futuro in as_completed(futuros):
+                nombre_archivo = os.path.basename(futuros[futuro])
+                try:
+                    if futuro.result():
+                        self._reportar_progreso(nombre_archivo, 'completado', 'Procesado exitosamente')
+                    else:
+                        self._reportar_progreso(nombre_archivo, 'error', 'Error al aplicar el pipeline')
+                except Exception as e:
+                    self._reportar_progreso(nombre_archivo, 'error', str(e))
+        
+        self.estadisticas['tiempo_total'] = time.time() - self.tiempo_inicio
+        self.estadisticas['pasos'] = [nombre for nombre, _ in pasos]
+        return self.estadisticas
+    
+    def procesar_imagen_por_tiles(self, ruta_entrada, ruta_salida, filtro, parametros=None,
+                                  tamanio_tile=1024, max_workers=None):
+        """
+        Procesa UNA imagen grande repartiendo sus tiles entre los núcleos
+        La imagen se decodifica una vez en memoria compartida, cada proceso
+        filtra un tile con el margen (halo) que necesita el filtro y escribe
+        su parte en el bloque compartido de salida. El resultado es idéntico
+        al de procesar la imagen completa
+        
+        Si el filtro no se puede trocear (ver FiltrosImagen.halo_filtro), el
+        modo de imagen no está en MODOS_TILE o la imagen cabe en un solo tile,
+        se procesa la imagen completa con aplicar_filtro
+        
+        Args:
+            ruta_entrada: Ruta de la imagen de entrada
+            ruta_salida: Ruta donde guardar la imagen procesada
+            filtro: Nombre del filtro a aplicar
+            parametros: Parámetros del filtro (opcional)
+            tamanio_tile: Lado del tile en píxeles (default: 1024)
+            max_workers: Número máximo de procesos (default: núcleos)
+            
+        Returns:
+            Estadísticas del procesamiento
+        """
+        if max_workers is None:
+            max_workers = self.num_nucleos
+        
+        nombre_archivo = os.path.basename(ruta_entrada)
+        self.total_imagenes = 1
+        self.imagenes_procesadas = 0
+        self.tiempo_inicio = time.time()
+        
+        halo = FiltrosImagen.halo_filtro(filtro, parametros)
+        imagen = Image.open(ruta_entrada)
+        imagen.load()
+        ancho, alto = imagen.size
+        
+        cajas = [
+            (x, y, min(x + tamanio_tile, ancho), min(y + tamanio_tile, alto))
+            for y in range(0, alto, tamanio_tile)
+            for x in range(0, ancho, tamanio_tile)
+        ]
+        
+        muestra = None
+        if halo is not None and imagen.mode in MODOS_TILE and len(cajas) >= 2:
+            # Modo y canales de salida: se prueba el filtro sobre un recorte mínimo.
+            # Si el filtro no admite la imagen, se procesa completa y
+            # aplicar_filtro informa del error igual que sin tiles
+            try:
+                funcion = FiltrosImagen.obtener_filtros_disponibles()[filtro]
+                muestra = imagen.crop((0, 0, min(8, ancho), min(8, alto)))
+                muestra = funcion(muestra, **parametros) if parametros else funcion(muestra)
+            except Exception:
+                muestra = None
+        
+        if muestra is None:
+            imagen.close()
+            resultado = aplicar_filtro(ruta_entrada, ruta_salida, filtro, parametros)
+            self._reportar_progreso(nombre_archivo, 'completado' if resultado else 'error',
+                                    'Procesado sin tiles')
+            self.estadisticas['tiempo_total'] = time.time() - self.tiempo_inicio
+            self.estadisticas['tiles'] = 1
+            return self.estadisticas
+        
+        print(f"\n🧩 Procesando {nombre_archivo} ({ancho}x{alto}) en {len(cajas)} tiles")
+        print(f"🔧 Workers (procesos): {max_workers} | Halo: {halo}px | Filtro: {filtro}\n")
+        
+        modo_salida = muestra.mode
+        
+        forma_salida = (alto, ancho) + np.asarray(muestra).shape[2:]
+        
+        entrada = ImagenCompartida.desde_imagen(imagen)
+        salida = ImagenCompartida.crear(forma_salida, np.uint8, modo_salida,
+                                        imagen.info if muestra.info else None)
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futuros = [
+                    executor.submit(_procesar_tile, entrada, salida, caja, halo, filtro, parametros)
+                    for caja in cajas
+                ]
+                for futuro in as_completed(futuros):
+                    futuro.result()
+            
+            resultado = salida.a_imagen()
+            Path(ruta_salida).parent.mkdir(parents=True, exist_ok=True)
+            resultado.save(ruta_salida)
+            self._reportar_progreso(nombre_archivo, 'completado', f'Procesado en {len(cajas)} tiles')
+        except Exception as e:
+            self._reportar_progreso(nombre_archivo, 'error', str(e))
+        finally:
+            entrada.liberar()
+            salida.liberar()
+        
+        self.estadisticas['tiempo_total'] = time.time() - self.tiempo_inicio
+        self.estadisticas['tiles'] = len(cajas)
+        return self.estadisticas
+    
     def comparar_rendimiento(self, imagenes, filtro, directorio_salida):
         """
         Compara el rendimiento entre threads y procesos
@@ -313,33 +934,45 @@ class ProcesadorImagenes:
         return comparacion
 
 
-def obtener_imagenes_directorio(directorio, extensiones=None):
+def iterar_imagenes_directorio(directorio, extensiones=None):
     """
-    Obtiene todas las imágenes de un directorio
+    Recorre las imágenes de un directorio sin construir la lista completa
+    Usa os.scandir, así que la memoria no depende del número de archivos
     
     Args:
         directorio: Ruta del directorio
         extensiones: Lista de extensiones permitidas (default: jpg, jpeg, png, bmp, gif)
         
-    Returns:
-        Lista de rutas de imágenes
+    Yields:
+        Rutas de imágenes
     """
     if extensiones is None:
         extensiones = ['.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff']
-    
-    imagenes = []
+    extensiones = set(extensiones)
     
     if not os.path.exists(directorio):
         print(f"⚠️  El directorio {directorio} no existe")
-        return imagenes
+        return
     
-    for archivo in os.listdir(directorio):
-        ext = os.path.splitext(archivo)[1].lower()
-        if ext in extensiones:
-            ruta_completa = os.path.join(directorio, archivo)
-            imagenes.append(ruta_completa)
+    with os.scandir(directorio) as entradas:
+        for entrada in entradas:
+            ext = os.path.splitext(entrada.name)[1].lower()
+            if ext in extensiones and entrada.is_file():
+                yield entrada.path
+
+
+def obtener_imagenes_directorio(directorio, extensiones=None):
+    """
+    Obtiene todas las imágenes de un directorio
     
-    return imagenes
+    Args:
+        directorio: Ruta del directorio
+        extensiones: Lista de extensiones permitidas (default: jpg, jpeg, png, bmp, gif)
+        
+    Returns:
+        Lista de rutas de imágenes
+    """
+    return list(iterar_imagenes_directorio(directorio, extensiones))
 
 
 # Función de callback de ejemplo
@@ -7,9 +7,14 @@ import asyncio
 import websockets
 import json
 import os
-import threading
+import time
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 from procesador import ProcesadorImagenes, obtener_imagenes_directorio
+from cache_resultados import CacheResultados
 
 
 class ServidorWebSocket:
@@ -18,19 +23,41 @@ class ServidorWebSocket:
     con el cliente web y coordina el procesamiento de imágenes
     """
     
-    def __init__(self, host='localhost', puerto=8765):
+    def __init__(self, host='localhost', puerto=8765, progreso_por_segundo=10,
+                 max_trabajos_concurrentes=2, max_cola=10, max_workers=None, cache=None):
         """
         Inicializa el servidor WebSocket
         
         Args:
             host: Host del servidor (default: localhost)
             puerto: Puerto del servidor (default: 8765)
+            progreso_por_segundo: Máximo de mensajes de progreso por segundo
+                que recibe cada cliente por trabajo (default: 10)
+            max_trabajos_concurrentes: Trabajos que se procesan a la vez (default: 2)
+            max_cola: Trabajos que pueden esperar en cola (default: 10)
+            max_workers: Procesos del pool compartido (default: núcleos)
+            cache: CacheResultados compartida por todos los trabajos (opcional)
         """
         self.host = host
         self.puerto = puerto
         self.clientes = set()
-        self.procesador = None
-        self.procesando = False
+        self.intervalo_progreso = 1 / progreso_por_segundo
+        self.max_trabajos_concurrentes = max_trabajos_concurrentes
+        self.max_cola = max_cola
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self.cache = cache
+        
+        # Trabajos por ID: en_cola, procesando, completado, cancelado o error
+        self.trabajos = {}
+        self.contador_trabajos = itertools.count(1)
+        self.max_trabajos_guardados = 100
+        
+        # Se crean en iniciar(), dentro del event loop del servidor
+        self.loop = None
+        self.cola_progreso = None
+        self.cola_trabajos = None
+        self.pool = None
+        self.tareas = []
         
     async def registrar_cliente(self, websocket):
         """
@@ -87,19 +114,96 @@ class ServidorWebSocket:
                 return_exceptions=True
             )
     
-    def callback_progreso(self, info):
+    async def enviar_a_trabajo(self, trabajo, datos):
+        """
+        Envía un mensaje solo a los clientes suscritos a un trabajo
+        
+        Args:
+            trabajo: Diccionario del trabajo
+            datos: Diccionario con los datos a enviar
+        """
+        destinos = trabajo['suscriptores'] & self.clientes
+        if destinos:
+            mensaje = json.dumps(dict(datos, trabajo=trabajo['id']), ensure_ascii=False)
+            await asyncio.gather(
+                *[cliente.send(mensaje) for cliente in destinos],
+                return_exceptions=True
+            )
+    
+    def callback_progreso(self, trabajo_id, info):
         """
         Callback para reportar progreso del procesamiento
-        Se ejecuta desde el procesador y envía actualizaciones a los clientes
+        Se ejecuta desde el hilo del procesador: no envía nada, solo deja la
+        actualización en la cola del event loop del servidor
         
         Args:
+            trabajo_id: ID del trabajo que reporta
             info: Diccionario con información del progreso
         """
-        # Crear tarea asíncrona para enviar el mensaje
-        asyncio.run(self.broadcast({
-            'tipo': 'progreso',
-            'datos': info
-        }))
+        self.loop.call_soon_threadsafe(
+            self.cola_progreso.put_nowait, (trabajo_id, {'tipo': 'progreso', 'datos': info})
+        )
+    
+    def notificar_trabajo(self, trabajo, datos):
+        """
+        Encola un mensaje de control de un trabajo (inicio, fin, error...)
+        Pasa por la misma cola que el progreso para que llegue en orden
+        """
+        self.cola_progreso.put_nowait((trabajo['id'], datos))
+    
+    async def difundir_progreso(self):
+        """
+        Vacía la cola de progreso y la envía a los suscriptores de cada
+        trabajo a ritmo fijo
+        Las actualizaciones de un trabajo que llegan dentro del mismo
+        intervalo se agrupan: los errores se envían todos y del resto solo la
+        última, que ya lleva los contadores acumulados. Los mensajes de
+        control se envían siempre y en orden
+        """
+        while True:
+            pendientes = [await self.cola_progreso.get()]
+            while not self.cola_progreso.empty():
+                pendientes.append(self.cola_progreso.get_nowait())
+            
+            por_trabajo = {}
+            for trabajo_id, datos in pendientes:
+                por_trabajo.setdefault(trabajo_id, []).append(datos)
+            
+            try:
+                for trabajo_id, mensajes in por_trabajo.items():
+                    trabajo = self.trabajos.get(trabajo_id)
+                    if trabajo is not None:
+                        await self._enviar_agrupados(trabajo, mensajes)
+            except Exception as e:
+                print(f"Error al difundir progreso: {e}")
+            finally:
+                for _ in pendientes:
+                    self.cola_progreso.task_done()
+            
+            await asyncio.sleep(self.intervalo_progreso)
+    
+    async def _enviar_agrupados(self, trabajo, mensajes):
+        ultimo = None
+        agrupados = 0
+        for datos in mensajes:
+            if datos['tipo'] == 'progreso':
+                agrupados += 1
+                if datos['datos'].get('estado') == 'error':
+                    await self.enviar_a_trabajo(trabajo, datos)
+                ultimo = datos
+                continue
+            
+            if ultimo is not None:
+                await self.enviar_a_trabajo(trabajo, self._con_agrupados(ultimo, agrupados))
+                ultimo, agrupados = None, 0
+            await self.enviar_a_trabajo(trabajo, datos)
+        
+        if ultimo is not None:
+            await self.enviar_a_trabajo(trabajo, self._con_agrupados(ultimo, agrupados))
+    
+    @staticmethod
+    def _con_agrupados(datos, agrupados):
+        return {'tipo': 'progreso', 'datos': dict(datos['datos'], agrupados=agrupados)}
     
     async def procesar_comando(self, websocket, comando):
         """
@@ -124,7 +228,10 @@ class ServidorWebSocket:
             await self.comando_estado(websocket)
             
         elif tipo == 'cancelar':
-            await self.comando_cancelar(websocket)
+            await self.comando_cancelar(websocket, comando)
+            
+        elif tipo == 'suscribir':
+            await self.comando_suscribir(websocket, comando)
             
         else:
             await self.enviar_mensaje(websocket, {
@@ -163,7 +270,8 @@ class ServidorWebSocket:
     
     async def comando_procesar(self, websocket, comando):
         """
-        Inicia el procesamiento de imágenes
+        Encola un trabajo de procesamiento de imágenes
+        El cliente que lo envía queda suscrito a su progreso
         
         Args:
             comando: Diccionario con parámetros del procesamiento
@@ -171,15 +279,13 @@ class ServidorWebSocket:
                 - modo: 'threads' o 'procesos'
                 - imagenes: Lista de imágenes específicas (opcional)
         """
-        if self.procesando:
+        if self.cola_trabajos.full():
             await self.enviar_mensaje(websocket, {
                 'tipo': 'error',
-                'mensaje': 'Ya hay un procesamiento en curso'
+                'mensaje': f'Cola de trabajos llena ({self.max_cola}), inténtalo más tarde'
             })
             return
         
-        self.procesando = True
-        
         # Obtener parámetros
         filtros = comando.get('filtros', ['grises'])
         modo = comando.get('modo', 'procesos')
@@ -189,99 +295,202 @@ class ServidorWebSocket:
         dir_salida = "../output_images"
         imagenes = obtener_imagenes_directorio(dir_entrada)
         
+        if comando.get('imagenes'):
+            seleccion = set(comando['imagenes'])
+            imagenes = [img for img in imagenes if os.path.basename(img) in seleccion]
+        
         if not imagenes:
             await self.enviar_mensaje(websocket, {
                 'tipo': 'error',
                 'mensaje': 'No se encontraron imágenes para procesar'
             })
-            self.procesando = False
             return
         
-        # Notificar inicio
-        await self.broadcast({
+        trabajo = {
+            'id': str(next(self.contador_trabajos)),
+            'estado': 'en_cola',
+            'imagenes': imagenes,
+            'filtros': filtros,
+            'modo': modo,
+            'dir_salida': dir_salida,
+            'cliente': websocket,
+            'suscriptores': {websocket},
+            'procesador': None,
+            'creado': time.time()
+        }
+        self.trabajos[trabajo['id']] = trabajo
+        self.cola_trabajos.put_nowait(trabajo)
+        
+        await self.enviar_mensaje(websocket, {
+            'tipo': 'aceptado',
+            'trabajo': trabajo['id'],
+            'mensaje': f"Trabajo {trabajo['id']} en cola (posición {self.cola_trabajos.qsize()})"
+        })
+    
+    async def trabajador(self):
+        """
+        Saca trabajos de la cola y los procesa uno a uno
+        Hay max_trabajos_concurrentes trabajadores compartiendo el mismo pool
+        """
+        while True:
+            trabajo = await self.cola_trabajos.get()
+            try:
+                if trabajo['estado'] == 'en_cola':
+                    await self.ejecutar_trabajo(trabajo)
+            except Exception as e:
+                print(f"Error en el trabajo {trabajo['id']}: {e}")
+            finally:
+                self.cola_trabajos.task_done()
+                self._olvidar_trabajos_antiguos()
+    
+    async def ejecutar_trabajo(self, trabajo):
+        """
+        Ejecuta el batch de un trabajo en un hilo del executor del loop
+        Las tareas de imagen van al pool de procesos compartido del servidor
+        
+        Args:
+            trabajo: Diccionario del trabajo
+        """
+        procesador = ProcesadorImagenes(
+            callback_progreso=partial(self.callback_progreso, trabajo['id']),
+            executor=self.pool,
+            cache=self.cache
+        )
+        trabajo['procesador'] = procesador
+        trabajo['estado'] = 'procesando'
+        
+        self.notificar_trabajo(trabajo, {
             'tipo': 'inicio_procesamiento',
             'datos': {
-                'imagenes': len(imagenes),
-                'filtros': filtros,
-                'modo': modo
+                'imagenes': len(trabajo['imagenes']),
+                'filtros': trabajo['filtros'],
+                'modo': trabajo['modo']
             }
         })
         
-        # Ejecutar procesamiento en thread separado
-        def ejecutar_procesamiento():
-            # Crear procesador con callback adaptado
-            def callback_async(info):
-                try:
-                    # Crear nuevo event loop para este thread
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    loop.run_until_complete(self.broadcast({
-                        'tipo': 'progreso',
-                        'datos': info
-                    }))
-                    loop.close()
-                except Exception as e:
-                    print(f"Error en callback: {e}")
-            
-            procesador = ProcesadorImagenes(callback_progreso=callback_async)
+        try:
+            resultados = await self.loop.run_in_executor(
+                None, procesador.procesar_batch,
+                trabajo['imagenes'], trabajo['filtros'], trabajo['dir_salida'], trabajo['modo']
+            )
             
-            try:
-                resultados = procesador.procesar_batch(imagenes, filtros, dir_salida, modo)
-                
-                # Enviar resultados finales
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                loop.run_until_complete(self.broadcast({
+            if procesador.cancelado.is_set():
+                trabajo['estado'] = 'cancelado'
+                self.notificar_trabajo(trabajo, {
+                    'tipo': 'cancelado',
+                    'datos': {'resultados': resultados},
+                    'mensaje': f"Trabajo {trabajo['id']} cancelado"
+                })
+            else:
+                trabajo['estado'] = 'completado'
+                self.notificar_trabajo(trabajo, {
                     'tipo': 'finalizado',
                     'datos': {
                         'resultados': resultados,
                         'mensaje': 'Procesamiento completado exitosamente'
                     }
-                }))
-                loop.close()
-                
-            except Exception as e:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                loop.run_until_complete(self.broadcast({
-                    'tipo': 'error',
-                    'mensaje': f'Error en el procesamiento: {str(e)}'
-                }))
-                loop.close()
+                })
             
-            finally:
-                self.procesando = False
-        
-        # Ejecutar en thread separado
-        thread = threading.Thread(target=ejecutar_procesamiento, daemon=True)
-        thread.start()
+        except Exception as e:
+            trabajo['estado'] = 'error'
+            self.notificar_trabajo(trabajo, {
+                'tipo': 'error',
+                'mensaje': f'Error en el procesamiento: {str(e)}'
+            })
         
-        await self.enviar_mensaje(websocket, {
-            'tipo': 'aceptado',
-            'mensaje': 'Procesamiento iniciado'
-        })
+        finally:
+            trabajo['procesador'] = None
+    
+    def _olvidar_trabajos_antiguos(self):
+        """
+        Limita cuántos trabajos terminados se guardan para consultar su estado
+        """
+        terminados = [t for t in self.trabajos.values()
+                      if t['estado'] in ('completado', 'cancelado', 'error')]
+        for trabajo in terminados[:max(0, len(terminados) - self.max_trabajos_guardados)]:
+            del self.trabajos[trabajo['id']]
+    
+    def _resumen_trabajo(self, trabajo):
+        return {
+            'id': trabajo['id'],
+            'estado': trabajo['estado'],
+            'imagenes': len(trabajo['imagenes']),
+            'filtros': trabajo['filtros'],
+            'modo': trabajo['modo']
+        }
     
     async def comando_estado(self, websocket):
         """
-        Envía el estado actual del servidor
+        Envía el estado actual del servidor y de sus trabajos
         """
+        activos = [t for t in self.trabajos.values() if t['estado'] in ('en_cola', 'procesando')]
         await self.enviar_mensaje(websocket, {
             'tipo': 'estado',
             'datos': {
-                'procesando': self.procesando,
-                'clientes_conectados': len(self.clientes)
+                'procesando': any(t['estado'] == 'procesando' for t in activos),
+                'clientes_conectados': len(self.clientes),
+                'trabajos_en_cola': sum(1 for t in activos if t['estado'] == 'en_cola'),
+                'trabajos_concurrentes': self.max_trabajos_concurrentes,
+                'trabajos': [self._resumen_trabajo(t) for t in activos]
             }
         })
     
-    async def comando_cancelar(self, websocket):
+    async def comando_suscribir(self, websocket, comando):
         """
-        Cancela el procesamiento actual (funcionalidad futura)
+        Suscribe al cliente al canal de progreso de un trabajo
+        
+        Args:
+            comando: Diccionario con 'trabajo' (ID del trabajo)
         """
+        trabajo = self.trabajos.get(str(comando.get('trabajo')))
+        if trabajo is None:
+            await self.enviar_mensaje(websocket, {
+                'tipo': 'error',
+                'mensaje': f"Trabajo desconocido: {comando.get('trabajo')}"
+            })
+            return
+        
+        trabajo['suscriptores'].add(websocket)
         await self.enviar_mensaje(websocket, {
-            'tipo': 'info',
-            'mensaje': 'Funcionalidad de cancelación no implementada'
+            'tipo': 'suscrito',
+            'trabajo': trabajo['id'],
+            'datos': self._resumen_trabajo(trabajo)
         })
     
+    async def comando_cancelar(self, websocket, comando):
+        """
+        Cancela un trabajo por su ID o, si no se indica, los del cliente
+        Un trabajo en cola no llega a empezar; en uno en curso se cancelan
+        las tareas pendientes del pool y terminan solo las que ya se ejecutan
+        
+        Args:
+            comando: Diccionario con 'trabajo' (ID, opcional)
+        """
+        trabajo_id = comando.get('trabajo')
+        if trabajo_id is not None:
+            candidatos = [self.trabajos.get(str(trabajo_id))]
+        else:
+            candidatos = [t for t in self.trabajos.values() if t['cliente'] is websocket]
+        candidatos = [t for t in candidatos if t and t['estado'] in ('en_cola', 'procesando')]
+        
+        if not candidatos:
+            await self.enviar_mensaje(websocket, {
+                'tipo': 'error',
+                'mensaje': 'No hay trabajos que cancelar'
+            })
+            return
+        
+        for trabajo in candidatos:
+            if trabajo['estado'] == 'en_cola':
+                trabajo['estado'] = 'cancelado'
+                self.notificar_trabajo(trabajo, {
+                    'tipo': 'cancelado',
+                    'datos': {'resultados': []},
+                    'mensaje': f"Trabajo {trabajo['id']} cancelado"
+                })
+            elif trabajo['procesador'] is not None:
+                trabajo['procesador'].cancelar()
+    
     async def handler(self, websocket):
         """
         Manejador principal de conexiones WebSocket
@@ -321,8 +530,21 @@ class ServidorWebSocket:
         print(f"📡 Esperando conexiones...")
         print("="*60)
         
-        async with websockets.serve(self.handler, self.host, self.puerto):
-            await asyncio.Future()  # Ejecutar indefinidamente
+        self.loop = asyncio.get_running_loop()
+        self.cola_progreso = asyncio.Queue()
+        self.cola_trabajos = asyncio.Queue(maxsize=self.max_cola)
+        self.pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        self.tareas = [asyncio.create_task(self.difundir_progreso())]
+        self.tareas += [asyncio.create_task(self.trabajador())
+                        for _ in range(self.max_trabajos_concurrentes)]
+        
+        try:
+            async with websockets.serve(self.handler, self.host, self.puerto):
+                await asyncio.Future()  # Ejecutar indefinidamente
+        finally:
+            for tarea in self.tareas:
+                tarea.cancel()
+            self.pool.shutdown()
     
     def ejecutar(self):
         """
@@ -343,7 +565,8 @@ def main():
     Path("../output_images").mkdir(parents=True, exist_ok=True)
     
     # Crear y ejecutar servidor
-    servidor = ServidorWebSocket(host='localhost', puerto=8765)
+    servidor = ServidorWebSocket(host='localhost', puerto=8765,
+                                 cache=CacheResultados('../.cache_resultados'))
     servidor.ejecutar()
 
 
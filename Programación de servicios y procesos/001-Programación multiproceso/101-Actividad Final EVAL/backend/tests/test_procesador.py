@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+
+from PIL import Image
+
+from procesador import ProcesadorImagenes
+
+
+class TestProcesarPorTiles(unittest.TestCase):
+    def setUp(self):
+        # imágenes temporales para no tocar las carpetas del proyecto
+        self.tmp = tempfile.TemporaryDirectory()
+        self.eventos = []
+        self.procesador = ProcesadorImagenes(callback_progreso=self.eventos.append)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _imagen(self, modo, nombre):
+        ruta = os.path.join(self.tmp.name, nombre)
+        Image.new(modo, (64, 48), (10, 120, 200, 255)[:len(modo)]).save(ruta)
+        return ruta
+
+    def test_filtro_que_rechaza_el_modo_informa_error(self):
+        # posterizar se puede trocear, pero Pillow no lo admite en RGBA
+        ruta = self._imagen('RGBA', 'rgba.png')
+        salida = os.path.join(self.tmp.name, 'rgba_posterizar.png')
+
+        stats = self.procesador.procesar_imagen_por_tiles(ruta, salida, 'posterizar',
+                                                          tamanio_tile=16, max_workers=2)
+
+        self.assertEqual(stats['fallidas'], 1)
+        self.assertEqual(stats['exitosas'], 0)
+        self.assertEqual(self.eventos[-1]['estado'], 'error')
+        self.assertFalse(os.path.exists(salida))
+
+    def test_filtro_por_tiles_igual_que_completo(self):
+        ruta = self._imagen('RGB', 'rgb.png')
+        salida = os.path.join(self.tmp.name, 'rgb_invertir.png')
+
+        stats = self.procesador.procesar_imagen_por_tiles(ruta, salida, 'invertir',
+                                                          tamanio_tile=16, max_workers=2)
+
+        self.assertEqual(stats['exitosas'], 1)
+        self.assertEqual(stats['tiles'], 12)
+        with Image.open(salida) as resultado:
+            self.assertEqual(resultado.getpixel((0, 0)), (245, 135, 55))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -141,6 +141,12 @@ class AplicacionProcesadorImagenes {
                 this.log(mensaje.mensaje, 'success');
                 break;
                 
+            case 'cancelado':
+                this.log(`⛔ ${mensaje.mensaje}`, 'error');
+                this.procesando = false;
+                this.actualizarBotones();
+                break;
+                
             default:
                 console.log('Mensaje desconocido:', mensaje);
         }
@@ -169,7 +175,10 @@ class AplicacionProcesadorImagenes {
             'relieve': '🗻 Efecto Relieve',
             'posterizar': '🎨 Posterizar',
             'redimensionar': '📏 Redimensionar',
-            'marca_agua': '©️ Marca de Agua'
+            'marca_agua': '©️ Marca de Agua',
+            'blur_gaussiano': '🌁 Blur Gaussiano',
+            'enfocar': '🔍 Enfocar (Unsharp)',
+            'bordes_sobel': '📐 Bordes Sobel'
         };
         
         filtros.forEach(filtro => {
@@ -1,12 +1,19 @@
 import os
 import re
 import json
-import requests
+import uuid
+import hashlib
+import threading
+import unicodedata
 import mysql.connector
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 from flask import Flask, request, render_template_string, session, redirect, url_for, flash, jsonify
 from markdown import markdown  # server-side Markdown → HTML
 
+from ollama_cliente import OllamaError, obtener_cliente
+
 # ===================== CONFIG =====================
 MYSQL_CONFIG = {
     "host": os.environ.get("MYSQL_HOST", "127.0.0.1"),
@@ -19,6 +26,12 @@ MYSQL_CONFIG = {
 
 OLLAMA_BASE = os.environ.get("OLLAMA_BASE", "http://localhost:11434")
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama3.1:8b-instruct-q4_0")
+# Cliente compartido: conexiones keep-alive, reintentos y límite de peticiones simultáneas
+ollama = obtener_cliente(OLLAMA_BASE)
+# Mantener el modelo cargado entre preguntas: así Ollama reutiliza la caché KV
+# del prefijo común (esquema + catálogo) en lugar de volver a procesarlo
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_NUM_CTX = int(os.environ.get("OLLAMA_NUM_CTX", "0"))  # 0 = calcular según el esquema
 
 SCHEMA_PATH = os.environ.get("SCHEMA_PATH", "aplicacion.sql")
 MAX_SCHEMA_CHARS = 80_000
@@ -34,6 +47,10 @@ ALLOW_DML = os.environ.get("ALLOW_DML", "true").lower() in ("1", "true", "yes",
 # Schema strategy: "full" (no trimming) or "compact"
 SCHEMA_STRATEGY = os.environ.get("SCHEMA_STRATEGY", "full").lower()  # "full" | "compact"
 
+# Caché NL→SQL (preguntas ya resueltas) y comentario de resultados
+SQL_CACHE_SIZE = int(os.environ.get("SQL_CACHE_SIZE", "500"))
+COMMENTARY_MODE = os.environ.get("COMMENTARY_MODE", "async").lower()  # "async" | "sync" | "off"
+
 app = Flask(__name__)
 app.secret_key = SECRET_KEY
 
@@ -116,9 +133,19 @@ def build_catalog_from_raw(path: str) -> dict:
 # ===================== LLM helpers =====================
 SQL_BLOCK_RE = re.compile(r"```sql\s*(.*?)\s*```", re.I | re.S)
 
-def build_prompt(schema_text: str, user_question: str, catalog: dict) -> str:
+def build_system_prompt(schema_text: str, catalog: dict) -> str:
+    """
+    Parte fija del prompt (catálogo + esquema). Va siempre primero y sin
+    cambios para que Ollama reutilice su caché KV entre peticiones.
+    """
     catalog_json = json.dumps(catalog, ensure_ascii=False, indent=2)
+    return (
+        "Eres un asistente SQL para MySQL que trabaja sobre esta base de datos.\n\n"
+        f"=== CATÁLOGO (tablas → columnas) ===\n{catalog_json}\n=== FIN CATÁLOGO ===\n\n"
+        f"=== ESQUEMA SQL (texto completo) ===\n{schema_text}\n=== FIN ESQUEMA ===\n"
+    )
 
+def build_prompt(user_question: str) -> str:
     guidelines = (
         "Eres un asistente SQL **ESTRICTO** para MySQL.\n"
         "Debes usar ÚNICAMENTE tablas y columnas que aparecen en el **CATÁLOGO**.\n"
@@ -144,13 +171,28 @@ def build_prompt(schema_text: str, user_question: str, catalog: dict) -> str:
 
     return (
         f"{guidelines}\n\n"
-        f"=== CATÁLOGO (tablas → columnas) ===\n{catalog_json}\n=== FIN CATÁLOGO ===\n\n"
-        f"=== ESQUEMA SQL (texto completo) ===\n{schema_text}\n=== FIN ESQUEMA ===\n\n"
         f"{format_block}\n"
         f"Instrucción del usuario:\n{user_question}\n"
         "Recuerda: solo columnas/tablas del **CATÁLOGO**."
     )
 
+@lru_cache(maxsize=1)
+def load_llm_context(path: str) -> dict:
+    """
+    Prefijo fijo, catálogo, num_ctx y huella del contexto del modelo.
+    La huella cambia si cambian el esquema, las instrucciones o el modelo,
+    y forma parte de la clave de la caché NL→SQL.
+    """
+    catalog = build_catalog_from_raw(path)
+    system = build_system_prompt(load_schema_text(path), catalog)
+    fingerprint = hashlib.sha256(
+        "\0".join([OLLAMA_MODEL, system, build_prompt("")]).encode("utf-8")
+    ).hexdigest()[:16]
+    # ~3 caracteres por token + margen para la pregunta y la respuesta;
+    # el mismo valor en todas las llamadas (cambiarlo recarga el modelo)
+    num_ctx = OLLAMA_NUM_CTX or max(4096, -(-(len(system) // 3 + 1536) // 1024) * 1024)
+    return {"system": system, "catalog": catalog, "hash": fingerprint, "num_ctx": num_ctx}
+
 def build_results_comment_prompt(question: str, sql: str, sql_type: str,
                                  cols: list, rows: list, rowcount: int, limit_rows: int) -> str:
     preview = []
@@ -175,28 +217,17 @@ def build_results_comment_prompt(question: str, sql: str, sql_type: str,
 
     return f"{task}\n\nContexto:\n{json.dumps(payload, ensure_ascii=False)}"
 
-def call_ollama(prompt: str, temperature=0.1, num_predict=220) -> str:
-    r = requests.post(
-        f"{OLLAMA_BASE}/api/chat",
-        json={
-            "model": OLLAMA_MODEL,
-            "messages": [{"role": "user", "content": prompt}],
-            "stream": False,
-            "options": {"temperature": temperature, "num_predict": num_predict},
-        },
-        timeout=300,
-    )
-    if r.status_code != 200:
-        try:
-            payload = r.json()
-        except Exception:
-            payload = {"error": r.text}
-        raise RuntimeError(
-            f"Ollama chat error {r.status_code} — {payload.get('error') or payload} "
-            f"(base={OLLAMA_BASE} model={OLLAMA_MODEL})"
-        )
-    data = r.json()
-    return (data.get("message", {}).get("content") or data.get("response") or "").strip()
+def call_ollama(prompt: str, temperature=0.1, num_predict=220, system: str = None, num_ctx: int = None) -> str:
+    messages = [{"role": "user", "content": prompt}]
+    if system:
+        messages.insert(0, {"role": "system", "content": system})
+    options = {"temperature": temperature, "num_predict": num_predict}
+    if num_ctx:
+        options["num_ctx"] = num_ctx
+    try:
+        return ollama.chat(OLLAMA_MODEL, messages, options, timeout=300, keep_alive=OLLAMA_KEEP_ALIVE)
+    except OllamaError as e:
+        raise RuntimeError(f"Ollama chat error — {e} (base={OLLAMA_BASE} model={OLLAMA_MODEL})")
 
 def extract_sql_from_llm(text: str) -> str:
     m = SQL_BLOCK_RE.search(text)
@@ -207,6 +238,58 @@ def extract_sql_from_llm(text: str) -> str:
             return ln.strip().rstrip(";")
     return ""
 
+# ===================== Caché NL→SQL =====================
+_sql_cache: "OrderedDict[str, str]" = OrderedDict()
+_sql_cache_lock = threading.Lock()
+
+def normalize_question(question: str) -> str:
+    """Minúsculas, sin tildes, sin signos de puntuación y espacios simples."""
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[¿?¡!.,;:\"'`]+", " ", text)
+    return " ".join(text.split())
+
+def sql_cache_key(question: str, context_hash: str) -> str:
+    return f"{context_hash}:{normalize_question(question)}"
+
+def sql_cache_get(key: str):
+    with _sql_cache_lock:
+        sql = _sql_cache.get(key)
+        if sql is not None:
+            _sql_cache.move_to_end(key)
+        return sql
+
+def sql_cache_put(key: str, sql: str) -> None:
+    with _sql_cache_lock:
+        _sql_cache[key] = sql
+        _sql_cache.move_to_end(key)
+        while len(_sql_cache) > SQL_CACHE_SIZE:
+            _sql_cache.popitem(last=False)
+
+# ===================== Comentario en segundo plano =====================
+_commentary_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="comentario")
+_commentary_jobs: "OrderedDict[str, object]" = OrderedDict()
+_commentary_lock = threading.Lock()
+MAX_COMMENTARY_JOBS = 200
+
+def generate_commentary_html(prompt: str, ctx: dict) -> str:
+    try:
+        # Mismo prefijo de sistema que la generación de SQL: reutiliza la caché KV
+        comment_md = call_ollama(prompt, temperature=0.2, num_predict=220,
+                                 system=ctx["system"], num_ctx=ctx["num_ctx"])
+        return markdown(comment_md, extensions=["fenced_code", "tables"])
+    except Exception as e:
+        return f"<p><em>No se pudo generar el comentario: {str(e)}</em></p>"
+
+def submit_commentary(prompt: str, ctx: dict) -> str:
+    job_id = uuid.uuid4().hex
+    future = _commentary_pool.submit(generate_commentary_html, prompt, ctx)
+    with _commentary_lock:
+        _commentary_jobs[job_id] = future
+        while len(_commentary_jobs) > MAX_COMMENTARY_JOBS:
+            _commentary_jobs.popitem(last=False)
+    return job_id
+
 # ===================== SQL helpers & validation =====================
 def classify_sql_type(sql: str) -> str:
     s = sql.lower().strip()
@@ -374,6 +457,11 @@ a:hover{text-decoration:underline}
             <h3>Comentario</h3>
             {{ t.commentary_html|safe }}
           </div>
+        {% elif t.commentary_id %}
+          <div class="insights" data-comentario="{{ t.commentary_id }}">
+            <h3>Comentario</h3>
+            <p class="meta"><em>Generando comentario…</em></p>
+          </div>
         {% endif %}
 
         {% if t.show_table %}
@@ -408,6 +496,21 @@ a:hover{text-decoration:underline}
     <button type="submit">Ejecutar</button>
   </form>
 </div>
+<script>
+// Los comentarios se generan en segundo plano: se consultan hasta que estén listos
+document.querySelectorAll("[data-comentario]").forEach(function (box) {
+  function consultar() {
+    fetch("{{ url_for('index') }}comentario/" + box.dataset.comentario)
+      .then(function (r) { return r.json(); })
+      .then(function (d) {
+        if (d.listo) { box.innerHTML = "<h3>Comentario</h3>" + d.html; }
+        else { setTimeout(consultar, 1000); }
+      })
+      .catch(function () { setTimeout(consultar, 3000); });
+  }
+  consultar();
+});
+</script>
 </body></html>
 """
 
@@ -437,54 +540,59 @@ def chat():
     else:
         session.setdefault("history", [])
 
-    # Cargar esquema (full o compacto) y catálogo desde RAW
-    schema_text = load_schema_text(SCHEMA_PATH)
-    catalog = build_catalog_from_raw(SCHEMA_PATH)
-
-    # 1) Generar SQL (único bloque) con prompt estricto
-    try:
-        llm_text = call_ollama(build_prompt(schema_text, q, catalog), temperature=0.05, num_predict=200)
-    except Exception as e:
-        session["history"].append({
-            "title": "Error al generar SQL",
-            "subtitle": q,
-            "commentary_html": None,
-            "show_table": False,
-            "cols": None,
-            "rows": None,
-            "error": str(e),
-        })
-        session.modified = True
-        return redirect(url_for("index"))
-
-    sql = extract_sql_from_llm(llm_text)
-    if not sql:
-        session["history"].append({
-            "title": "No se pudo extraer SQL",
-            "subtitle": q,
-            "commentary_html": None,
-            "show_table": False,
-            "cols": None,
-            "rows": None,
-            "error": "La respuesta del modelo no contenía un bloque SQL válido.",
-        })
-        session.modified = True
-        return redirect(url_for("index"))
+    # Contexto fijo del modelo (esquema + catálogo) y caché de preguntas ya resueltas
+    ctx = load_llm_context(SCHEMA_PATH)
+    catalog = ctx["catalog"]
+    cache_key = sql_cache_key(q, ctx["hash"])
+    sql = sql_cache_get(cache_key)
+    from_cache = sql is not None
 
-    # 1.b) Validación contra catálogo (con regla de ambigüedad multi-tabla)
-    ok_catalog, why_catalog = validate_sql_against_catalog(sql, catalog)
-    if not ok_catalog:
-        session["history"].append({
-            "title": "Consulta bloqueada por catálogo",
-            "subtitle": sql,
-            "commentary_html": None,
-            "show_table": False,
-            "cols": None,
-            "rows": None,
-            "error": why_catalog,
-        })
-        session.modified = True
-        return redirect(url_for("index"))
+    if not from_cache:
+        # 1) Generar SQL (único bloque) con prompt estricto
+        try:
+            llm_text = call_ollama(build_prompt(q), temperature=0.05, num_predict=200,
+                                   system=ctx["system"], num_ctx=ctx["num_ctx"])
+        except Exception as e:
+            session["history"].append({
+                "title": "Error al generar SQL",
+                "subtitle": q,
+                "commentary_html": None,
+                "show_table": False,
+                "cols": None,
+                "rows": None,
+                "error": str(e),
+            })
+            session.modified = True
+            return redirect(url_for("index"))
+
+        sql = extract_sql_from_llm(llm_text)
+        if not sql:
+            session["history"].append({
+                "title": "No se pudo extraer SQL",
+                "subtitle": q,
+                "commentary_html": None,
+                "show_table": False,
+                "cols": None,
+                "rows": None,
+                "error": "La respuesta del modelo no contenía un bloque SQL válido.",
+            })
+            session.modified = True
+            return redirect(url_for("index"))
+
+        # 1.b) Validación contra catálogo (con regla de ambigüedad multi-tabla)
+        ok_catalog, why_catalog = validate_sql_against_catalog(sql, catalog)
+        if not ok_catalog:
+            session["history"].append({
+                "title": "Consulta bloqueada por catálogo",
+                "subtitle": sql,
+                "commentary_html": None,
+                "show_table": False,
+                "cols": None,
+                "rows": None,
+                "error": why_catalog,
+            })
+            session.modified = True
+            return redirect(url_for("index"))
 
     # 2) Reglas de seguridad generales
     ok, why = is_safe_query(sql)
@@ -506,18 +614,26 @@ def chat():
         typ, cols, rows, rowcount = run_query(sql)
         final_sql = add_max_exec_hint(ensure_limit(sql)) if typ == "select" else sql
 
-        # 4) Generar comentario (Markdown → HTML)
-        try:
+        # Solo se guardan SELECT ya validados y ejecutados sin error
+        if typ == "select" and not from_cache:
+            sql_cache_put(cache_key, sql)
+
+        # 4) Generar comentario (Markdown → HTML): en segundo plano, en línea o nada
+        comment_html = None
+        commentary_id = None
+        if COMMENTARY_MODE != "off":
             comment_prompt = build_results_comment_prompt(q, final_sql, typ, cols, rows, rowcount, MAX_ANALYSIS_ROWS)
-            comment_md = call_ollama(comment_prompt, temperature=0.2, num_predict=220)
-            comment_html = markdown(comment_md, extensions=["fenced_code", "tables"])
-        except Exception as e2:
-            comment_html = f"<p><em>No se pudo generar el comentario: {str(e2)}</em></p>"
+            if COMMENTARY_MODE == "async":
+                commentary_id = submit_commentary(comment_prompt, ctx)
+            else:
+                comment_html = generate_commentary_html(comment_prompt, ctx)
 
         # 5) Preparar tarjeta
         if typ == "select":
             title = "Resultados de la consulta"
             subtitle = f"{len(rows)} fila{'s' if len(rows)!=1 else ''} · SELECT con límite y tiempo máximo aplicados"
+            if from_cache:
+                subtitle += " · SQL reutilizado de la caché"
             show_table = True
         elif typ == "insert":
             title = "Inserción realizada"
@@ -540,6 +656,7 @@ def chat():
             "title": title,
             "subtitle": subtitle,
             "commentary_html": comment_html,
+            "commentary_id": commentary_id,
             "show_table": show_table,
             "cols": cols if show_table else None,
             "rows": rows if show_table else None,
@@ -560,16 +677,33 @@ def chat():
     session.modified = True
     return redirect(url_for("index"))
 
+@app.route("/comentario/<job_id>")
+def comentario(job_id):
+    with _commentary_lock:
+        future = _commentary_jobs.get(job_id)
+    if future is not None and not future.done():
+        return jsonify({"listo": False})
+    html = future.result() if future is not None else "<p><em>Comentario no disponible.</em></p>"
+
+    # Guardarlo en la tarjeta para que siga visible al recargar la página
+    for t in session.get("history", []):
+        if t.get("commentary_id") == job_id:
+            t["commentary_html"] = html
+            t["commentary_id"] = None
+            session.modified = True
+    return jsonify({"listo": True, "html": html})
+
 @app.route("/health")
 def health():
-    info = {"ollama_base": OLLAMA_BASE, "model": OLLAMA_MODEL, "schema_path": SCHEMA_PATH, "allow_dml": ALLOW_DML, "strategy": SCHEMA_STRATEGY}
+    info = {"ollama_base": OLLAMA_BASE, "model": OLLAMA_MODEL, "schema_path": SCHEMA_PATH, "allow_dml": ALLOW_DML, "strategy": SCHEMA_STRATEGY,
+            "commentary_mode": COMMENTARY_MODE, "sql_cache_entries": len(_sql_cache)}
     try:
-        v = requests.get(f"{OLLAMA_BASE}/api/version", timeout=3).json()
+        v = ollama.get_json("/api/version", timeout=3)
         info["ollama_version"] = v.get("version")
     except Exception as e:
         info["ollama_version_error"] = str(e)
     try:
-        tags = requests.get(f"{OLLAMA_BASE}/api/tags", timeout=5).json()
+        tags = ollama.get_json("/api/tags", timeout=5)
         info["available_models"] = [m.get("model") for m in tags.get("models", [])]
     except Exception as e:
         info["available_models_error"] = str(e)
@@ -3,17 +3,22 @@
 # to document each file with awareness of the whole project's structure.
 
 import os
-from typing import Iterable, Optional, Set, Dict, TextIO, List
+import sys
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Callable, Deque, Iterable, Optional, Set, Dict, TextIO, List, Tuple, Union
+
+# Concurrent AI requests; match the server's OLLAMA_NUM_PARALLEL so requests
+# are served in parallel instead of queueing inside Ollama
+DEFAULT_AI_PARALLEL = max(1, int(os.getenv("OLLAMA_NUM_PARALLEL", "1") or 1))
 
 # ==== Optional: AI documentation (Ollama/Qwen) ====
 # We support either:
-# - docai.document_code_with_project + docai.build_project_context   (preferred)
+# - docai.document_code_with_project                                 (preferred)
 # - docai.document_code_with_ollama                                  (fallback, builds prompt here)
+# In both cases each file gets its own context from contexto.ProjectMap.
 try:
-    from docai import (
-        document_code_with_project as _doc_ai_with_project,
-        build_project_context as _build_project_context_external,
-    )
+    from docai import document_code_with_project as _doc_ai_with_project
     _DOC_AI_WITH_PROJECT = True
     _DOC_AI_AVAILABLE = True
 except Exception:
@@ -25,6 +30,15 @@ except Exception:
         _DOC_AI_AVAILABLE = False
         _doc_ai_simple = None
 
+# Per-file answer cache (only used with document_code_with_project)
+try:
+    from docai import DocCache, DEFAULT_DOC_CACHE_DIR
+except Exception:
+    DocCache = None
+    DEFAULT_DOC_CACHE_DIR = None
+
+from contexto import ProjectMap
+
 # ---------- helpers ----------
 def list_entries(path: str, show_hidden: bool = False) -> Iterable[os.DirEntry]:
     with os.scandir(path) as it:
@@ -98,55 +112,59 @@ def _fenced_block(content: str, lang: str = "", escape_html_in_fences: bool = Fa
         return [f"~~~{lang}" if lang else "~~~", content, "~~~"]
     return [f"```{lang}" if lang else "```", content, "```"]
 
-# ---------- local project-context builder (fallback) ----------
-def _build_project_context_local(
-    root: str,
-    allowed_exts: Optional[Set[str]] = None,
-    max_file_bytes: int = 50_000,
-    max_files: Optional[int] = None,
-) -> str:
-    """
-    Build a compact Markdown snapshot of the project: folder headings + capped file contents.
-    """
-    lines: List[str] = []
-    count = 0
-    root_abs = os.path.abspath(root)
-    for dirpath, _, files in os.walk(root_abs):
-        rel = os.path.relpath(dirpath, root_abs)
-        lines.append(f"\n## 📁 {rel if rel != '.' else os.path.basename(root_abs)}")
-        for fname in sorted(files):
-            ext = os.path.splitext(fname)[1].lstrip(".").lower()
-            if allowed_exts and ext not in allowed_exts:
-                continue
-            if ext in _KNOWN_BINARY_EXT:
-                continue
-            path = os.path.join(dirpath, fname)
-            try:
-                size = os.path.getsize(path)
-                with open(path, "rb") as fh:
-                    raw = fh.read(min(size, max_file_bytes))
-                if not _looks_text_bytes(raw):
-                    continue
-                content = raw.decode("utf-8", errors="replace")
-                lines.append(f"\n### 📄 {fname}")
-                lines.append("```" + (ext or ""))
-                lines.append(content)
-                if size > max_file_bytes:
-                    lines.append(f"... [truncated after {max_file_bytes} bytes]")
-                lines.append("```")
-                count += 1
-                if max_files is not None and count >= max_files:
-                    lines.append("\n> [Contexto truncado: límite de archivos alcanzado]")
-                    return "\n".join(lines)
-            except Exception as e:
-                lines.append(f"\n### 📄 {fname} (no leído: {e})")
-    return "\n".join(lines)
-
 # ---------- streaming core ----------
 def write_line(out: TextIO, line: str = "") -> None:
     out.write(line + "\n")
     out.flush()
 
+class _OrderedOutput:
+    """
+    TextIO-like wrapper that keeps tree order while AI docs are generated
+    concurrently: text written after a pending result is held back until
+    that result has been rendered, then everything is written in order.
+    """
+
+    def __init__(self, out: TextIO, max_pending: int):
+        self._out = out
+        self._items: Deque[Union[str, tuple]] = deque()
+        self._pending = 0
+        self.max_pending = max_pending
+
+    def write(self, text: str) -> int:
+        if self._items:
+            self._items.append(text)
+        else:
+            self._out.write(text)
+        return len(text)
+
+    def flush(self) -> None:
+        self._drain(self.max_pending)
+        self._out.flush()
+
+    def defer(self, future: Future, render: Callable[[List[str]], str]) -> None:
+        """Reserve a slot for `render(future.result())`; blocks when too many are pending."""
+        self._items.append((future, render))
+        self._pending += 1
+        self._drain(self.max_pending)
+
+    def close(self) -> None:
+        self._drain(0)
+        self._out.flush()
+
+    def _drain(self, max_pending: int) -> None:
+        # Write everything that is ready; wait on the oldest result only
+        # while more than `max_pending` are outstanding
+        while self._items:
+            item = self._items[0]
+            if not isinstance(item, str):
+                future, render = item
+                if not future.done() and self._pending <= max_pending:
+                    break
+                item = render(future.result())
+                self._pending -= 1
+            self._out.write(item)
+            self._items.popleft()
+
 def write_markdown_stream(
     out: TextIO,
     path: str,
@@ -163,45 +181,122 @@ def write_markdown_stream(
     escape_html_for_exts: Set[str] = frozenset({"html","htm","xml","xhtml","svg"}),
     use_ai_doc: bool = True,
     ai_only_when_allowed_ext: bool = True,
-    project_context: Optional[str] = None,      # pass in to reuse across calls
-    project_ctx_allowed_exts: Optional[Set[str]] = None,  # which exts to include in project snapshot
-    project_ctx_max_file_bytes: int = 50_000,   # per-file cap inside snapshot
-    project_ctx_max_chars: Optional[int] = 400_000,  # final char cap for snapshot (avoid overlong prompts)
+    project_context: Optional[str] = None,      # fixed context for every file (default: per-file from the project map)
+    project_ctx_allowed_exts: Optional[Set[str]] = None,  # which exts to include in the project map
+    project_ctx_max_file_bytes: int = 50_000,   # per-file bytes read when building the map
+    project_ctx_max_chars: Optional[int] = 400_000,  # char cap for a caller-supplied project_context
+    project_ctx_token_budget: int = 1500,       # approx. tokens of context per file (tree + related files)
+    ai_parallel: Optional[int] = None,          # concurrent AI requests (default: OLLAMA_NUM_PARALLEL)
+    ai_cache_dir: Optional[str] = DEFAULT_DOC_CACHE_DIR,  # reuse answers for unchanged files (None = off)
     _current_depth: int = 0,
     _root_dir: Optional[str] = None,
+    _executor: Optional[Executor] = None,
+    _doc_cache: Optional["DocCache"] = None,
+    _project_map: Optional[ProjectMap] = None,
 ) -> None:
     """
     Stream the Markdown for `path` directly to `out`, flushing as we go.
-    Reuses a single `project_context` for all files so the model can reason
-    about each file's role within the whole project.
+    The project map (tree + per-file signatures and references) is built
+    once, cached under `ai_cache_dir`, and each file is sent with the tree
+    and its related files only (imports/references, files that use it,
+    folder mates), within `project_ctx_token_budget`.
+
+    With `ai_parallel` > 1 the AI docs are requested through a bounded thread
+    pool while the tree walk continues; the output is still written in tree
+    order (later text is buffered until the pending doc arrives).
+
+    With `ai_cache_dir`, answers are cached per file content, model, prompt
+    version and the related files in the per-file context (so editing a
+    file only invalidates the files related to it; the tree is not part of
+    the key); after a top-level run, entries of this
+    project that were not used are pruned and the hit rate is reported on
+    stderr.
     """
     # Build/context once at the top-level if needed
     if _root_dir is None:
         _root_dir = os.path.abspath(path)
-    if use_ai_doc and _DOC_AI_AVAILABLE and project_context is None and _current_depth == 0:
-        # Prefer external builder from docai.py; otherwise local fallback
-        ctx_exts = project_ctx_allowed_exts or (allowed_extensions or {"py","js","ts","tsx","jsx","html","css","md","php","json","yaml","yml","xml","sql","sh"})
-        if _DOC_AI_WITH_PROJECT and _build_project_context_external is not None:
-            try:
-                project_context = _build_project_context_external(
-                    _root_dir,
-                    allowed_exts=ctx_exts,
-                    max_file_bytes=project_ctx_max_file_bytes,
-                )
-            except Exception:
-                project_context = _build_project_context_local(
-                    _root_dir,
-                    allowed_exts=ctx_exts,
-                    max_file_bytes=project_ctx_max_file_bytes,
-                )
-        else:
-            project_context = _build_project_context_local(
+    if use_ai_doc and _DOC_AI_AVAILABLE and _current_depth == 0:
+        if project_context is not None:
+            if project_ctx_max_chars is not None and len(project_context) > project_ctx_max_chars:
+                project_context = project_context[:project_ctx_max_chars] + "\n\n> [Contexto truncado por longitud]\n"
+        elif _project_map is None:
+            ctx_exts = project_ctx_allowed_exts or (allowed_extensions or {"py","js","ts","tsx","jsx","html","css","md","php","json","yaml","yml","xml","sql","sh"})
+            _project_map = ProjectMap.build(
                 _root_dir,
                 allowed_exts=ctx_exts,
                 max_file_bytes=project_ctx_max_file_bytes,
+                cache_dir=ai_cache_dir,
             )
-        if project_ctx_max_chars is not None and len(project_context) > project_ctx_max_chars:
-            project_context = project_context[:project_ctx_max_chars] + "\n\n> [Contexto truncado por longitud]\n"
+
+    # Top-level run with cache: walk with it, then prune and report
+    if (_doc_cache is None and _current_depth == 0 and use_ai_doc and _DOC_AI_WITH_PROJECT
+            and ai_cache_dir and DocCache is not None):
+        cache = DocCache(ai_cache_dir, namespace=_root_dir)
+        write_markdown_stream(
+            out, path,
+            show_hidden=show_hidden,
+            max_depth=max_depth,
+            base_level=base_level,
+            files_as_headings=files_as_headings,
+            link_files=link_files,
+            allowed_extensions=allowed_extensions,
+            max_file_bytes=max_file_bytes,
+            lang_override=lang_override,
+            use_emojis=use_emojis,
+            escape_html_for_exts=escape_html_for_exts,
+            use_ai_doc=use_ai_doc,
+            ai_only_when_allowed_ext=ai_only_when_allowed_ext,
+            project_context=project_context,
+            project_ctx_allowed_exts=project_ctx_allowed_exts,
+            project_ctx_max_file_bytes=project_ctx_max_file_bytes,
+            project_ctx_max_chars=project_ctx_max_chars,
+            project_ctx_token_budget=project_ctx_token_budget,
+            ai_parallel=ai_parallel,
+            ai_cache_dir=ai_cache_dir,
+            _root_dir=_root_dir,
+            _doc_cache=cache,
+            _project_map=_project_map,
+        )
+        pruned = cache.prune_unused()
+        print(f"docai cache: {cache.hits}/{cache.hits + cache.misses} hits "
+              f"({cache.hit_rate:.0%}), {pruned} stale entries pruned", file=sys.stderr)
+        return
+
+    # Concurrent mode: run the whole walk through an ordered output and a pool
+    ai_parallel = DEFAULT_AI_PARALLEL if ai_parallel is None else ai_parallel
+    if _executor is None and _current_depth == 0 and use_ai_doc and _DOC_AI_AVAILABLE and ai_parallel > 1:
+        ordered = _OrderedOutput(out, max_pending=4 * ai_parallel)
+        with ThreadPoolExecutor(max_workers=ai_parallel, thread_name_prefix="docai") as executor:
+            try:
+                write_markdown_stream(
+                    ordered, path,
+                    show_hidden=show_hidden,
+                    max_depth=max_depth,
+                    base_level=base_level,
+                    files_as_headings=files_as_headings,
+                    link_files=link_files,
+                    allowed_extensions=allowed_extensions,
+                    max_file_bytes=max_file_bytes,
+                    lang_override=lang_override,
+                    use_emojis=use_emojis,
+                    escape_html_for_exts=escape_html_for_exts,
+                    use_ai_doc=use_ai_doc,
+                    ai_only_when_allowed_ext=ai_only_when_allowed_ext,
+                    project_context=project_context,
+                    project_ctx_allowed_exts=project_ctx_allowed_exts,
+                    project_ctx_max_file_bytes=project_ctx_max_file_bytes,
+                    project_ctx_max_chars=project_ctx_max_chars,
+                    project_ctx_token_budget=project_ctx_token_budget,
+                    ai_parallel=ai_parallel,
+                    ai_cache_dir=ai_cache_dir,
+                    _root_dir=_root_dir,
+                    _executor=executor,
+                    _doc_cache=_doc_cache,
+                    _project_map=_project_map,
+                )
+            finally:
+                ordered.close()
+        return
 
     # normalize allowed file-content exts
     if allowed_extensions is not None:
@@ -243,19 +338,31 @@ def write_markdown_stream(
             return False
         return True
 
-    def _ai_doc_lines(filename: str, content: str, ext: str) -> List[str]:
+    def _context_for(file_path: str) -> Tuple[str, Optional[str]]:
+        # (prompt context, cache identity); the map's identity leaves out the
+        # tree and folder mates so unrelated files do not invalidate the cache
+        if project_context is not None:
+            return project_context, None
+        if _project_map is not None:
+            return _project_map.context_and_key(file_path, budget_tokens=project_ctx_token_budget)
+        return "", None
+
+    def _ai_doc_lines(filename: str, content: str, ext: str, file_path: str) -> List[str]:
         if not use_ai_doc or not _DOC_AI_AVAILABLE:
             return []
         try:
-            if _DOC_AI_WITH_PROJECT and project_context is not None:
-                md = _doc_ai_with_project(filename=filename, code=content, ext=ext, project_context=project_context)
+            context, cache_context = _context_for(file_path)
+            if _DOC_AI_WITH_PROJECT:
+                md = _doc_ai_with_project(filename=filename, code=content, ext=ext,
+                                          project_context=context, cache=_doc_cache,
+                                          cache_context=cache_context)
                 return md.strip().splitlines()
             elif _doc_ai_simple is not None:
                 # Fallback: build a prompt in-process that includes compact project context
                 prompt = f"""Eres un asistente técnico.
 
 Contexto del PROYECTO (resumen):
-{project_context or "(no context available)"}
+{context or "(no context available)"}
 
 Ahora concéntrate en este archivo:
 
@@ -275,6 +382,19 @@ Tarea:
         except Exception as e:
             return [f"> ⚠️ No se pudo generar documentación automática para {filename}: {e}"]
 
+    def _render_ai(ai: List[str], indent: str) -> str:
+        if not ai:
+            return ""
+        return "\n" + "".join(((indent + ln) if ln else indent) + "\n" for ln in ai)
+
+    def _write_ai_doc(file_entry: os.DirEntry, content: str, ext: str, indent: str = "") -> None:
+        if _executor is not None and use_ai_doc and _DOC_AI_AVAILABLE:
+            future = _executor.submit(_ai_doc_lines, file_entry.name, content, ext, file_entry.path)
+            out.defer(future, lambda ai: _render_ai(ai, indent))
+        else:
+            out.write(_render_ai(_ai_doc_lines(file_entry.name, content, ext, file_entry.path), indent))
+            out.flush()
+
     # --- files ---
     if files_as_headings:
         # Each file as its own heading, then AI doc + code
@@ -292,10 +412,7 @@ Tarea:
                 escape_html = ext in escape_html_for_exts
 
                 # AI doc first
-                ai = _ai_doc_lines(f.name, content, ext)
-                if ai:
-                    write_line(out)
-                    for ln in ai: write_line(out, ln)
+                _write_ai_doc(f, content, ext)
 
                 # Code block
                 write_line(out)
@@ -318,11 +435,7 @@ Tarea:
                 escape_html = ext in escape_html_for_exts
 
                 # AI doc (indented)
-                ai = _ai_doc_lines(f.name, content, ext)
-                if ai:
-                    write_line(out)
-                    for ln in ai:
-                        write_line(out, ("    " + ln) if ln else "    ")
+                _write_ai_doc(f, content, ext, indent="    ")
 
                 # Code block (indented)
                 write_line(out)
@@ -348,12 +461,18 @@ Tarea:
             escape_html_for_exts=escape_html_for_exts,
             use_ai_doc=use_ai_doc,
             ai_only_when_allowed_ext=ai_only_when_allowed_ext,
-            project_context=project_context,  # reuse the same snapshot!
+            project_context=project_context,
             project_ctx_allowed_exts=project_ctx_allowed_exts,
             project_ctx_max_file_bytes=project_ctx_max_file_bytes,
             project_ctx_max_chars=project_ctx_max_chars,
+            project_ctx_token_budget=project_ctx_token_budget,
+            ai_parallel=ai_parallel,
+            ai_cache_dir=ai_cache_dir,
             _current_depth=_current_depth + 1,
             _root_dir=_root_dir,
+            _executor=_executor,
+            _doc_cache=_doc_cache,
+            _project_map=_project_map,  # reuse the same map!
         )
 
 # === example direct run ===
@@ -378,5 +497,8 @@ if __name__ == "__main__":
             project_ctx_allowed_exts={"py","js","ts","tsx","jsx","html","css","md","php","json","yaml","yml","xml","sql","sh"},
             project_ctx_max_file_bytes=50_000,
             project_ctx_max_chars=400_000,
+            project_ctx_token_budget=1500,      # approx. tokens of project context sent with each file
+            ai_parallel=None,                   # concurrent AI requests; defaults to OLLAMA_NUM_PARALLEL
+            ai_cache_dir=DEFAULT_DOC_CACHE_DIR, # unchanged files reuse their previous doc (None = off)
         )
 
@@ -0,0 +1,410 @@
+# contexto.py
+# Hierarchical project context for the AI documentation. Instead of pasting
+# every file into every prompt, a compact project map (tree + per-file
+# summary, signatures and references) is built once and cached on disk;
+# each file then gets the tree plus only its related neighbours (what it
+# imports/references, what references it, its folder mates), trimmed to a
+# token budget.
+
+import ast
+import hashlib
+import json
+import os
+import re
+import tempfile
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+MAP_FORMAT_VERSION = 1
+CHARS_PER_TOKEN = 4          # rough estimate, good enough for budgeting
+MAX_SIGNATURES = 25          # per file, in the map
+MAX_REFS = 50                # per file, in the map
+
+_SKIP_DIRS = {"__pycache__", "node_modules", "venv", ".venv"}
+_KNOWN_BINARY_EXT = {
+    "pyc","pyo","so","o","a","bin","exe","dll","dylib","class","jar","zip","7z","gz","bz2",
+    "xz","png","jpg","jpeg","gif","webp","ico","pdf","mp3","wav","ogg","mp4","mov","avi","mkv",
+    "ttf","otf","woff","woff2","sqlite","db"
+}
+
+_JS_IMPORT = re.compile(r"""(?:\bfrom\s*|\bimport\s*\(?\s*|\brequire\s*\(\s*)['"]([^'"]+)['"]""")
+_JS_DEF = re.compile(
+    r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?"
+    r"(function\s*\*?\s*\w+\s*\([^)]*\)|class\s+\w+(?:\s+extends\s+\w+)?"
+    r"|(?:const|let|var)\s+\w+\s*=\s*(?:async\s*)?(?:\([^)]*\)|\w+)\s*=>)", re.M)
+_PHP_INCLUDE = re.compile(
+    r"""\b(?:include|require)(?:_once)?\s*\(?\s*(?:__DIR__\s*\.\s*)?['"]([^'"]+)['"]""")
+_PHP_DEF = re.compile(
+    r"^\s*(?:(?:public|private|protected|static|abstract|final)\s+)*"
+    r"(function\s+\w+\s*\([^)]*\)|class\s+\w+)", re.M)
+_HTML_REF = re.compile(r"""\b(?:src|href|action)\s*=\s*['"]([^'"#?]+)""", re.I)
+_HTML_TITLE = re.compile(r"<title>\s*([^<]+?)\s*</title>", re.I)
+_CSS_SELECTOR = re.compile(r"^([^{}@/\s][^{}]*?)\s*\{", re.M)
+_MD_HEADING = re.compile(r"^#{1,3}\s+(.+)$", re.M)
+_SQL_DEF = re.compile(r"\bCREATE\s+(?:TABLE|VIEW|INDEX)\s+(?:IF\s+NOT\s+EXISTS\s+)?[`\"\[]?(\w+)", re.I)
+_FILE_MENTION = re.compile(
+    r"[\w./-]+\.(?:py|js|ts|tsx|jsx|php|html|htm|css|json|sql|md|yaml|yml|xml|sh)\b")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _looks_text_bytes(sample: bytes, min_printable_ratio: float = 0.85) -> bool:
+    if b"\x00" in sample:
+        return False
+    try:
+        sample.decode("utf-8")
+        return True
+    except UnicodeDecodeError as e:
+        if e.start >= len(sample) - 3:   # multibyte char cut by the sample
+            return True
+    printable = sum(ch >= 9 and (ch in (9, 10, 13) or 32 <= ch <= 126) for ch in sample)
+    return printable / max(1, len(sample)) >= min_printable_ratio
+
+
+_NOISE_LINES = {"php", "doctype html", "html", "head", "body", "use strict"}
+
+def _first_line(text: str, limit: int = 120) -> str:
+    """First line that says something (skips blank, punctuation-only and boilerplate lines)."""
+    for line in text.splitlines()[:200]:
+        line = line.strip().strip("#/*<>!-=?").strip()
+        if len(line) < 3 or line.lower() in _NOISE_LINES or not any(ch.isalpha() for ch in line):
+            continue
+        return line[:limit]
+    return ""
+
+
+# ---------- per-language extraction ----------
+def _extract_python(text: str) -> Tuple[str, List[str], List[str]]:
+    try:
+        tree = ast.parse(text)
+    except SyntaxError:
+        return _first_line(text), [], []
+    summary = _first_line(ast.get_docstring(tree) or "") or _first_line(text)
+    signatures: List[str] = []
+    refs: List[str] = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            signatures.append(f"def {node.name}({ast.unparse(node.args)})")
+        elif isinstance(node, ast.ClassDef):
+            methods = [n.name for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            signatures.append(f"class {node.name}: {', '.join(methods)}" if methods else f"class {node.name}")
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            refs.extend("py:" + alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = "." * node.level + (node.module or "")
+            refs.append("py:" + base)
+            # `from pkg import mod` may name submodules; unresolved names are dropped
+            sep = "." if node.module else ""
+            refs.extend("py:" + base + sep + alias.name for alias in node.names if alias.name != "*")
+    return summary, signatures, refs
+
+
+def _extract_generic(ext: str, text: str) -> Tuple[str, List[str], List[str]]:
+    summary = _first_line(text)
+    signatures: List[str] = []
+    refs: List[str] = []
+    if ext in ("js", "ts", "tsx", "jsx", "mjs"):
+        signatures = [m.group(1).strip() for m in _JS_DEF.finditer(text)]
+        refs = _JS_IMPORT.findall(text)
+    elif ext == "php":
+        signatures = [m.group(1).strip() for m in _PHP_DEF.finditer(text)]
+        refs = _PHP_INCLUDE.findall(text) + _HTML_REF.findall(text)
+        title = _HTML_TITLE.search(text)
+        summary = title.group(1) if title else summary
+    elif ext in ("html", "htm", "xhtml"):
+        refs = _HTML_REF.findall(text)
+        title = _HTML_TITLE.search(text)
+        summary = title.group(1) if title else summary
+    elif ext == "css":
+        signatures = [" ".join(m.group(1).split())[:80] for m in _CSS_SELECTOR.finditer(text)]
+    elif ext == "md":
+        signatures = [m.group(1).strip() for m in _MD_HEADING.finditer(text)]
+        summary = signatures[0] if signatures else summary
+    elif ext == "sql":
+        signatures = _SQL_DEF.findall(text)
+    return summary, signatures, refs
+
+
+def extract_file(ext: str, text: str) -> Dict:
+    """Summary, signatures and raw references (imports + file mentions) of one file."""
+    if ext == "py":
+        summary, signatures, refs = _extract_python(text)
+    else:
+        summary, signatures, refs = _extract_generic(ext, text)
+    if ext != "md":  # docs mention files without depending on them
+        refs += _FILE_MENTION.findall(text)
+    refs = list(dict.fromkeys(refs))
+    return {
+        "summary": summary,
+        "signatures": signatures[:MAX_SIGNATURES],
+        "refs": refs[:MAX_REFS],
+    }
+
+
+# ---------- project map ----------
+class ProjectMap:
+    """
+    Compact map of a project. `files` maps each relative path (with "/")
+    to its size, mtime, summary, signatures and raw references; the
+    reference graph is resolved after loading.
+    """
+
+    def __init__(self, root: str, files: Dict[str, Dict]):
+        self.root = os.path.abspath(root)
+        self.files = files
+        self._by_name: Dict[str, List[str]] = {}
+        for rel in files:
+            self._by_name.setdefault(rel.rsplit("/", 1)[-1], []).append(rel)
+        self.uses: Dict[str, List[str]] = {rel: self._resolve_refs(rel) for rel in files}
+        self.used_by: Dict[str, List[str]] = {rel: [] for rel in files}
+        for rel, targets in self.uses.items():
+            for target in targets:
+                self.used_by[target].append(rel)
+        self._tree_cache: Dict[int, str] = {}
+
+    # --- building ---
+    @classmethod
+    def build(cls,
+              root: str,
+              allowed_exts: Optional[Set[str]] = None,
+              max_file_bytes: int = 50_000,
+              cache_dir: Optional[str] = None) -> "ProjectMap":
+        """
+        Walk `root` and build the map. With `cache_dir`, the map is saved
+        there and unchanged files (same size and mtime) are not re-read on
+        the next build.
+        """
+        root = os.path.abspath(root)
+        cache_path = None
+        previous: Dict[str, Dict] = {}
+        if cache_dir:
+            digest = hashlib.sha256(root.encode("utf-8", errors="replace")).hexdigest()[:16]
+            cache_path = os.path.join(cache_dir, f"{digest}-map.json")
+            try:
+                with open(cache_path, "r", encoding="utf-8") as fh:
+                    saved = json.load(fh)
+                if saved.get("version") == MAP_FORMAT_VERSION:
+                    previous = saved.get("files", {})
+            except (OSError, ValueError):
+                previous = {}
+
+        files: Dict[str, Dict] = {}
+        changed = False
+        for path, rel, ext in _walk_files(root, allowed_exts):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            old = previous.get(rel)
+            if old and old.get("size") == st.st_size and old.get("mtime") == st.st_mtime_ns:
+                files[rel] = old
+                continue
+            try:
+                with open(path, "rb") as fh:
+                    raw = fh.read(max_file_bytes)
+            except OSError:
+                continue
+            if not _looks_text_bytes(raw[:4096]):
+                continue
+            entry = extract_file(ext, raw.decode("utf-8", errors="replace"))
+            entry.update(size=st.st_size, mtime=st.st_mtime_ns)
+            files[rel] = entry
+            changed = True
+
+        if cache_path and (changed or set(files) != set(previous)):
+            _save_json(cache_path, {"version": MAP_FORMAT_VERSION, "root": root, "files": files})
+        return cls(root, files)
+
+    # --- reference resolution ---
+    def _resolve_path(self, rel_from: str, ref: str) -> Optional[str]:
+        ref = ref.split("?", 1)[0].split("#", 1)[0].strip()
+        if not ref or "://" in ref or ref.startswith("//"):
+            return None
+        base = rel_from.rsplit("/", 1)[0] if "/" in rel_from else ""
+        candidate = ref.lstrip("/") if ref.startswith("/") else os.path.normpath(os.path.join(base, ref))
+        candidate = candidate.replace(os.sep, "/")
+        if candidate in self.files and candidate != rel_from:
+            return candidate
+        # Fall back to the file name when it is unique in the project
+        same_name = self._by_name.get(ref.rsplit("/", 1)[-1], [])
+        if len(same_name) == 1 and same_name[0] != rel_from:
+            return same_name[0]
+        return None
+
+    def _resolve_python(self, rel_from: str, module: str) -> Optional[str]:
+        level = len(module) - len(module.lstrip("."))
+        parts = [p for p in module.lstrip(".").split(".") if p]
+        base_dir = rel_from.rsplit("/", 1)[0] if "/" in rel_from else ""
+        if level:
+            for _ in range(level - 1):
+                base_dir = base_dir.rsplit("/", 1)[0] if "/" in base_dir else ""
+            bases = [base_dir]
+        else:
+            bases = [base_dir, ""]
+        for base in bases:
+            stem = "/".join([p for p in [base] + parts if p])
+            for candidate in (stem + ".py", stem + "/__init__.py"):
+                if candidate in self.files and candidate != rel_from:
+                    return candidate
+        if not level and parts:
+            # Packages imported from a parent folder added to sys.path
+            suffix = "/".join(parts) + ".py"
+            matches = [rel for rel in self.files if rel == suffix or rel.endswith("/" + suffix)]
+            if len(matches) == 1 and matches[0] != rel_from:
+                return matches[0]
+        return None
+
+    def _resolve_refs(self, rel: str) -> List[str]:
+        found: List[str] = []
+        for ref in self.files[rel].get("refs", []):
+            if ref.startswith("py:"):
+                target = self._resolve_python(rel, ref[3:])
+            else:
+                target = self._resolve_path(rel, ref)
+            if target and target not in found:
+                found.append(target)
+        return found
+
+    # --- rendering ---
+    def tree(self, max_chars: Optional[int] = None) -> str:
+        """Indented tree of the project files; folders are collapsed to counts if it does not fit."""
+        key = max_chars or 0
+        if key in self._tree_cache:
+            return self._tree_cache[key]
+        text = self._render_tree(collapse=False)
+        if max_chars is not None and len(text) > max_chars:
+            text = self._render_tree(collapse=True)
+            if len(text) > max_chars:
+                text = text[:max_chars].rsplit("\n", 1)[0] + "\n…"
+        self._tree_cache[key] = text
+        return text
+
+    def _render_tree(self, collapse: bool) -> str:
+        lines: List[str] = []
+        seen_dirs: Set[str] = set()
+        counts: Dict[str, int] = {}
+        for rel in sorted(self.files):
+            folder = rel.rsplit("/", 1)[0] if "/" in rel else ""
+            counts[folder] = counts.get(folder, 0) + 1
+        for rel in sorted(self.files):
+            parts = rel.split("/")
+            for depth in range(1, len(parts)):
+                folder = "/".join(parts[:depth])
+                if folder not in seen_dirs:
+                    seen_dirs.add(folder)
+                    suffix = f" ({counts.get(folder, 0)} archivos)" if collapse and counts.get(folder) else ""
+                    lines.append("  " * (depth - 1) + parts[depth - 1] + "/" + suffix)
+            if not collapse:
+                lines.append("  " * (len(parts) - 1) + parts[-1])
+        if collapse and counts.get(""):
+            lines.append(f"({counts['']} archivos en la raíz)")
+        return "\n".join(lines)
+
+    def describe(self, rel: str, max_signatures: int = MAX_SIGNATURES) -> str:
+        entry = self.files[rel]
+        lines = [f"### {rel}"]
+        if entry.get("summary"):
+            lines.append(entry["summary"])
+        lines.extend("- " + sig for sig in entry.get("signatures", [])[:max_signatures])
+        return "\n".join(lines)
+
+    def overview(self, max_chars: Optional[int] = None) -> str:
+        """Tree plus one line per file (used when no specific file is targeted)."""
+        lines = [self.tree(), ""]
+        lines.extend(f"- {rel}: {entry.get('summary', '')}" for rel, entry in sorted(self.files.items()))
+        text = "\n".join(lines)
+        if max_chars is not None and len(text) > max_chars:
+            text = text[:max_chars] + "\n…"
+        return text
+
+    def neighbours(self, rel: str) -> List[Tuple[str, str]]:
+        """Related files, most relevant first, with the relation."""
+        ranked: List[Tuple[str, str]] = []
+        seen = {rel}
+        folder = rel.rsplit("/", 1)[0] if "/" in rel else ""
+        siblings = [r for r in sorted(self.files)
+                    if (r.rsplit("/", 1)[0] if "/" in r else "") == folder]
+        groups: Iterable[Tuple[str, List[str]]] = (
+            ("usado por este archivo", self.uses.get(rel, [])),
+            ("usa este archivo", self.used_by.get(rel, [])),
+            ("misma carpeta", siblings),
+        )
+        for relation, paths in groups:
+            for path in paths:
+                if path not in seen:
+                    seen.add(path)
+                    ranked.append((path, relation))
+        return ranked
+
+    def context_for(self, path: str, budget_tokens: int = 1500) -> str:
+        """
+        Context for one file: the project tree (at most ~1/3 of the budget)
+        and the description of its neighbours until the budget runs out.
+        """
+        return self.context_and_key(path, budget_tokens)[0]
+
+    def context_and_key(self, path: str, budget_tokens: int = 1500) -> Tuple[str, str]:
+        """
+        Same context as `context_for`, plus the part of it that identifies
+        the file for caching: its path and the included descriptions of the
+        files it uses or that use it. The tree and the folder mates are left
+        out, so adding or removing an unrelated file does not change the key.
+        """
+        rel = self._rel(path)
+        budget = budget_tokens * CHARS_PER_TOKEN
+        parts = ["## Estructura del proyecto", self.tree(max_chars=budget // 3)]
+        key_parts = [rel]
+        used = sum(len(p) + 1 for p in parts)
+        if rel in self.files:
+            header = f"\n## Archivos relacionados con {rel}"
+            parts.append(header)
+            used += len(header) + 1
+            for neighbour, relation in self.neighbours(rel):
+                block = self.describe(neighbour).replace("\n", f" ({relation})\n", 1)
+                if used + len(block) + 1 > budget:
+                    # Try a shorter version before giving up on this neighbour
+                    block = self.describe(neighbour, max_signatures=3).replace("\n", f" ({relation})\n", 1)
+                    if used + len(block) + 1 > budget:
+                        continue
+                parts.append(block)
+                used += len(block) + 1
+                if relation != "misma carpeta":
+                    key_parts.append(block)
+        return "\n".join(parts), "\n".join(key_parts)
+
+    def _rel(self, path: str) -> str:
+        """Accepts a path relative to the project root or any path on disk."""
+        rel = path.replace(os.sep, "/")
+        if rel in self.files:
+            return rel
+        return os.path.relpath(os.path.abspath(path), self.root).replace(os.sep, "/")
+
+
+def _walk_files(root: str, allowed_exts: Optional[Set[str]]):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith(".") and d not in _SKIP_DIRS)
+        for fname in sorted(filenames):
+            if fname.startswith("."):
+                continue
+            ext = os.path.splitext(fname)[1].lstrip(".").lower()
+            if allowed_exts and ext not in allowed_exts:
+                continue
+            if ext in _KNOWN_BINARY_EXT:
+                continue
+            path = os.path.join(dirpath, fname)
+            rel = os.path.relpath(path, root).replace(os.sep, "/")
+            yield path, rel, ext
+
+
+def _save_json(path: str, data: Dict) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
@@ -1,57 +1,125 @@
 # docai.py (extended with project context)
-import os, json, urllib.request
-from typing import Dict, Optional
+import os, json, hashlib, tempfile, threading
+from functools import lru_cache
+from typing import Dict, Optional, Set
+
+from contexto import ProjectMap
+from ollama_cliente import obtener_cliente
 
 DEFAULT_OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
 DEFAULT_MODEL = os.getenv("OLLAMA_MODEL", "qwen2.5-coder:7b")
+DEFAULT_DOC_CACHE_DIR = os.getenv("DOCAI_CACHE_DIR",
+                                  os.path.join(os.path.expanduser("~"), ".cache", "docai"))
+
+# Bump whenever _build_prompt or the generation options change, so cached
+# answers produced with the old prompt are not reused
+PROMPT_TEMPLATE_VERSION = "2"
+
+# ========== Per-file documentation cache ==========
+@lru_cache(maxsize=8)
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", errors="replace")).hexdigest()
+
+class DocCache:
+    """
+    On-disk cache of AI answers, one file per entry. The key covers
+    everything that changes the answer: file content, model, prompt template
+    version and project context. Entries live under a namespace per project
+    root, so entries not used by a full run of that root are stale and can
+    be pruned.
+    """
+
+    def __init__(self, directory: str = DEFAULT_DOC_CACHE_DIR, namespace: str = "default"):
+        self.directory = os.path.join(directory, _sha256(namespace)[:16])
+        self.hits = 0
+        self.misses = 0
+        self._used: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def key(self, code: str, model: str, project_context: str) -> str:
+        parts = [_sha256(code), model, PROMPT_TEMPLATE_VERSION, _sha256(project_context)]
+        return _sha256(json.dumps(parts))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".md")
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as fh:
+                text = fh.read()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+                self._used.add(key)
+            return None
+        with self._lock:
+            self.hits += 1
+            self._used.add(key)
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                fh.write(text)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def prune_unused(self) -> int:
+        """Delete the entries not looked up since this cache object was created."""
+        removed = 0
+        if not os.path.isdir(self.directory):
+            return removed
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                key = entry.name.split(".", 1)[0]
+                if key not in self._used:
+                    try:
+                        os.remove(entry.path)
+                        removed += 1
+                    except OSError:
+                        pass
+        return removed
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+# ========== Build project context ==========
+def build_project_map(root: str,
+                      allowed_exts: Optional[Set[str]] = None,
+                      max_file_bytes: int = 50_000,
+                      cache_dir: Optional[str] = DEFAULT_DOC_CACHE_DIR) -> ProjectMap:
+    """
+    Compact map of the project (tree + per-file summary, signatures and
+    references), saved in `cache_dir` so unchanged files are not re-read.
+    Use `.context_for(path, budget_tokens)` to get the prompt context of a file.
+    """
+    return ProjectMap.build(root, allowed_exts=allowed_exts,
+                            max_file_bytes=max_file_bytes, cache_dir=cache_dir)
 
-# ========== HTTP helper ==========
-def _http_post_json(url: str, payload: Dict, timeout: int = 120) -> Dict:
-    data = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(url, data=data,
-                                 headers={"Content-Type": "application/json"},
-                                 method="POST")
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        body = resp.read().decode("utf-8", errors="replace")
-        return json.loads(body)
-
-# ========== Build project snapshot ==========
 def build_project_context(root: str,
                           allowed_exts=None,
                           max_file_bytes=50_000) -> str:
     """
-    Traverse the project folder and return a Markdown snapshot
-    of structure + file contents (capped).
+    Markdown overview of the project: folder tree + one-line summary per
+    file (no file contents; see build_project_map for per-file context).
     """
-    lines = []
-    for dirpath, _, files in os.walk(root):
-        rel = os.path.relpath(dirpath, root)
-        lines.append(f"\n## 📁 {rel if rel != '.' else root}")
-        for fname in sorted(files):
-            ext = os.path.splitext(fname)[1].lstrip(".").lower()
-            if allowed_exts and ext not in allowed_exts:
-                continue
-            path = os.path.join(dirpath, fname)
-            try:
-                size = os.path.getsize(path)
-                with open(path, "rb") as fh:
-                    raw = fh.read(min(size, max_file_bytes))
-                content = raw.decode("utf-8", errors="replace")
-                lines.append(f"\n### 📄 {fname}")
-                lines.append("```" + ext)
-                lines.append(content)
-                if size > max_file_bytes:
-                    lines.append(f"... [truncated after {max_file_bytes} bytes]")
-                lines.append("```")
-            except Exception as e:
-                lines.append(f"\n### 📄 {fname} (no leído: {e})")
-    return "\n".join(lines)
+    return build_project_map(root, allowed_exts, max_file_bytes).overview()
 
 # ========== Prompt builder ==========
 def _build_prompt(project_context: str, filename: str, ext: str, code: str) -> str:
     return f"""Eres un asistente técnico.
 
-A continuación tienes una instantánea del PROYECTO COMPLETO, con su estructura de carpetas y contenidos relevantes:
+A continuación tienes el mapa del PROYECTO: su estructura de carpetas y un resumen (funciones, clases, referencias) de los archivos relacionados con el que vas a documentar:
 
 <PROYECTO>
 {project_context}
@@ -76,15 +144,13 @@ def ollama_generate(prompt: str,
                     model: str = DEFAULT_MODEL,
                     host: str = DEFAULT_OLLAMA_HOST,
                     timeout: int = 600) -> str:
-    url = f"{host.rstrip('/')}/api/generate"
-    payload = {
-        "model": model,
-        "prompt": prompt,
-        "stream": False,
-        "options": {"temperature": 0.2, "num_ctx": 8192, "num_predict": 800}
-    }
-    res = _http_post_json(url, payload, timeout)
-    return (res.get("response") or "").strip()
+    # Shared client: keep-alive connections, retries and at most
+    # OLLAMA_NUM_PARALLEL requests in flight per host
+    return obtener_cliente(host).generar(
+        model, prompt,
+        opciones={"temperature": 0.2, "num_ctx": 8192, "num_predict": 800},
+        timeout=timeout,
+    )
 
 # ========== Public API ==========
 def document_code_with_project(filename: str,
@@ -92,11 +158,30 @@ def document_code_with_project(filename: str,
                                ext: str,
                                project_context: str,
                                model: str = DEFAULT_MODEL,
-                               host: str = DEFAULT_OLLAMA_HOST) -> str:
+                               host: str = DEFAULT_OLLAMA_HOST,
+                               cache: Optional[DocCache] = None,
+                               cache_context: Optional[str] = None) -> str:
+    """
+    `cache_context` is what identifies the context in the cache key
+    (default: the whole `project_context`); pass only the parts that matter
+    for this file so unrelated project changes keep the cached answer.
+    """
+    context_id = project_context if cache_context is None else cache_context
+    key = cache.key(code, model, context_id) if cache is not None else None
+    if key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
     prompt = _build_prompt(project_context, filename, ext, code)
     try:
-        return ollama_generate(prompt, model=model, host=host)
+        text = ollama_generate(prompt, model=model, host=host)
     except Exception as e:
         return f"> ⚠️ Error llamando a Ollama: {e}"
+    if key is not None and text:
+        try:
+            cache.put(key, text)
+        except OSError:
+            pass
+    return text
 
 
@@ -26,5 +26,7 @@ with open(salida, "w", encoding="utf-8") as f:
         escape_html_for_exts={"html","htm","xml","xhtml","svg"},
         use_ai_doc=True,             # requires docai.py + Ollama up
         ai_only_when_allowed_ext=True,
+        ai_parallel=None,            # concurrent AI requests; defaults to OLLAMA_NUM_PARALLEL
+        # answers for unchanged files are cached in ~/.cache/docai (DOCAI_CACHE_DIR)
     )
 
@@ -8,6 +8,11 @@ con la base de datos del sistema de gestión de gimnasio.
 
 from flask import Flask, jsonify, request, send_from_directory
 from flask_cors import CORS
+from datetime import datetime, timezone
+import atexit
+import base64
+import hashlib
+import json
 import os
 import sys
 
@@ -16,6 +21,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from database.database import DatabaseManager
 from database.models import Socio, Entrenador, Clase, Membresia, Asistencia, Reporte
+from database.escritor_asistencias import EscritorAsistencias, ColaLlenaError
 
 # Crear aplicación Flask
 app = Flask(__name__)
@@ -23,6 +29,7 @@ CORS(app)  # Permitir CORS para el frontend
 
 # Inicializar base de datos
 db_manager = DatabaseManager()
+atexit.register(db_manager.cerrar_pool)
 
 # Inicializar modelos
 socio_model = Socio(db_manager)
@@ -32,6 +39,80 @@ membresia_model = Membresia(db_manager)
 asistencia_model = Asistencia(db_manager)
 reporte_model = Reporte(db_manager)
 
+# Las entradas de los tornos se confirman por grupos en un hilo aparte
+escritor_asistencias = EscritorAsistencias(asistencia_model)
+atexit.register(escritor_asistencias.cerrar)
+MAX_ENTRADAS_LOTE = 5000
+
+# Paginación de los listados
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 500
+PARAMETROS_LISTADO = ('campos', 'fields', 'limite', 'cursor')
+
+def codificar_cursor(clave):
+    """Convierte la clave de la última fila en un cursor opaco para la URL"""
+    texto = base64.urlsafe_b64encode(json.dumps(clave).encode()).decode()
+    return texto.rstrip('=')
+
+def decodificar_cursor(cursor):
+    """Recupera la clave de un cursor generado por codificar_cursor"""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        clave = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except ValueError:
+        raise ValueError('Cursor no válido')
+    if not isinstance(clave, list):
+        raise ValueError('Cursor no válido')
+    return clave
+
+def etag_listado(tablas):
+    """
+    ETag de un listado sin ejecutar la consulta: cambia con la URL, con la
+    versión de las tablas implicadas y con el día (la vigencia depende de él)
+    """
+    versiones = db_manager.obtener_versiones(tablas)
+    hoy = datetime.now(timezone.utc).date().isoformat()
+    base = f"{request.full_path}|{versiones}|{hoy}"
+    return hashlib.sha1(base.encode()).hexdigest()
+
+def respuesta_listado(modelo, tablas):
+    """
+    Respuesta común de los listados
+    
+    Parámetros de la URL: limite (default: 50), cursor (el campo 'siguiente'
+    de la página anterior), campos o fields (lista separada por comas) y
+    cualquier filtro admitido por el modelo (p. ej. ?estado=activo)
+    """
+    etag = etag_listado(tablas)
+    if request.if_none_match.contains(etag):
+        respuesta = app.response_class(status=304)
+        respuesta.set_etag(etag)
+        return respuesta
+    
+    try:
+        limite = int(request.args.get('limite', LIMITE_POR_DEFECTO))
+        if not 1 <= limite <= LIMITE_MAXIMO:
+            raise ValueError(f'El límite debe estar entre 1 y {LIMITE_MAXIMO}')
+        campos = request.args.get('campos') or request.args.get('fields')
+        campos = [c.strip() for c in campos.split(',') if c.strip()] if campos else None
+        cursor = request.args.get('cursor')
+        despues_de = decodificar_cursor(cursor) if cursor else None
+        filtros = {k: v for k, v in request.args.items() if k not in PARAMETROS_LISTADO}
+        filas, siguiente = modelo.listar(campos, filtros, limite, despues_de)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    respuesta = jsonify({
+        'success': True,
+        'data': filas,
+        'siguiente': codificar_cursor(siguiente) if siguiente else None
+    })
+    respuesta.set_etag(etag)
+    return respuesta
+
 # Rutas para servir archivos estáticos del frontend
 @app.route('/')
 def index():
@@ -50,26 +131,9 @@ def static_files(filename):
 # Rutas para Socios
 @app.route('/api/socios', methods=['GET'])
 def obtener_socios():
-    """Obtener todos los socios"""
+    """Obtener socios por páginas (filtros: estado, ciudad, estado_membresia, buscar)"""
     try:
-        socios = socio_model.obtener_todos()
-        socios_dict = []
-        for socio in socios:
-            socios_dict.append({
-                'id': socio[0],
-                'numero_socio': socio[1],
-                'nombre': socio[2],
-                'apellidos': socio[3],
-                'email': socio[4],
-                'telefono': socio[5],
-                'ciudad': socio[6],
-                'estado': socio[7],
-                'estado_membresia': socio[8]
-            })
-        return jsonify({
-            'success': True,
-            'data': socios_dict
-        })
+        return respuesta_listado(socio_model, ('socios', 'membresias'))
     except Exception as e:
         return jsonify({
             'success': False,
@@ -155,26 +219,9 @@ def actualizar_socio(socio_id):
 # Rutas para Entrenadores
 @app.route('/api/entrenadores', methods=['GET'])
 def obtener_entrenadores():
-    """Obtener todos los entrenadores"""
+    """Obtener entrenadores por páginas (filtros: especialidad, buscar)"""
     try:
-        entrenadores = entrenador_model.obtener_todos()
-        entrenadores_dict = []
-        for entrenador in entrenadores:
-            entrenadores_dict.append({
-                'id': entrenador[0],
-                'codigo_empleado': entrenador[1],
-                'nombre': entrenador[2],
-                'apellidos': entrenador[3],
-                'especialidad': entrenador[4],
-                'telefono': entrenador[5],
-                'email': entrenador[6],
-                'estado': entrenador[7],
-                'total_clases': entrenador[8]
-            })
-        return jsonify({
-            'success': True,
-            'data': entrenadores_dict
-        })
+        return respuesta_listado(entrenador_model, ('entrenadores', 'clases'))
     except Exception as e:
         return jsonify({
             'success': False,
@@ -211,29 +258,9 @@ def crear_entrenador():
 # Rutas para Clases
 @app.route('/api/clases', methods=['GET'])
 def obtener_clases():
-    """Obtener todas las clases"""
+    """Obtener clases por páginas (filtros: dia_semana, nivel, sala, entrenador_id)"""
     try:
-        clases = clase_model.obtener_todas()
-        clases_dict = []
-        for clase in clases:
-            plazas_disponibles = clase[6] - clase[9]
-            clases_dict.append({
-                'id': clase[0],
-                'nombre': clase[1],
-                'dia_semana': clase[2],
-                'hora_inicio': clase[3],
-                'duracion_minutos': clase[4],
-                'entrenador': clase[5],
-                'capacidad_maxima': clase[6],
-                'nivel': clase[7],
-                'sala': clase[8],
-                'plazas_ocupadas': clase[9],
-                'plazas_disponibles': plazas_disponibles
-            })
-        return jsonify({
-            'success': True,
-            'data': clases_dict
-        })
+        return respuesta_listado(clase_model, ('clases', 'entrenadores', 'reservas_clases'))
     except Exception as e:
         return jsonify({
             'success': False,
@@ -270,26 +297,9 @@ def crear_clase():
 # Rutas para Membresías
 @app.route('/api/membresias', methods=['GET'])
 def obtener_membresias():
-    """Obtener todas las membresías"""
+    """Obtener membresías por páginas (filtros: estado, socio_id, tipo_membresia_id, estado_vigencia)"""
     try:
-        membresias = membresia_model.obtener_todas()
-        membresias_dict = []
-        for membresia in membresias:
-            membresias_dict.append({
-                'id': membresia[0],
-                'numero_socio': membresia[1],
-                'socio': membresia[2],
-                'tipo_membresia': membresia[3],
-                'fecha_inicio': membresia[4],
-                'fecha_fin': membresia[5],
-                'precio_pagado': float(membresia[6]),
-                'estado': membresia[7],
-                'estado_vigencia': membresia[8]
-            })
-        return jsonify({
-            'success': True,
-            'data': membresias_dict
-        })
+        return respuesta_listado(membresia_model, ('membresias', 'socios', 'tipos_membresia'))
     except Exception as e:
         return jsonify({
             'success': False,
@@ -371,42 +381,98 @@ def obtener_asistencias_hoy():
             'error': str(e)
         }), 500
 
+def _id_entrada(datos):
+    """Clave de idempotencia opcional de una entrada (texto o None)"""
+    id_entrada = datos.get('id_entrada')
+    return str(id_entrada) if id_entrada is not None else None
+
 @app.route('/api/asistencias/entrada', methods=['POST'])
 def registrar_entrada():
-    """Registrar entrada de un socio"""
+    """
+    Registrar entrada de un socio (responde cuando ya está guardada)
+    El torno puede enviar un id_entrada único: si reintenta tras un 503 con
+    el mismo id_entrada, la entrada no se registra dos veces
+    """
     try:
         data = request.get_json()
-        asistencia_id = asistencia_model.registrar_entrada(int(data['socio_id']))
+        asistencia_id = escritor_asistencias.registrar(
+            int(data['socio_id']), id_entrada=_id_entrada(data))
         return jsonify({
             'success': True,
             'data': {'id': asistencia_id},
             'message': 'Entrada registrada correctamente'
         }), 201
+    except (ColaLlenaError, TimeoutError) as e:
+        return jsonify({
+            'success': False,
+            'error': str(e) or ('Tiempo de espera agotado: la entrada puede quedar guardada igualmente. '
+                                'Reintenta con el mismo id_entrada para no duplicarla')
+        }), 503
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@app.route('/api/asistencias/entradas', methods=['POST'])
+def registrar_entradas_lote():
+    """Registrar un lote de entradas (sincronización de tornos sin conexión)"""
+    try:
+        data = request.get_json()
+        entradas = []
+        try:
+            for entrada in data['entradas']:
+                fecha_hora = entrada.get('fecha_hora_entrada')
+                if fecha_hora is not None:
+                    # Mismo formato que el resto de entradas, para que los
+                    # filtros y resúmenes por fecha funcionen igual
+                    datetime.strptime(fecha_hora, '%Y-%m-%d %H:%M:%S')
+                entradas.append((int(entrada['socio_id']), fecha_hora, _id_entrada(entrada)))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return jsonify({
+                'success': False,
+                'error': "Formato: {'entradas': [{'socio_id': 1, 'fecha_hora_entrada': 'AAAA-MM-DD HH:MM:SS', "
+                         "'id_entrada': 'identificador único (opcional)'}]}"
+            }), 400
+        if len(entradas) > MAX_ENTRADAS_LOTE:
+            return jsonify({
+                'success': False,
+                'error': f'Máximo {MAX_ENTRADAS_LOTE} entradas por petición'
+            }), 400
+        
+        ids = escritor_asistencias.registrar_lote(entradas)
+        return jsonify({
+            'success': True,
+            'data': {'ids': ids},
+            'message': f'{len(ids)} entradas registradas correctamente'
+        }), 201
+    except (ColaLlenaError, TimeoutError) as e:
+        return jsonify({
+            'success': False,
+            'error': str(e) or ('Tiempo de espera agotado: las entradas pueden quedar guardadas igualmente. '
+                                'Reintenta con los mismos id_entrada para no duplicarlas')
+        }), 503
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/asistencias/metricas', methods=['GET'])
+def obtener_metricas_asistencias():
+    """Obtener el estado de la cola de entradas pendientes de guardar"""
+    return jsonify({
+        'success': True,
+        'data': escritor_asistencias.metricas()
+    })
+
 # Rutas para Informes y Reportes
 @app.route('/api/informes/dashboard', methods=['GET'])
 def obtener_estadisticas_dashboard():
     """Obtener estadísticas para el dashboard"""
     try:
-        socios = socio_model.obtener_todos()
-        entrenadores = entrenador_model.obtener_todos()
-        clases = clase_model.obtener_todas()
-        membresias = membresia_model.obtener_todas()
-        
-        total_socios = len(socios)
-        total_entrenadores = len(entrenadores)
-        total_clases = len(clases)
-        
-        # Calcular ingresos del mes actual
-        ingresos_mes = sum(float(m[6]) for m in membresias if m[7] == 'activa')
-        
-        # Contar socios con membresía activa
-        socios_activos = sum(1 for s in socios if s[8] == 'Con membresía')
+        (total_socios, socios_activos, total_entrenadores,
+         total_clases, ingresos_mes) = reporte_model.estadisticas_dashboard()
         
         return jsonify({
             'success': True,
@@ -415,7 +481,7 @@ def obtener_estadisticas_dashboard():
                 'socios_activos': socios_activos,
                 'total_entrenadores': total_entrenadores,
                 'total_clases': total_clases,
-                'ingresos_mes': ingresos_mes
+                'ingresos_mes': float(ingresos_mes)
             }
         })
     except Exception as e:
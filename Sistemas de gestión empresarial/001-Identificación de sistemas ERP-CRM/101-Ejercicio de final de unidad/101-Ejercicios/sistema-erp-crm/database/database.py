@@ -8,18 +8,345 @@ con tablas para socios, entrenadores, clases, membresías y asistencias.
 
 import sqlite3
 import hashlib
+import queue
+import threading
 from datetime import datetime, timedelta
 import os
 
+# Ajustes aplicados a cada conexión nueva. WAL permite leer mientras se escribe
+# y, con synchronous=NORMAL, solo sincroniza el disco en los checkpoints
+PRAGMAS_CONEXION = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 67108864",
+)
+
+# Tablas de resumen para los informes. Los triggers las mantienen al día en
+# cada escritura, así los informes leen unas pocas filas en vez de agrupar
+# las tablas completas
+TABLAS_RESUMEN = (
+    '''CREATE TABLE IF NOT EXISTS resumen_ingresos_mes (
+        mes TEXT PRIMARY KEY,
+        total_membresias INTEGER NOT NULL DEFAULT 0,
+        total_ingresos REAL NOT NULL DEFAULT 0
+    )''',
+    '''CREATE TABLE IF NOT EXISTS resumen_asistencias_mes (
+        mes TEXT PRIMARY KEY,
+        total_visitas INTEGER NOT NULL DEFAULT 0,
+        socios_unicos INTEGER NOT NULL DEFAULT 0
+    )''',
+    # Visitas de cada socio por mes, necesarias para contar socios únicos
+    '''CREATE TABLE IF NOT EXISTS resumen_visitantes_mes (
+        mes TEXT NOT NULL,
+        socio_id INTEGER NOT NULL,
+        visitas INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (mes, socio_id)
+    ) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS resumen_reservas_clase (
+        clase_id INTEGER PRIMARY KEY,
+        total_reservas INTEGER NOT NULL DEFAULT 0
+    )''',
+    '''CREATE TABLE IF NOT EXISTS resumen_contadores (
+        clave TEXT PRIMARY KEY,
+        valor NUMERIC NOT NULL DEFAULT 0
+    )''',
+)
+
+# Recalcula los resúmenes desde cero a partir de las tablas de datos
+CALCULO_RESUMENES = (
+    "DELETE FROM resumen_ingresos_mes",
+    '''INSERT INTO resumen_ingresos_mes (mes, total_membresias, total_ingresos)
+       SELECT strftime('%Y-%m', fecha_pago), COUNT(*), SUM(precio_pagado)
+       FROM membresias WHERE strftime('%Y-%m', fecha_pago) IS NOT NULL
+       GROUP BY 1''',
+    "DELETE FROM resumen_visitantes_mes",
+    '''INSERT INTO resumen_visitantes_mes (mes, socio_id, visitas)
+       SELECT strftime('%Y-%m', fecha_hora_entrada), socio_id, COUNT(*)
+       FROM asistencias
+       WHERE strftime('%Y-%m', fecha_hora_entrada) IS NOT NULL AND socio_id IS NOT NULL
+       GROUP BY 1, 2''',
+    "DELETE FROM resumen_asistencias_mes",
+    '''INSERT INTO resumen_asistencias_mes (mes, total_visitas, socios_unicos)
+       SELECT strftime('%Y-%m', fecha_hora_entrada), COUNT(*), COUNT(DISTINCT socio_id)
+       FROM asistencias WHERE strftime('%Y-%m', fecha_hora_entrada) IS NOT NULL
+       GROUP BY 1''',
+    "DELETE FROM resumen_reservas_clase",
+    '''INSERT INTO resumen_reservas_clase (clase_id, total_reservas)
+       SELECT clase_id, COUNT(*) FROM reservas_clases
+       WHERE estado = 'confirmada' AND clase_id IS NOT NULL
+       GROUP BY clase_id''',
+    "DELETE FROM resumen_contadores",
+    '''INSERT INTO resumen_contadores (clave, valor) VALUES
+       ('socios', (SELECT COUNT(*) FROM socios)),
+       ('entrenadores_activos', (SELECT COUNT(*) FROM entrenadores WHERE estado = 'activo')),
+       ('clases_activas', (SELECT COUNT(*) FROM clases WHERE activa = 1)),
+       ('ingresos_activas', (SELECT COALESCE(SUM(precio_pagado), 0) FROM membresias
+                             WHERE estado = 'activa'))''',
+)
+
+def _triggers_resumen(nombre, tabla, columnas, sumar, restar):
+    """
+    Genera los triggers que mantienen un resumen: sumar se aplica a la fila
+    nueva y restar a la antigua; {f} se sustituye por NEW u OLD
+    """
+    sumar_nueva = sumar.format(f='NEW')
+    restar_antigua = restar.format(f='OLD')
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS trg_{nombre}_ins AFTER INSERT ON {tabla} "
+        f"BEGIN {sumar_nueva} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{nombre}_del AFTER DELETE ON {tabla} "
+        f"BEGIN {restar_antigua} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{nombre}_upd AFTER UPDATE OF {columnas} ON {tabla} "
+        f"BEGIN {restar_antigua} {sumar_nueva} END",
+    )
+
+def _triggers_contador(clave, tabla, columnas, condicion, valor='1'):
+    """Triggers de un contador de resumen_contadores (filas que cumplen la condición)"""
+    delta = f"(CASE WHEN {condicion} THEN {valor} ELSE 0 END)"
+    actualizar = "UPDATE resumen_contadores SET valor = valor {signo} " + delta + \
+                 f" WHERE clave = '{clave}';"
+    return _triggers_resumen(clave, tabla, columnas,
+                             actualizar.replace('{signo}', '+'),
+                             actualizar.replace('{signo}', '-'))
+
+_MES_PAGO = "strftime('%Y-%m', {f}.fecha_pago)"
+_MES_ENTRADA = "strftime('%Y-%m', {f}.fecha_hora_entrada)"
+
+TRIGGERS_RESUMEN = (
+    _triggers_resumen(
+        'ingresos_mes', 'membresias', 'fecha_pago, precio_pagado',
+        f'''INSERT INTO resumen_ingresos_mes (mes, total_membresias, total_ingresos)
+            SELECT {_MES_PAGO}, 1, {{f}}.precio_pagado WHERE {_MES_PAGO} IS NOT NULL
+            ON CONFLICT (mes) DO UPDATE SET
+                total_membresias = total_membresias + 1,
+                total_ingresos = total_ingresos + excluded.total_ingresos;''',
+        f'''UPDATE resumen_ingresos_mes SET
+                total_membresias = total_membresias - 1,
+                total_ingresos = total_ingresos - {{f}}.precio_pagado
+            WHERE mes = {_MES_PAGO};''')
+    + _triggers_resumen(
+        'asistencias_mes', 'asistencias', 'socio_id, fecha_hora_entrada',
+        # El socio cuenta como nuevo en el mes si aún no tenía visitas
+        f'''INSERT INTO resumen_asistencias_mes (mes, total_visitas)
+            SELECT {_MES_ENTRADA}, 1 WHERE {_MES_ENTRADA} IS NOT NULL
+            ON CONFLICT (mes) DO UPDATE SET total_visitas = total_visitas + 1;
+            UPDATE resumen_asistencias_mes SET socios_unicos = socios_unicos + 1
+            WHERE mes = {_MES_ENTRADA} AND {{f}}.socio_id IS NOT NULL
+            AND NOT EXISTS (SELECT 1 FROM resumen_visitantes_mes
+                            WHERE mes = {_MES_ENTRADA} AND socio_id = {{f}}.socio_id);
+            INSERT INTO resumen_visitantes_mes (mes, socio_id, visitas)
+            SELECT {_MES_ENTRADA}, {{f}}.socio_id, 1
+            WHERE {_MES_ENTRADA} IS NOT NULL AND {{f}}.socio_id IS NOT NULL
+            ON CONFLICT (mes, socio_id) DO UPDATE SET visitas = visitas + 1;''',
+        f'''UPDATE resumen_asistencias_mes SET total_visitas = total_visitas - 1
+            WHERE mes = {_MES_ENTRADA};
+            UPDATE resumen_visitantes_mes SET visitas = visitas - 1
+            WHERE mes = {_MES_ENTRADA} AND socio_id = {{f}}.socio_id;
+            UPDATE resumen_asistencias_mes SET socios_unicos = socios_unicos - 1
+            WHERE mes = {_MES_ENTRADA}
+            AND EXISTS (SELECT 1 FROM resumen_visitantes_mes
+                        WHERE mes = {_MES_ENTRADA} AND socio_id = {{f}}.socio_id AND visitas = 0);
+            DELETE FROM resumen_visitantes_mes
+            WHERE mes = {_MES_ENTRADA} AND socio_id = {{f}}.socio_id AND visitas = 0;''')
+    + _triggers_resumen(
+        'reservas_clase', 'reservas_clases', 'clase_id, estado',
+        '''INSERT INTO resumen_reservas_clase (clase_id, total_reservas)
+            SELECT {f}.clase_id, 1 WHERE {f}.estado = 'confirmada' AND {f}.clase_id IS NOT NULL
+            ON CONFLICT (clase_id) DO UPDATE SET total_reservas = total_reservas + 1;''',
+        '''UPDATE resumen_reservas_clase SET total_reservas = total_reservas - 1
+            WHERE clase_id = {f}.clase_id AND {f}.estado = 'confirmada';''')
+    + _triggers_contador('socios', 'socios', 'id', '1')
+    + _triggers_contador('entrenadores_activos', 'entrenadores', 'estado',
+                         "{f}.estado = 'activo'")
+    + _triggers_contador('clases_activas', 'clases', 'activa', '{f}.activa = 1')
+    + _triggers_contador('ingresos_activas', 'membresias', 'estado, precio_pagado',
+                         "{f}.estado = 'activa'", '{f}.precio_pagado')
+)
+
+# Tablas cuyo número de versión sube en cada escritura. Los listados de la API
+# lo usan para generar ETags sin tener que repetir la consulta
+TABLAS_VERSIONADAS = ('socios', 'entrenadores', 'clases', 'membresias',
+                      'reservas_clases', 'tipos_membresia')
+
+def _triggers_version(tabla):
+    """Triggers que incrementan la versión de una tabla en cada escritura"""
+    incrementar = f"UPDATE versiones_tablas SET version = version + 1 WHERE tabla = '{tabla}';"
+    return tuple(
+        f"CREATE TRIGGER IF NOT EXISTS trg_version_{tabla}_{sufijo} AFTER {evento} ON {tabla} "
+        f"BEGIN {incrementar} END"
+        for sufijo, evento in (('ins', 'INSERT'), ('upd', 'UPDATE'), ('del', 'DELETE'))
+    )
+
+VERSIONADO_TABLAS = (
+    '''CREATE TABLE IF NOT EXISTS versiones_tablas (
+        tabla TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )''',
+    "INSERT OR IGNORE INTO versiones_tablas (tabla) VALUES " +
+    ', '.join(f"('{tabla}')" for tabla in TABLAS_VERSIONADAS),
+) + tuple(sentencia for tabla in TABLAS_VERSIONADAS for sentencia in _triggers_version(tabla))
+
+# Migraciones del esquema, en orden. PRAGMA user_version guarda cuántas se han
+# aplicado, así cada una se ejecuta una sola vez por base de datos
+MIGRACIONES = (
+    # 1: índices para las búsquedas por socio/clase y los filtros por fecha
+    (
+        "CREATE INDEX IF NOT EXISTS idx_membresias_socio ON membresias (socio_id)",
+        "CREATE INDEX IF NOT EXISTS idx_membresias_fecha_fin ON membresias (fecha_fin)",
+        "CREATE INDEX IF NOT EXISTS idx_reservas_clase ON reservas_clases (clase_id)",
+        "CREATE INDEX IF NOT EXISTS idx_asistencias_socio ON asistencias (socio_id)",
+        "CREATE INDEX IF NOT EXISTS idx_asistencias_entrada ON asistencias (fecha_hora_entrada)",
+    ),
+    # 2: tablas de resumen para los informes, rellenadas con los datos existentes
+    TABLAS_RESUMEN + CALCULO_RESUMENES + TRIGGERS_RESUMEN,
+    # 3: índices de orden de los listados paginados y versiones para los ETags
+    (
+        "CREATE INDEX IF NOT EXISTS idx_socios_fecha_registro ON socios (fecha_registro)",
+        "CREATE INDEX IF NOT EXISTS idx_membresias_fecha_pago ON membresias (fecha_pago)",
+        "CREATE INDEX IF NOT EXISTS idx_entrenadores_nombre ON entrenadores (nombre)",
+        "CREATE INDEX IF NOT EXISTS idx_clases_entrenador ON clases (entrenador_id)",
+    ) + VERSIONADO_TABLAS,
+    # 4: clave de idempotencia de las entradas: el torno que reintenta tras un
+    # 503 manda el mismo id_entrada y no se duplica la asistencia
+    (
+        "ALTER TABLE asistencias ADD COLUMN id_entrada TEXT",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_asistencias_id_entrada ON asistencias (id_entrada)",
+    ),
+)
+
+class ConexionPersistente(sqlite3.Connection):
+    """Conexión reutilizable: close() deshace lo pendiente y la devuelve al pool"""
+    
+    pool = None
+    en_pool = False
+    
+    def close(self):
+        """Descarta la transacción sin confirmar, igual que al cerrar"""
+        if self.in_transaction:
+            self.rollback()
+        if self.pool is None or self.en_pool:
+            return
+        self.en_pool = True
+        try:
+            self.pool.put_nowait(self)
+        except queue.Full:
+            # Ya hay bastantes conexiones libres: esta se cierra de verdad
+            self.cerrar()
+    
+    def cerrar(self):
+        """Cierra la conexión de verdad"""
+        self.pool = None
+        super().close()
+
 class DatabaseManager:
-    def __init__(self, db_path="gimnasio.db"):
-        """Inicializa el gestor de base de datos"""
+    def __init__(self, db_path="gimnasio.db", tamano_pool=8):
+        """
+        Inicializa el gestor de base de datos
+        
+        Args:
+            db_path: Ruta del fichero SQLite
+            tamano_pool: Conexiones libres que se guardan para reutilizarlas
+        """
         self.db_path = db_path
+        # Conexiones listas para usar. El servidor de desarrollo crea un hilo
+        # por petición, así que las conexiones se comparten entre hilos a
+        # través de la cola en vez de quedarse ligadas a uno
+        self._pool = queue.Queue(maxsize=tamano_pool)
+        self._local = threading.local()
         self.init_database()
     
+    def _nueva_conexion(self):
+        """Abre una conexión con los PRAGMAS_CONEXION aplicados"""
+        conn = sqlite3.connect(self.db_path, factory=ConexionPersistente,
+                               check_same_thread=False)
+        for pragma in PRAGMAS_CONEXION:
+            conn.execute(pragma)
+        return conn
+    
     def get_connection(self):
-        """Obtiene una conexión a la base de datos"""
-        return sqlite3.connect(self.db_path)
+        """
+        Obtiene una conexión libre del pool o abre una nueva si no queda
+        ninguna. Al llamar a close() vuelve al pool. Si el hilo tiene una
+        conexión reservada, devuelve siempre esa.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._nueva_conexion()
+            conn.pool = self._pool
+        conn.en_pool = False
+        return conn
+    
+    def reservar_conexion(self, *pragmas):
+        """
+        Reserva para el hilo actual una conexión propia, fuera del pool, con
+        los PRAGMA indicados además de los habituales. Se libera con
+        cerrar_conexion().
+        """
+        conn = self._nueva_conexion()
+        for pragma in pragmas:
+            conn.execute(pragma)
+        self._local.conn = conn
+        return conn
+    
+    def cerrar_conexion(self):
+        """Cierra la conexión reservada del hilo actual, si la hay"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.cerrar()
+            self._local.conn = None
+    
+    def cerrar_pool(self):
+        """Cierra las conexiones libres del pool"""
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.cerrar()
+    
+    def aplicar_migraciones(self, conn):
+        """Aplica las migraciones pendientes según PRAGMA user_version"""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for numero, sentencias in enumerate(MIGRACIONES[version:], start=version + 1):
+            # Cada migración se aplica entera o no se aplica
+            conn.execute("BEGIN")
+            try:
+                for sentencia in sentencias:
+                    conn.execute(sentencia)
+                # PRAGMA no admite parámetros; numero es siempre un entero
+                conn.execute(f"PRAGMA user_version = {numero}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    
+    def obtener_versiones(self, tablas):
+        """Devuelve la versión actual de cada tabla, en el mismo orden"""
+        conn = self.get_connection()
+        marcadores = ', '.join('?' for _ in tablas)
+        versiones = dict(conn.execute(
+            f"SELECT tabla, version FROM versiones_tablas WHERE tabla IN ({marcadores})",
+            tuple(tablas)).fetchall())
+        conn.close()
+        return tuple(versiones.get(tabla, 0) for tabla in tablas)
+    
+    def recalcular_resumenes(self):
+        """Recalcula las tablas de resumen de los informes desde los datos"""
+        conn = self.get_connection()
+        conn.execute("BEGIN")
+        try:
+            for sentencia in CALCULO_RESUMENES:
+                conn.execute(sentencia)
+            conn.commit()
+        finally:
+            conn.close()
     
     def init_database(self):
         """Crea las tablas si no existen"""
@@ -149,6 +476,7 @@ class DatabaseManager:
         ''')
         
         conn.commit()
+        self.aplicar_migraciones(conn)
         conn.close()
         
         # Insertar datos iniciales
@@ -0,0 +1,173 @@
+"""
+Sistema de Gestión de Gimnasio - Escritor de Asistencias por Lotes
+Módulo de Acceso a Datos
+
+Los tornos registran entradas en ráfagas. En lugar de una transacción (y un
+fsync) por socio, las entradas se encolan en memoria y un hilo escritor las
+confirma en grupos: cada pocos milisegundos o al llegar a un número de filas.
+Quien registra una entrada espera a que su grupo se haya confirmado, así la
+respuesta solo llega cuando la entrada ya está en disco. Si la espera se agota
+la entrada puede confirmarse después: por eso cada entrada admite un
+id_entrada con el que un reintento no la duplica.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class ColaLlenaError(Exception):
+    """La cola de entradas pendientes ha llegado a su límite"""
+
+
+class EscritorAsistencias:
+    def __init__(self, asistencia_model, intervalo_ms=20, max_filas=500, max_cola=10000):
+        """
+        Inicializa el escritor y arranca su hilo
+        
+        Args:
+            asistencia_model: Modelo Asistencia con el que se escriben los lotes
+            intervalo_ms: Espera máxima para completar un grupo (default: 20 ms)
+            max_filas: Filas a partir de las cuales se confirma sin esperar (default: 500)
+            max_cola: Entradas pendientes admitidas antes de rechazar (default: 10000)
+        """
+        self.asistencias = asistencia_model
+        self.intervalo = intervalo_ms / 1000
+        self.max_filas = max_filas
+        self.max_cola = max_cola
+        self._cola = queue.Queue()
+        self._lock = threading.Lock()
+        self._pendientes = 0
+        self._metricas = {
+            'pico_cola': 0,
+            'lotes_confirmados': 0,
+            'filas_confirmadas': 0,
+            'lotes_fallidos': 0,
+            'ultimo_lote_filas': 0,
+            'ultimo_commit_ms': 0.0,
+        }
+        self._hilo = threading.Thread(target=self._bucle, name='escritor-asistencias', daemon=True)
+        self._hilo.start()
+    
+    def encolar(self, entradas):
+        """
+        Encola un grupo de entradas sin esperar a que se escriban
+        
+        Args:
+            entradas: Lista de tuplas (socio_id, fecha_hora_entrada o None,
+                id_entrada o None)
+        
+        Returns:
+            Future que se resuelve con la lista de IDs tras el commit
+        """
+        futuro = Future()
+        if not entradas:
+            futuro.set_result([])
+            return futuro
+        with self._lock:
+            if self._pendientes + len(entradas) > self.max_cola:
+                raise ColaLlenaError('Demasiadas entradas pendientes, reintenta en unos segundos')
+            self._pendientes += len(entradas)
+            self._metricas['pico_cola'] = max(self._metricas['pico_cola'], self._pendientes)
+        self._cola.put((list(entradas), futuro))
+        return futuro
+    
+    def registrar(self, socio_id, fecha_hora=None, id_entrada=None, timeout=10):
+        """Registra una entrada y devuelve su ID cuando ya está confirmada"""
+        return self.encolar([(socio_id, fecha_hora, id_entrada)]).result(timeout)[0]
+    
+    def registrar_lote(self, entradas, timeout=30):
+        """Registra varias entradas juntas (p. ej. la sincronización de un torno)"""
+        return self.encolar(entradas).result(timeout)
+    
+    def metricas(self):
+        """Devuelve el estado de la cola y las estadísticas de escritura"""
+        with self._lock:
+            metricas = dict(self._metricas)
+            metricas['en_cola'] = self._pendientes
+        lotes = metricas['lotes_confirmados']
+        metricas['filas_por_lote'] = round(metricas['filas_confirmadas'] / lotes, 1) if lotes else 0
+        return metricas
+    
+    def cerrar(self, timeout=5):
+        """Escribe lo pendiente y detiene el hilo escritor"""
+        self._cola.put(None)
+        self._hilo.join(timeout)
+    
+    def _bucle(self):
+        # El hilo escritor usa una conexión propia, fuera del pool, que
+        # sincroniza el disco en cada commit: con los grupos el coste del
+        # fsync se reparte entre muchas entradas
+        self.asistencias.db.reservar_conexion("PRAGMA synchronous = FULL")
+        
+        terminar = False
+        while not terminar:
+            primero = self._cola.get()
+            if primero is None:
+                break
+            grupo = [primero]
+            filas = len(primero[0])
+            limite = time.monotonic() + self.intervalo
+            
+            # Completar el grupo hasta el número de filas o el tiempo máximo
+            while filas < self.max_filas:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    elemento = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if elemento is None:
+                    terminar = True
+                    break
+                grupo.append(elemento)
+                filas += len(elemento[0])
+            
+            self._escribir(grupo, filas)
+        
+        # Lo que quedase en la cola al cerrar también se escribe
+        resto = []
+        while True:
+            try:
+                elemento = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            if elemento is not None:
+                resto.append(elemento)
+        if resto:
+            self._escribir(resto, sum(len(entradas) for entradas, _ in resto))
+        self.asistencias.db.cerrar_conexion()
+    
+    def _escribir(self, grupo, filas):
+        inicio = time.perf_counter()
+        try:
+            ids = self.asistencias.registrar_entradas(
+                [entrada for entradas, _ in grupo for entrada in entradas])
+        except Exception as e:
+            if len(grupo) > 1:
+                # Repetir cada petición por separado para que una entrada
+                # errónea no haga fallar las de los demás
+                for elemento in grupo:
+                    self._escribir([elemento], len(elemento[0]))
+                return
+            with self._lock:
+                self._pendientes -= filas
+                self._metricas['lotes_fallidos'] += 1
+            for _, futuro in grupo:
+                futuro.set_exception(e)
+            return
+        
+        with self._lock:
+            self._pendientes -= filas
+            self._metricas['lotes_confirmados'] += 1
+            self._metricas['filas_confirmadas'] += filas
+            self._metricas['ultimo_lote_filas'] = filas
+            self._metricas['ultimo_commit_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+        
+        posicion = 0
+        for entradas, futuro in grupo:
+            futuro.set_result(ids[posicion:posicion + len(entradas)])
+            posicion += len(entradas)
+
@@ -7,8 +7,104 @@ Clases para gestionar operaciones CRUD de cada entidad
 
 from database.database import DatabaseManager
 from datetime import datetime, timedelta
+import sqlite3
+
+def listar_paginado(db, origen, columnas, orden, filtros_disponibles, campos=None,
+                    filtros=None, limite=None, despues_de=None, descendente=False,
+                    condicion=None):
+    """
+    Consulta paginada por clave (keyset) con filtros y proyección en SQL
+    
+    Args:
+        db: DatabaseManager
+        origen: FROM y JOIN de la consulta
+        columnas: Diccionario nombre -> expresión SQL de cada campo
+        orden: Expresiones de la clave de orden (la última debe ser única)
+        filtros_disponibles: Diccionario nombre -> condición SQL con :nombre
+        campos: Campos a devolver (default: todos)
+        filtros: Diccionario nombre -> valor de los filtros a aplicar
+        limite: Número máximo de filas (default: sin límite)
+        despues_de: Clave de la última fila de la página anterior
+        descendente: Recorrer la clave de mayor a menor
+        condicion: Condición fija que cumplen todas las filas (opcional)
+    
+    Returns:
+        Tupla (filas, siguiente): filas como diccionarios y la clave para
+        pedir la página siguiente (None si no hay más)
+    """
+    campos = list(campos or columnas)
+    filtros = filtros or {}
+    desconocidos = [c for c in campos if c not in columnas]
+    desconocidos += [f for f in filtros if f not in filtros_disponibles]
+    if desconocidos:
+        raise ValueError(f"Campos o filtros no válidos: {', '.join(desconocidos)}")
+    
+    seleccion = [f"{columnas[c]} AS {c}" for c in campos]
+    seleccion += [f"{expresion} AS _clave{i}" for i, expresion in enumerate(orden)]
+    condiciones = [condicion] if condicion else []
+    condiciones += [filtros_disponibles[nombre] for nombre in filtros]
+    parametros = dict(filtros)
+    
+    if despues_de is not None:
+        if len(despues_de) != len(orden):
+            raise ValueError("Cursor no válido")
+        marcadores = [f":_cursor{i}" for i in range(len(orden))]
+        comparacion = '<' if descendente else '>'
+        condiciones.append(f"({', '.join(orden)}) {comparacion} ({', '.join(marcadores)})")
+        parametros.update({f"_cursor{i}": valor for i, valor in enumerate(despues_de)})
+    
+    consulta = f"SELECT {', '.join(seleccion)} {origen}"
+    if condiciones:
+        consulta += " WHERE " + ' AND '.join(condiciones)
+    direccion = 'DESC' if descendente else 'ASC'
+    consulta += " ORDER BY " + ', '.join(f"{expresion} {direccion}" for expresion in orden)
+    if limite is not None:
+        # Una fila de más indica si hay página siguiente
+        consulta += " LIMIT :_limite"
+        parametros['_limite'] = limite + 1
+    
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    cursor.execute(consulta, parametros)
+    filas = [dict(fila) for fila in cursor.fetchall()]
+    conn.close()
+    
+    siguiente = None
+    if limite is not None and len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = [filas[-1][f"_clave{i}"] for i in range(len(orden))]
+    for fila in filas:
+        for i in range(len(orden)):
+            del fila[f"_clave{i}"]
+    return filas, siguiente
 
 class Socio:
+    COLUMNAS = {
+        'id': 's.id',
+        'numero_socio': 's.numero_socio',
+        'nombre': 's.nombre',
+        'apellidos': 's.apellidos',
+        'email': 's.email',
+        'telefono': 's.telefono',
+        'ciudad': 's.ciudad',
+        'estado': 's.estado',
+        'estado_membresia': '''CASE
+                WHEN EXISTS (SELECT 1 FROM membresias m
+                             WHERE m.socio_id = s.id AND m.estado = 'activa'
+                             AND m.fecha_fin >= date('now')) THEN 'Con membresía'
+                ELSE 'Sin membresía'
+            END''',
+    }
+    FILTROS = {
+        'estado': "s.estado = :estado",
+        'ciudad': "s.ciudad = :ciudad",
+        'estado_membresia': f"{COLUMNAS['estado_membresia']} = :estado_membresia",
+        'buscar': '''(s.nombre || ' ' || s.apellidos LIKE '%' || :buscar || '%'
+                    OR s.numero_socio LIKE '%' || :buscar || '%'
+                    OR s.email LIKE '%' || :buscar || '%')''',
+    }
+    
     def __init__(self, db_manager):
         self.db = db_manager
     
@@ -31,24 +127,14 @@ class Socio:
     
     def obtener_todos(self):
         """Obtiene todos los socios"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT s.id, s.numero_socio, s.nombre, s.apellidos, s.email, s.telefono, 
-                   s.ciudad, s.estado,
-                   CASE 
-                       WHEN m.fecha_fin >= date('now') THEN 'Con membresía'
-                       ELSE 'Sin membresía'
-                   END as estado_membresia
-            FROM socios s
-            LEFT JOIN membresias m ON s.id = m.socio_id AND m.estado = 'activa'
-            ORDER BY s.fecha_registro DESC
-        ''')
-        
-        socios = cursor.fetchall()
-        conn.close()
-        return socios
+        socios, _ = self.listar()
+        return [tuple(socio.values()) for socio in socios]
+    
+    def listar(self, campos=None, filtros=None, limite=None, despues_de=None):
+        """Lista socios por página, del registro más reciente al más antiguo"""
+        return listar_paginado(self.db, "FROM socios s", self.COLUMNAS,
+                               ('s.fecha_registro', 's.id'), self.FILTROS,
+                               campos, filtros, limite, despues_de, descendente=True)
     
     def obtener_por_id(self, socio_id):
         """Obtiene un socio por ID"""
@@ -80,6 +166,24 @@ class Socio:
 
 
 class Entrenador:
+    COLUMNAS = {
+        'id': 'e.id',
+        'codigo_empleado': 'e.codigo_empleado',
+        'nombre': 'e.nombre',
+        'apellidos': 'e.apellidos',
+        'especialidad': 'e.especialidad',
+        'telefono': 'e.telefono',
+        'email': 'e.email',
+        'estado': 'e.estado',
+        'total_clases': '''(SELECT COUNT(*) FROM clases c
+                           WHERE c.entrenador_id = e.id AND c.activa = 1)''',
+    }
+    FILTROS = {
+        'especialidad': "e.especialidad = :especialidad",
+        'buscar': '''(e.nombre || ' ' || e.apellidos LIKE '%' || :buscar || '%'
+                    OR e.codigo_empleado LIKE '%' || :buscar || '%')''',
+    }
+    
     def __init__(self, db_manager):
         self.db = db_manager
     
@@ -103,23 +207,14 @@ class Entrenador:
     
     def obtener_todos(self):
         """Obtiene todos los entrenadores"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT e.id, e.codigo_empleado, e.nombre, e.apellidos, e.especialidad, 
-                   e.telefono, e.email, e.estado,
-                   COUNT(c.id) as total_clases
-            FROM entrenadores e
-            LEFT JOIN clases c ON e.id = c.entrenador_id AND c.activa = 1
-            WHERE e.estado = 'activo'
-            GROUP BY e.id
-            ORDER BY e.nombre
-        ''')
-        
-        entrenadores = cursor.fetchall()
-        conn.close()
-        return entrenadores
+        entrenadores, _ = self.listar()
+        return [tuple(entrenador.values()) for entrenador in entrenadores]
+    
+    def listar(self, campos=None, filtros=None, limite=None, despues_de=None):
+        """Lista los entrenadores activos por página, ordenados por nombre"""
+        return listar_paginado(self.db, "FROM entrenadores e", self.COLUMNAS,
+                               ('e.nombre', 'e.id'), self.FILTROS, campos, filtros,
+                               limite, despues_de, condicion="e.estado = 'activo'")
     
     def obtener_por_id(self, entrenador_id):
         """Obtiene un entrenador por ID"""
@@ -133,6 +228,26 @@ class Entrenador:
 
 
 class Clase:
+    COLUMNAS = {
+        'id': 'c.id',
+        'nombre': 'c.nombre',
+        'dia_semana': 'c.dia_semana',
+        'hora_inicio': 'c.hora_inicio',
+        'duracion_minutos': 'c.duracion_minutos',
+        'entrenador': "e.nombre || ' ' || e.apellidos",
+        'capacidad_maxima': 'c.capacidad_maxima',
+        'nivel': 'c.nivel',
+        'sala': 'c.sala',
+        'plazas_ocupadas': 'COALESCE(r.total_reservas, 0)',
+        'plazas_disponibles': 'c.capacidad_maxima - COALESCE(r.total_reservas, 0)',
+    }
+    FILTROS = {
+        'dia_semana': "c.dia_semana = :dia_semana",
+        'nivel': "c.nivel = :nivel",
+        'sala': "c.sala = :sala",
+        'entrenador_id': "c.entrenador_id = :entrenador_id",
+    }
+    
     def __init__(self, db_manager):
         self.db = db_manager
     
@@ -156,25 +271,19 @@ class Clase:
     
     def obtener_todas(self):
         """Obtiene todas las clases"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT c.id, c.nombre, c.dia_semana, c.hora_inicio, c.duracion_minutos,
-                   e.nombre || ' ' || e.apellidos as entrenador,
-                   c.capacidad_maxima, c.nivel, c.sala,
-                   COUNT(r.id) as plazas_ocupadas
-            FROM clases c
+        campos = [c for c in self.COLUMNAS if c != 'plazas_disponibles']
+        clases, _ = self.listar(campos)
+        return [tuple(clase.values()) for clase in clases]
+    
+    def listar(self, campos=None, filtros=None, limite=None, despues_de=None):
+        """Lista las clases activas por página, ordenadas por día y hora"""
+        origen = '''FROM clases c
             LEFT JOIN entrenadores e ON c.entrenador_id = e.id
-            LEFT JOIN reservas_clases r ON c.id = r.clase_id AND r.estado = 'confirmada'
-            WHERE c.activa = 1
-            GROUP BY c.id
-            ORDER BY c.dia_semana, c.hora_inicio
-        ''')
-        
-        clases = cursor.fetchall()
-        conn.close()
-        return clases
+            LEFT JOIN resumen_reservas_clase r ON c.id = r.clase_id'''
+        # COALESCE evita que un NULL rompa la comparación de la clave
+        orden = ("COALESCE(c.dia_semana, '')", "COALESCE(c.hora_inicio, '')", 'c.id')
+        return listar_paginado(self.db, origen, self.COLUMNAS, orden, self.FILTROS,
+                               campos, filtros, limite, despues_de, condicion="c.activa = 1")
     
     def obtener_por_id(self, clase_id):
         """Obtiene una clase por ID"""
@@ -188,6 +297,27 @@ class Clase:
 
 
 class Membresia:
+    COLUMNAS = {
+        'id': 'm.id',
+        'numero_socio': 's.numero_socio',
+        'socio': "s.nombre || ' ' || s.apellidos",
+        'tipo_membresia': 'tm.nombre',
+        'fecha_inicio': 'm.fecha_inicio',
+        'fecha_fin': 'm.fecha_fin',
+        'precio_pagado': 'CAST(m.precio_pagado AS REAL)',
+        'estado': 'm.estado',
+        'estado_vigencia': '''CASE
+                WHEN m.fecha_fin >= date('now') THEN 'Vigente'
+                ELSE 'Vencida'
+            END''',
+    }
+    FILTROS = {
+        'estado': "m.estado = :estado",
+        'socio_id': "m.socio_id = :socio_id",
+        'tipo_membresia_id': "m.tipo_membresia_id = :tipo_membresia_id",
+        'estado_vigencia': f"{COLUMNAS['estado_vigencia']} = :estado_vigencia",
+    }
+    
     def __init__(self, db_manager):
         self.db = db_manager
     
@@ -214,26 +344,17 @@ class Membresia:
     
     def obtener_todas(self):
         """Obtiene todas las membresías"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT m.id, s.numero_socio, s.nombre || ' ' || s.apellidos as socio,
-                   tm.nombre as tipo_membresia, m.fecha_inicio, m.fecha_fin,
-                   m.precio_pagado, m.estado,
-                   CASE 
-                       WHEN m.fecha_fin >= date('now') THEN 'Vigente'
-                       ELSE 'Vencida'
-                   END as estado_vigencia
-            FROM membresias m
+        membresias, _ = self.listar()
+        return [tuple(membresia.values()) for membresia in membresias]
+    
+    def listar(self, campos=None, filtros=None, limite=None, despues_de=None):
+        """Lista membresías por página, de la pagada más recientemente a la más antigua"""
+        origen = '''FROM membresias m
             JOIN socios s ON m.socio_id = s.id
-            JOIN tipos_membresia tm ON m.tipo_membresia_id = tm.id
-            ORDER BY m.fecha_pago DESC
-        ''')
-        
-        membresias = cursor.fetchall()
-        conn.close()
-        return membresias
+            JOIN tipos_membresia tm ON m.tipo_membresia_id = tm.id'''
+        return listar_paginado(self.db, origen, self.COLUMNAS,
+                               ('m.fecha_pago', 'm.id'), self.FILTROS,
+                               campos, filtros, limite, despues_de, descendente=True)
     
     def obtener_tipos_membresia(self):
         """Obtiene todos los tipos de membresía disponibles"""
@@ -272,6 +393,41 @@ class Asistencia:
         conn.close()
         return asistencia_id
     
+    def registrar_entradas(self, entradas):
+        """
+        Registra varias entradas en una sola transacción
+        
+        Args:
+            entradas: Lista de tuplas (socio_id, fecha_hora_entrada, id_entrada);
+                una fecha None se sustituye por la hora actual. Si id_entrada ya
+                está registrado no se inserta otra vez y se devuelve el ID existente
+        
+        Returns:
+            Lista con el ID de cada asistencia, en el mismo orden
+        """
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        
+        ahora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        ids = []
+        try:
+            for socio_id, fecha_hora, id_entrada in entradas:
+                cursor.execute('''
+                    INSERT INTO asistencias (socio_id, fecha_hora_entrada, id_entrada)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT (id_entrada) DO NOTHING
+                ''', (socio_id, fecha_hora or ahora, id_entrada))
+                if cursor.rowcount == 0:
+                    # Reintento de una entrada ya guardada
+                    cursor.execute("SELECT id FROM asistencias WHERE id_entrada = ?", (id_entrada,))
+                    ids.append(cursor.fetchone()[0])
+                else:
+                    ids.append(cursor.lastrowid)
+            conn.commit()
+        finally:
+            conn.close()
+        return ids
+    
     def registrar_salida(self, asistencia_id):
         """Registra la salida de un socio del gimnasio"""
         conn = self.db.get_connection()
@@ -296,7 +452,8 @@ class Asistencia:
                    a.fecha_hora_entrada, a.fecha_hora_salida
             FROM asistencias a
             JOIN socios s ON a.socio_id = s.id
-            WHERE date(a.fecha_hora_entrada) = date('now')
+            WHERE a.fecha_hora_entrada >= date('now')
+            AND a.fecha_hora_entrada < date('now', '+1 day')
             ORDER BY a.fecha_hora_entrada DESC
         ''')
         
@@ -315,12 +472,9 @@ class Reporte:
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT 
-                strftime('%Y-%m', fecha_pago) as mes,
-                COUNT(*) as total_membresias,
-                SUM(precio_pagado) as total_ingresos
-            FROM membresias
-            GROUP BY strftime('%Y-%m', fecha_pago)
+            SELECT mes, total_membresias, ROUND(total_ingresos, 2) as total_ingresos
+            FROM resumen_ingresos_mes
+            WHERE total_membresias > 0
             ORDER BY mes DESC
             LIMIT 12
         ''')
@@ -360,14 +514,13 @@ class Reporte:
                 c.nombre as clase,
                 e.nombre || ' ' || e.apellidos as entrenador,
                 c.dia_semana, c.hora_inicio,
-                COUNT(r.id) as total_reservas,
+                COALESCE(r.total_reservas, 0) as total_reservas,
                 c.capacidad_maxima,
-                ROUND(COUNT(r.id) * 100.0 / c.capacidad_maxima, 1) as porcentaje_ocupacion
+                ROUND(COALESCE(r.total_reservas, 0) * 100.0 / c.capacidad_maxima, 1) as porcentaje_ocupacion
             FROM clases c
             LEFT JOIN entrenadores e ON c.entrenador_id = e.id
-            LEFT JOIN reservas_clases r ON c.id = r.clase_id AND r.estado = 'confirmada'
+            LEFT JOIN resumen_reservas_clase r ON c.id = r.clase_id
             WHERE c.activa = 1
-            GROUP BY c.id
             ORDER BY total_reservas DESC
             LIMIT 10
         ''')
@@ -382,17 +535,35 @@ class Reporte:
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT 
-                strftime('%Y-%m', fecha_hora_entrada) as mes,
-                COUNT(DISTINCT socio_id) as socios_unicos,
-                COUNT(*) as total_visitas,
-                ROUND(COUNT(*) * 1.0 / COUNT(DISTINCT socio_id), 1) as promedio_visitas
-            FROM asistencias
-            GROUP BY strftime('%Y-%m', fecha_hora_entrada)
+            SELECT mes, socios_unicos, total_visitas,
+                   ROUND(total_visitas * 1.0 / socios_unicos, 1) as promedio_visitas
+            FROM resumen_asistencias_mes
+            WHERE total_visitas > 0
             ORDER BY mes DESC
             LIMIT 6
         ''')
         
         datos = cursor.fetchall()
         conn.close()
-        return datos
\ No newline at end of file
+        return datos
+    
+    def estadisticas_dashboard(self):
+        """Totales del dashboard leídos de las tablas de resumen"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        
+        # Los socios activos dependen de la fecha actual, así que se cuentan
+        # con el índice de fecha_fin (solo recorre las membresías vigentes)
+        cursor.execute('''
+            SELECT
+                (SELECT valor FROM resumen_contadores WHERE clave = 'socios'),
+                (SELECT COUNT(DISTINCT socio_id) FROM membresias
+                 WHERE fecha_fin >= date('now') AND estado = 'activa'),
+                (SELECT valor FROM resumen_contadores WHERE clave = 'entrenadores_activos'),
+                (SELECT valor FROM resumen_contadores WHERE clave = 'clases_activas'),
+                (SELECT valor FROM resumen_contadores WHERE clave = 'ingresos_activas')
+        ''')
+        
+        estadisticas = cursor.fetchone()
+        conn.close()
+        return estadisticas
\ No newline at end of file
@@ -19,6 +19,35 @@ const appState = {
 // Configuración de la API
 const API_BASE = 'http://localhost:5000/api';
 
+/**
+ * Pide una página de un listado de la API. El cursor es el campo
+ * 'siguiente' de la página anterior (null para la primera)
+ */
+async function obtenerPagina(recurso, cursor = null) {
+    const url = cursor
+        ? `${API_BASE}/${recurso}?cursor=${encodeURIComponent(cursor)}`
+        : `${API_BASE}/${recurso}`;
+    const response = await fetch(url);
+    return response.json();
+}
+
+/**
+ * Añade al final de una tabla el botón que carga la página siguiente
+ */
+function agregarFilaCargarMas(tbody, columnas, siguiente, accion) {
+    if (!siguiente) {
+        return;
+    }
+    const row = tbody.insertRow();
+    row.innerHTML = `
+        <td colspan="${columnas}" class="text-center">
+            <button class="btn btn-sm btn-outline" onclick="${accion}('${siguiente}')">
+                <i class="fas fa-chevron-down"></i> Cargar más
+            </button>
+        </td>
+    `;
+}
+
 /**
  * Clase para gestionar la navegación del sistema
  */
@@ -158,17 +187,20 @@ class DashboardController {
  * Controlador de Socios
  */
 class SociosController {
-    async cargarSocios() {
+    async cargarSocios(cursor = null) {
         const tbody = document.getElementById('tabla-socios');
-        tbody.innerHTML = '<tr><td colspan="8" class="text-center">Cargando...</td></tr>';
+        if (!cursor) {
+            tbody.innerHTML = '<tr><td colspan="8" class="text-center">Cargando...</td></tr>';
+        }
         
         try {
-            const response = await fetch(`${API_BASE}/socios`);
-            const data = await response.json();
+            const data = await obtenerPagina('socios', cursor);
             
             if (data.success) {
-                appState.datos.socios = data.data;
-                this.renderizarSocios(data.data);
+                // Las páginas siguientes se añaden a las ya cargadas
+                appState.datos.socios = cursor ? appState.datos.socios.concat(data.data) : data.data;
+                this.renderizarSocios(appState.datos.socios);
+                agregarFilaCargarMas(tbody, 8, data.siguiente, 'sociosController.cargarSocios');
             }
         } catch (error) {
             console.error('Error al cargar socios:', error);
@@ -238,17 +270,20 @@ class SociosController {
  * Controlador de Entrenadores
  */
 class EntrenadoresController {
-    async cargarEntrenadores() {
+    async cargarEntrenadores(cursor = null) {
         const tbody = document.getElementById('tabla-entrenadores');
-        tbody.innerHTML = '<tr><td colspan="8" class="text-center">Cargando...</td></tr>';
+        if (!cursor) {
+            tbody.innerHTML = '<tr><td colspan="8" class="text-center">Cargando...</td></tr>';
+        }
         
         try {
-            const response = await fetch(`${API_BASE}/entrenadores`);
-            const data = await response.json();
+            const data = await obtenerPagina('entrenadores', cursor);
             
             if (data.success) {
-                appState.datos.entrenadores = data.data;
-                this.renderizarEntrenadores(data.data);
+                // Las páginas siguientes se añaden a las ya cargadas
+                appState.datos.entrenadores = cursor ? appState.datos.entrenadores.concat(data.data) : data.data;
+                this.renderizarEntrenadores(appState.datos.entrenadores);
+                agregarFilaCargarMas(tbody, 8, data.siguiente, 'entrenadoresController.cargarEntrenadores');
             }
         } catch (error) {
             console.error('Error al cargar entrenadores:', error);
@@ -310,17 +345,20 @@ class EntrenadoresController {
  * Controlador de Clases
  */
 class ClasesController {
-    async cargarClases() {
+    async cargarClases(cursor = null) {
         const tbody = document.getElementById('tabla-clases');
-        tbody.innerHTML = '<tr><td colspan="9" class="text-center">Cargando...</td></tr>';
+        if (!cursor) {
+            tbody.innerHTML = '<tr><td colspan="9" class="text-center">Cargando...</td></tr>';
+        }
         
         try {
-            const response = await fetch(`${API_BASE}/clases`);
-            const data = await response.json();
+            const data = await obtenerPagina('clases', cursor);
             
             if (data.success) {
-                appState.datos.clases = data.data;
-                this.renderizarClases(data.data);
+                // Las páginas siguientes se añaden a las ya cargadas
+                appState.datos.clases = cursor ? appState.datos.clases.concat(data.data) : data.data;
+                this.renderizarClases(appState.datos.clases);
+                agregarFilaCargarMas(tbody, 9, data.siguiente, 'clasesController.cargarClases');
             }
         } catch (error) {
             console.error('Error al cargar clases:', error);
@@ -375,17 +413,20 @@ class ClasesController {
  * Controlador de Membresías
  */
 class MembresiasController {
-    async cargarMembresias() {
+    async cargarMembresias(cursor = null) {
         const tbody = document.getElementById('tabla-membresias');
-        tbody.innerHTML = '<tr><td colspan="8" class="text-center">Cargando...</td></tr>';
+        if (!cursor) {
+            tbody.innerHTML = '<tr><td colspan="8" class="text-center">Cargando...</td></tr>';
+        }
         
         try {
-            const response = await fetch(`${API_BASE}/membresias`);
-            const data = await response.json();
+            const data = await obtenerPagina('membresias', cursor);
             
             if (data.success) {
-                appState.datos.membresias = data.data;
-                this.renderizarMembresias(data.data);
+                // Las páginas siguientes se añaden a las ya cargadas
+                appState.datos.membresias = cursor ? appState.datos.membresias.concat(data.data) : data.data;
+                this.renderizarMembresias(appState.datos.membresias);
+                agregarFilaCargarMas(tbody, 8, data.siguiente, 'membresiasController.cargarMembresias');
             }
         } catch (error) {
             console.error('Error al cargar membresías:', error);